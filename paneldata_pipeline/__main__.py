@@ -1,13 +1,26 @@
 """ Entrypoint related functions of the package. """
 
 import argparse
+import os
 import sys
 from pathlib import Path
+from typing import List, Tuple
 
+from paneldata_pipeline.catalog import MetadataCatalog, Requirements
+from paneldata_pipeline.concepts import REQUIRED_INPUTS as CONCEPTS_INPUTS
 from paneldata_pipeline.concepts import extract_implicit_concepts
+from paneldata_pipeline.engine import ClosureOptions
+from paneldata_pipeline.merge_instruments import REQUIRED_INPUTS as INSTRUMENTS_INPUTS
 from paneldata_pipeline.merge_instruments import merge_instruments
+from paneldata_pipeline.output import OutputOptions
+from paneldata_pipeline.plan import print_plan
+from paneldata_pipeline.questions_variables import REQUIRED_INPUTS as QUESTIONS_INPUTS
 from paneldata_pipeline.questions_variables import questions_from_generations
+from paneldata_pipeline.readers import ENGINES, find_input
+from paneldata_pipeline.sql_closure import SQL_BACKENDS
+from paneldata_pipeline.topics import REQUIRED_INPUTS as TOPICS_INPUTS
 from paneldata_pipeline.topics import TopicParser
+from paneldata_pipeline.transformations import REQUIRED_INPUTS as TRANSFORMATIONS_INPUTS
 from paneldata_pipeline.transformations import preprocess_transformations
 
 
@@ -16,29 +29,55 @@ def main() -> None:
     _parsed_arguments = parse_arguments()
     input_folder: Path = _parsed_arguments.input_folder
     output_folder: Path = _parsed_arguments.output_folder
-    if input_folder.joinpath("concepts.csv").exists():
+    closure_options = _closure_options(_parsed_arguments)
+    output_options = _output_options(_parsed_arguments)
+    if _parsed_arguments.plan:
+        print_plan(
+            version=_parsed_arguments.version,
+            input_folder=input_folder,
+            engine=_parsed_arguments.engine,
+        )
+        return
+    catalog = _metadata_catalog(_parsed_arguments)
+    if find_input(input_folder.joinpath("concepts.csv")).exists():
         extract_implicit_concepts(
             input_folder,
             input_folder.joinpath("concepts.csv"),
             output_folder.joinpath("concepts.csv"),
+            catalog=catalog,
         )
     if _parsed_arguments.unify_instrument_data:
-        merge_instruments(input_folder=input_folder, output_folder=output_folder)
+        merge_instruments(
+            input_folder=input_folder,
+            output_folder=output_folder,
+            catalog=catalog,
+            workers=_parsed_arguments.workers or 1,
+            chunk_size=_parsed_arguments.instrument_chunk_size,
+            output_options=output_options,
+        )
     if _parsed_arguments.question_relations:
         questions_from_generations(
             version=_parsed_arguments.version,
             input_folder=input_folder,
             output_folder=output_folder,
+            closure_options=closure_options,
+            output_options=output_options,
+            catalog=catalog,
         )
     if _parsed_arguments.variable_relations:
         preprocess_transformations(
-            study=_parsed_arguments.study,
+            study=None if _parsed_arguments.all_studies else _parsed_arguments.study,
             version=_parsed_arguments.version,
             input_folder=input_folder,
             output_folder=output_folder,
+            closure_options=closure_options,
+            output_options=output_options,
+            catalog=catalog,
         )
     if _parsed_arguments.generate_topic_tree:
-        TopicParser(input_folder=input_folder, output_folder=output_folder).to_json()
+        TopicParser(
+            input_folder=input_folder, output_folder=output_folder, catalog=catalog
+        ).to_json()
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -54,10 +93,32 @@ def parse_arguments() -> argparse.Namespace:
         type=_full_path,
     )
     parser.add_argument(
-        "-s", "--study", help="Name of the study, that is processed.", type=str
+        "-s",
+        "--study",
+        help=(
+            "Name of the study, that is processed, required by -r without --all-studies. "
+            "With several studies, variable relations are computed once "
+            "and written to one subfolder per study."
+        ),
+        type=str,
+        nargs="+",
     )
     parser.add_argument(
-        "-w", "--version", help="Name of the wave/version of the data.", type=str
+        "--all-studies",
+        help="Process variable relations of every study present in generations.csv.",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "-w",
+        "--version",
+        help=(
+            "Name of the wave/version of the data, required by -r, -q and --plan. "
+            "With several versions, relations are computed once "
+            "and written to one subfolder per version."
+        ),
+        type=str,
+        nargs="+",
     )
     parser.add_argument(
         "-r",
@@ -97,16 +158,209 @@ def parse_arguments() -> argparse.Namespace:
         action="store_true",
         default=False,
     )
+    parser.add_argument(
+        "--closure-store",
+        help=(
+            "Folder for SQLite files, that keep the transitive relations between runs. "
+            "Only changes in generations.csv are processed in later runs."
+        ),
+        type=_full_path,
+        default=None,
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        help=(
+            "Number of processes used to follow the relations of -r and -q "
+            "and to build the instruments of -u. "
+            "Independent groups of variables and instruments are processed in parallel."
+        ),
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--memory-budget",
+        help=(
+            "Follow the relations of -r and -q within about this many bytes, "
+            "e.g. 512M or 4G, spilling intermediate relations to the temporary folder. "
+            "Defaults to the environment variable PANELDATA_PIPELINE_MEMORY_BUDGET."
+        ),
+        type=_byte_size,
+        default=os.environ.get("PANELDATA_PIPELINE_MEMORY_BUDGET"),
+    )
+    parser.add_argument(
+        "--sql-backend",
+        help=(
+            "Follow the relations of -r and -q with a recursive query "
+            "in a temporary database file, duckdb requires the duckdb package."
+        ),
+        choices=SQL_BACKENDS,
+        default=None,
+    )
+    parser.add_argument(
+        "--instrument-chunk-size",
+        help=(
+            "Build the instruments of -u one at a time, reading questions.csv "
+            "and answers.csv in chunks of this many rows. "
+            "Both files have to be sorted by instrument, e.g. with LC_ALL=C sort."
+        ),
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--json-threads",
+        help="Number of threads writing the instrument files of -u.",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--json-queue-depth",
+        help=(
+            "Number of encoded instrument files of -u, "
+            "that may wait for a writing thread."
+        ),
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--plan",
+        help=(
+            "Only print statistics of generations.csv and the estimated size "
+            "of the relations created by -r and -q, without running any stage."
+        ),
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--lineage-index",
+        help=(
+            "Also write a memory mapped index of the relations created by -r and -q, "
+            "which can be read with paneldata_pipeline.lineage_index.LineageIndex."
+        ),
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--compact-relations",
+        help=(
+            "Write the relations created by -r as their transitive reduction "
+            "and a table of components instead of every pair, "
+            "which can be read with paneldata_pipeline.compact.CompactRelations."
+        ),
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--cache-folder",
+        help=(
+            "Folder for columnar copies of the input files, "
+            "so unchanged files are not parsed again in later runs. "
+            "Requires the pyarrow package."
+        ),
+        type=_full_path,
+        default=None,
+    )
+    parser.add_argument(
+        "--engine",
+        help=(
+            "Parser for the input files. pyarrow and polars parse with several threads "
+            "and give the same results, pandas is used if they are not installed."
+        ),
+        choices=ENGINES,
+        default="pandas",
+    )
+    parser.add_argument(
+        "--compress",
+        help=(
+            "Compress the relations created by -r and -q, "
+            "zstd requires the zstandard package."
+        ),
+        choices=["gzip", "zstd"],
+        default=None,
+    )
     if len(sys.argv) == 1:
         parser.print_help()
         sys.exit(1)
 
-    return parser.parse_args()
+    arguments = parser.parse_args()
+    if not arguments.version and (
+        arguments.variable_relations or arguments.question_relations or arguments.plan
+    ):
+        parser.error("-r, -q and --plan require -w/--version")
+    if arguments.variable_relations and not (arguments.study or arguments.all_studies):
+        parser.error("-r requires -s/--study or --all-studies")
+    return arguments
+
+
+def _metadata_catalog(arguments: argparse.Namespace) -> MetadataCatalog:
+    """Create the catalog of input files shared by all stages,
+    knowing the columns needed by the selected stages."""
+    catalog = MetadataCatalog(
+        arguments.input_folder,
+        cache_folder=arguments.cache_folder,
+        engine=arguments.engine,
+    )
+    stages: List[Tuple[Requirements, bool]] = [
+        (
+            CONCEPTS_INPUTS,
+            find_input(arguments.input_folder.joinpath("concepts.csv")).exists(),
+        ),
+        (INSTRUMENTS_INPUTS, arguments.unify_instrument_data),
+        (QUESTIONS_INPUTS, arguments.question_relations),
+        (TRANSFORMATIONS_INPUTS, arguments.variable_relations),
+        (TOPICS_INPUTS, arguments.generate_topic_tree),
+    ]
+    for requirements, selected in stages:
+        if selected:
+            catalog.require_all(requirements)
+    return catalog
+
+
+def _closure_options(arguments: argparse.Namespace) -> ClosureOptions:
+    """Gather settings for following relations from the parsed arguments."""
+    options = ClosureOptions()
+    if arguments.closure_store:
+        options["store"] = arguments.closure_store
+    if arguments.workers:
+        options["workers"] = arguments.workers
+    if arguments.memory_budget:
+        options["memory_budget"] = arguments.memory_budget
+    if arguments.sql_backend:
+        options["sql_backend"] = arguments.sql_backend
+    return options
+
+
+def _output_options(arguments: argparse.Namespace) -> OutputOptions:
+    """Gather settings for writing relations from the parsed arguments."""
+    options = OutputOptions()
+    if arguments.lineage_index:
+        options["lineage_index"] = True
+    if arguments.compact_relations:
+        options["compact"] = True
+    if arguments.compress:
+        options["compression"] = arguments.compress
+    if arguments.json_threads:
+        options["json_threads"] = arguments.json_threads
+    if arguments.json_queue_depth:
+        options["json_queue_depth"] = arguments.json_queue_depth
+    return options
 
 
 def _full_path(path: str) -> Path:
     return Path(path).resolve()
 
 
+def _byte_size(size: str) -> int:
+    """Parse a number of bytes with an optional K, M, G or T suffix."""
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    size = size.strip().upper().removesuffix("B")
+    try:
+        if size and size[-1] in units:
+            return int(float(size[:-1]) * units[size[-1]])
+        return int(size)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"Invalid size: {size}") from error
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,125 @@
+"""Columnar cache of parsed metadata files in Arrow IPC (Feather) format."""
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy
+from pandas import DataFrame
+
+from paneldata_pipeline.json_writer import dump_json
+
+try:
+    import pyarrow
+    from pyarrow import feather
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+CACHE_INDEX = "index.json"
+
+CacheEntry = Dict[str, Union[int, str]]
+
+
+class ColumnarCache:  # pylint: disable=too-few-public-methods
+    """Keep parsed CSV files as uncompressed Arrow IPC files in folder.
+
+    A cached file is used as long as the size and modification time
+    of its CSV file are unchanged. Otherwise the content of the CSV file is hashed,
+    so files that were only touched are not parsed again.
+    The schema string describes how the CSV file is parsed,
+    a different schema invalidates the cached file::
+
+        cache = ColumnarCache(Path(".cache"))
+        table = cache.load(csv_path, "", read_full_csv, columns=["name"])
+
+    Cached files are memory mapped and only the requested columns are read.
+    Requires the pyarrow package.
+    """
+
+    def __init__(self, folder: Path) -> None:
+        if pyarrow is None:
+            raise ModuleNotFoundError("The metadata cache requires the pyarrow package.")
+        self.folder = folder
+        self.folder.mkdir(parents=True, exist_ok=True)
+        index_path = self.folder.joinpath(CACHE_INDEX)
+        self._index: Dict[str, CacheEntry] = {}
+        if index_path.exists():
+            with open(index_path, "r", encoding="utf8") as index_file:
+                self._index = json.load(index_file)
+
+    def load(
+        self,
+        path: Path,
+        schema: str,
+        parse: Callable[[], DataFrame],
+        columns: Optional[List[str]] = None,
+    ) -> DataFrame:
+        """Read the columns of the CSV file at path from the cache.
+
+        parse is called to read the complete CSV file, if it is not cached yet.
+        """
+        key = str(path.resolve())
+        entry = self._index.get(key)
+        stat = path.stat()
+        if entry is not None and entry["schema"] != schema:
+            entry = None
+        if entry is not None and (
+            entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns
+        ):
+            if entry["hash"] == _file_hash(path):
+                entry.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+                self._write_index()
+            else:
+                entry = None
+        if entry is not None and self.folder.joinpath(str(entry["file"])).exists():
+            return self._read(self.folder.joinpath(str(entry["file"])), columns)
+
+        table = parse()
+        content_hash = _file_hash(path)
+        file_name = f"{path.stem}-{content_hash[:16]}.arrow"
+        try:
+            feather.write_feather(
+                table, self.folder.joinpath(file_name), compression="uncompressed"
+            )
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            # columns mixing types can not be stored, the file is parsed every time
+            return table if columns is None else table[_present(columns, table)]
+        previous = self._index.get(key)
+        if previous is not None and previous["file"] != file_name:
+            self.folder.joinpath(str(previous["file"])).unlink(missing_ok=True)
+        self._index[key] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": content_hash,
+            "schema": schema,
+            "file": file_name,
+        }
+        self._write_index()
+        return table if columns is None else table[_present(columns, table)]
+
+    def _read(self, path: Path, columns: Optional[List[str]]) -> DataFrame:
+        arrow_table = feather.read_table(path, memory_map=True)
+        if columns is not None:
+            arrow_table = arrow_table.select(
+                [column for column in columns if column in arrow_table.column_names]
+            )
+        table: DataFrame = arrow_table.to_pandas()
+        # Arrow has no NaN for strings, missing values are None after the conversion
+        for column in table.columns[table.dtypes == object]:
+            table[column] = table[column].where(table[column].notna(), numpy.nan)
+        return table
+
+    def _write_index(self) -> None:
+        dump_json(self._index, self.folder.joinpath(CACHE_INDEX), indent=2)
+
+
+def _present(columns: List[str], table: DataFrame) -> List[str]:
+    return [column for column in columns if column in table.columns]
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as csv_file:
+        for block in iter(lambda: csv_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
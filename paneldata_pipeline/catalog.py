@@ -0,0 +1,137 @@
+"""Shared access to the metadata files of an input folder."""
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Union
+
+from pandas import DataFrame
+
+from paneldata_pipeline.cache import ColumnarCache
+from paneldata_pipeline.readers import available_engine, find_input, read_csv
+
+# Column types used by every stage reading a file.
+DTYPES: Dict[str, Dict[str, type]] = {
+    "generations.csv": {"input_version": str, "output_version": str},
+}
+# Key columns with few distinct values, which are loaded as category.
+# Columns of one group share their categories, so they can be compared.
+# Files, that are written out value by value like instruments.csv, keep their types.
+CATEGORIES: Dict[str, List[List[str]]] = {
+    "generations.csv": [
+        ["input_study", "output_study"],
+        ["input_dataset", "output_dataset"],
+        ["input_version", "output_version"],
+    ],
+    "variables.csv": [["study"], ["dataset"]],
+    "logical_variables.csv": [["study"], ["dataset"], ["instrument"]],
+    "datasets.csv": [["study"], ["name"]],
+}
+
+Requirements = Mapping[str, Optional[Iterable[str]]]
+
+
+class MetadataCatalog:
+    """Parse every metadata file of input_folder at most once.
+
+    Stages register the columns they need with require() before any file is read,
+    the first table() call for a file then parses the columns needed by all
+    of them together. None stands for all columns::
+
+        catalog = MetadataCatalog(Path("metadata"))
+        catalog.require_all({"variables.csv": ["dataset", "name"]})
+        variables = catalog.table("variables.csv", ["dataset", "name"])
+
+    Files can be compressed, e.g. variables.csv.gz. Missing optional columns
+    are skipped. Key columns listed in CATEGORIES are loaded as category.
+    table() returns a copy, that stages can change freely.
+    With cache_folder, files are read from a ColumnarCache instead of
+    being parsed again in every run.
+    engine selects the CSV parser, see readers.read_csv().
+    """
+
+    def __init__(
+        self,
+        input_folder: Path,
+        cache_folder: Optional[Path] = None,
+        engine: str = "pandas",
+    ) -> None:
+        self.input_folder = input_folder
+        self.engine = available_engine(engine)
+        self.cache = None if cache_folder is None else ColumnarCache(cache_folder)
+        self._required: Dict[str, Optional[Set[str]]] = {}
+        self._tables: Dict[str, DataFrame] = {}
+
+    def path(self, file_name: str) -> Path:
+        """Location of file_name, which may be compressed, see readers.find_input()."""
+        return find_input(self.input_folder.joinpath(file_name))
+
+    def require(self, file_name: str, columns: Optional[Iterable[str]] = None) -> None:
+        """Register the columns of file_name needed by a stage."""
+        required = self._required.get(file_name, set())
+        if required is None or columns is None:
+            self._required[file_name] = None
+        else:
+            self._required[file_name] = required | set(columns)
+
+    def require_all(self, requirements: Requirements) -> None:
+        """Register the needs of a stage for several files."""
+        for file_name, columns in requirements.items():
+            self.require(file_name, columns)
+
+    def table(self, file_name: str, columns: Optional[Iterable[str]] = None) -> DataFrame:
+        """The content of file_name, restricted to columns if given.
+
+        Columns, that were not registered before the file was parsed,
+        lead to parsing it again with all columns needed so far.
+        """
+        wanted = None if columns is None else list(columns)
+        parsed = self._tables.get(file_name)
+        if parsed is not None and not self._covers(file_name, wanted):
+            parsed = None
+        if parsed is None:
+            self.require(file_name, wanted)
+            parsed = self._parse(file_name)
+            self._tables[file_name] = parsed
+        if wanted is None:
+            return parsed.copy()
+        return parsed[[column for column in wanted if column in parsed.columns]].copy()
+
+    def _covers(self, file_name: str, columns: Optional[List[str]]) -> bool:
+        required = self._required.get(file_name)
+        if required is None:
+            return file_name in self._required
+        return columns is not None and set(columns) <= required
+
+    def _parse(self, file_name: str) -> DataFrame:
+        required = self._required.get(file_name)
+        if self.cache is not None:
+            return self.cache.load(
+                self.path(file_name),
+                json.dumps(
+                    [DTYPES.get(file_name, {}), CATEGORIES.get(file_name, [])],
+                    default=str,
+                ),
+                lambda: self._read_csv(file_name, None),
+                columns=None if required is None else sorted(required),
+            )
+        return self._read_csv(file_name, required)
+
+    def _read_csv(self, file_name: str, required: Optional[Set[str]]) -> DataFrame:
+        groups = CATEGORIES.get(file_name, [])
+        dtypes: Dict[str, Union[type, str]] = {
+            **DTYPES.get(file_name, {}),
+            **{column: "category" for group in groups for column in group},
+        }
+        table = read_csv(
+            self.path(file_name),
+            self.engine,
+            usecols=required,
+            dtype=dtypes,
+        )
+        for group in groups:
+            columns = [column for column in group if column in table.columns]
+            categories = sorted(
+                set().union(*(table[column].cat.categories for column in columns))
+            )
+            for column in columns:
+                table[column] = table[column].cat.set_categories(categories)
+        return table
@@ -16,6 +16,8 @@ from frictionless.error import Error as FrictionlessError  # type: ignore
 from frictionless.errors.label import IncorrectLabelError, MissingLabelError
 from tabulate import tabulate
 
+from paneldata_pipeline.readers import find_input
+
 IncorrectLabelError.template = (
     'Column at position "{fieldPosition}" should be "{fieldName}" but is "{label}".'
 )
@@ -55,13 +57,20 @@ def main() -> None:
     data_package = deepcopy(data_package_base)
     timestamp = datetime.now().strftime("%d%m%Y%H%M%S%f")
 
-    metadata_file_names = {path.stem for path in metadata_location.glob("*.csv")}
     for resource in _get_path_to_resources():
-        if resource.stem in metadata_file_names:
-            with open(resource, encoding="utf8") as _file:
-                data_package["resources"].append(json.load(_file))
-        else:
+        metadata_file = find_input(metadata_location.joinpath(f"{resource.stem}.csv"))
+        if not metadata_file.exists():
             print(f"Metadata file {resource.name} is not present.")
+        elif metadata_file.suffix == ".zst":
+            print(
+                f"Metadata file {metadata_file.name} can not be validated as zstd file."
+            )
+        else:
+            with open(resource, encoding="utf8") as _file:
+                resource_descriptor = json.load(_file)
+            # frictionless decompresses .gz, .bz2 and .xz files itself
+            resource_descriptor["path"] = metadata_file.name
+            data_package["resources"].append(resource_descriptor)
 
     data_package_location = metadata_location / f"{timestamp}datapackage.json"
 
@@ -3,11 +3,16 @@
 import argparse
 import logging
 import sys
-from csv import DictReader
 from json import decoder, load
 from pathlib import Path
 from typing import List, TypedDict
 
+import numpy
+from pandas import DataFrame, Series
+
+from paneldata_pipeline.interning import KeyInterner
+from paneldata_pipeline.readers import ENGINES, find_input, read_strings
+
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
@@ -49,19 +54,25 @@ def main() -> None:
 
     all_relations_exist = set()
     if not arguments.skip_answer_list_test:
-        all_relations_exist.add(check_cat_question_items(arguments.input_folder))
+        all_relations_exist.add(
+            check_cat_question_items(arguments.input_folder, engine=arguments.engine)
+        )
 
     for relation in relations:
-        relation["file"] = arguments.input_folder.joinpath(relation["file"])
+        relation["file"] = find_input(arguments.input_folder.joinpath(relation["file"]))
         relation["relations_from"] = [
             RelationOrigin(
-                file=arguments.input_folder.joinpath(origin["file"]),
+                file=find_input(arguments.input_folder.joinpath(origin["file"])),
                 fields=origin["fields"],
             )
             for origin in relation["relations_from"]
         ]
         try:
-            all_relations_exist.add(relations_exist(relation, relation["relations_from"]))
+            all_relations_exist.add(
+                relations_exist(
+                    relation, relation["relations_from"], engine=arguments.engine
+                )
+            )
         except FileNotFoundError as error:
             LOGGER.debug(
                 "A file from the config is not present in the input directory: %s",
@@ -73,25 +84,20 @@ def main() -> None:
     sys.exit(0)
 
 
-def check_cat_question_items(input_folder: Path) -> bool:
-    """Check if all questions with scale cat have a value for answer_list."""
+def check_cat_question_items(input_folder: Path, engine: str = "pandas") -> bool:
+    """Check if all questions with scale cat have a value for answer_list.
+
+    engine selects the CSV parser, see readers.read_strings().
+    """
     LOGGER.info("Checking if all cat questions have answer_list values.")
-    questions_path = input_folder.joinpath("questions.csv")
-    passed = True
+    questions_path = find_input(input_folder.joinpath("questions.csv"))
     if not questions_path.exists():
         return True
-    with open(input_folder.joinpath("questions.csv"), "r", encoding="utf8") as file:
-        reader = DictReader(file)
-        for row in reader:
-            if row["scale"] != "cat":
-                continue
-            if row["answer_list"] == "":
-                passed = False
-                LOGGER.info(
-                    "Question %s has no answer_list.",
-                    {key: row[key] for key in ["study", "instrument", "name", "item"]},
-                )
-    return passed
+    questions = read_strings(questions_path, engine)
+    missing = questions[(questions["scale"] == "cat") & (questions["answer_list"] == "")]
+    for row in missing[["study", "instrument", "name", "item"]].to_dict("records"):
+        LOGGER.info("Question %s has no answer_list.", row)
+    return missing.empty
 
 
 def read_relations(file_path: Path) -> List[RelationTarget]:
@@ -130,6 +136,16 @@ def parse_arguments() -> argparse.Namespace:
         action="store_true",
         default=False,
     )
+    parser.add_argument(
+        "--engine",
+        help=(
+            "Parser for the metadata files, every value is read as string. "
+            "pyarrow and polars parse with several threads, "
+            "pandas is used if they are not installed."
+        ),
+        choices=ENGINES,
+        default="pandas",
+    )
     if len(sys.argv) == 1:
         parser.print_help()
         sys.exit(1)
@@ -137,44 +153,46 @@ def parse_arguments() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def relations_exist(target: RelationOrigin, origins: List[RelationOrigin]) -> bool:
-    """Check if reference from origin file to a target file exists."""
-    with open(target["file"], "r", encoding="utf8") as _file:
-        _reader = DictReader(_file)
-        keypairs = set()
-        for row in _reader:
-            _keypair = []
-            for field in target["fields"]:
-                _keypair.append(row[field])
-            keypairs.add(tuple(_keypair))
+def relations_exist(
+    target: RelationOrigin, origins: List[RelationOrigin], engine: str = "pandas"
+) -> bool:
+    """Check if reference from origin file to a target file exists.
+
+    The keys of the target file are interned once,
+    rows of the origin files are checked by looking up their keys.
+    engine selects the CSV parser, see readers.read_strings().
+    """
+    keys = KeyInterner(target["fields"])
+    keys.intern(read_strings(target["file"], engine)[target["fields"]])
 
     all_relations_exist = True
     for origin in origins:
-        with open(origin["file"], "r", encoding="utf8") as _file:
-            _reader = DictReader(_file)
+        rows = read_strings(origin["file"], engine)
+        LOGGER.info(
+            "Checking relation from file %s:%s to file %s:%s",
+            origin["file"].name,
+            origin["fields"],
+            target["file"].name,
+            target["fields"],
+        )
+        origin_keys = DataFrame(
+            {
+                field: rows.get(field, Series("", index=rows.index))
+                for field in origin["fields"]
+            }
+        )
+        # Skip check if no relation is defined inside the fields.
+        defined = ~(origin_keys == "").any(axis=1).to_numpy()
+        missing = defined & (keys.lookup(origin_keys) < 0)
+        for row_number in numpy.flatnonzero(missing).tolist():
             LOGGER.info(
-                "Checking relation from file %s:%s to file %s:%s",
-                origin["file"].name,
-                origin["fields"],
-                target["file"].name,
-                target["fields"],
+                "Relation target %s in row %d does not exist.",
+                origin_keys.iloc[row_number].tolist(),
+                row_number + 2,
             )
-            for row_number, row in enumerate(_reader, start=2):
-                _keypair = []
-                for field in origin["fields"]:
-                    _keypair.append(row.get(field, ""))
-                # Skip check if no relation is defined inside the fields.
-                if "" in _keypair:
-                    continue
-                if tuple(_keypair) not in keypairs:
-                    LOGGER.info(
-                        "Relation target %s in row %d does not exist.",
-                        _keypair,
-                        row_number,
-                    )
-                    all_relations_exist = False
-            LOGGER.info("#" * 20)
-            LOGGER.info("")
+            all_relations_exist = False
+        LOGGER.info("#" * 20)
+        LOGGER.info("")
 
     return all_relations_exist
 
@@ -0,0 +1,383 @@
+"""Graph based computation of transitive links between variables."""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy
+import pandas
+from pandas import DataFrame
+
+from paneldata_pipeline.interning import BoolArray, IntArray, KeyInterner
+
+INPUT_COLUMNS = ["input_study", "input_dataset", "input_version", "input_variable"]
+OUTPUT_COLUMNS = ["output_study", "output_dataset", "output_version", "output_variable"]
+NODE_COLUMNS = ["study", "dataset", "version", "variable"]
+
+
+def encode_nodes(link_table: DataFrame) -> Tuple[IntArray, IntArray, DataFrame]:
+    """Map every (study, dataset, version, variable) node to an integer.
+
+    Returns the encoded input and output side of every link
+    and a DataFrame holding the node for every integer as its row position.
+    """
+    interner = KeyInterner(NODE_COLUMNS)
+    sources = interner.intern(link_table[INPUT_COLUMNS])
+    targets = interner.intern(link_table[OUTPUT_COLUMNS])
+    return sources, targets, interner.keys
+
+
+def encode_rows(table: DataFrame) -> Tuple[IntArray, DataFrame]:
+    """Map every distinct row of table to an integer.
+
+    Returns the integer of every row and the distinct rows ordered by their integer,
+    see KeyInterner.
+    """
+    interner = KeyInterner(list(table.columns))
+    codes = interner.intern(table)
+    return codes, interner.keys
+
+
+def adjacency(starts: IntArray, ends: IntArray, size: int) -> Tuple[IntArray, IntArray]:
+    """Build CSR offsets and neighbors for links from starts to ends,
+    the neighbors of node n are neighbors[offsets[n]:offsets[n + 1]]."""
+    order = numpy.argsort(starts, kind="stable")
+    offsets = numpy.zeros(size + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(starts, minlength=size), out=offsets[1:])
+    return offsets, ends[order]
+
+
+def strongly_connected_components(  # pylint: disable=too-many-locals
+    offsets: IntArray, neighbors: IntArray
+) -> IntArray:
+    """Label every node with its strongly connected component.
+
+    Implements Tarjan's algorithm without recursion.
+    Components are numbered in reverse topological order,
+    every component only links to components with a lower number.
+    """
+    size = len(offsets) - 1
+    _offsets = offsets.tolist()
+    _neighbors = neighbors.tolist()
+    index = [-1] * size
+    lowlink = [0] * size
+    on_stack = [False] * size
+    labels = [-1] * size
+    stack: List[int] = []
+    counter = 0
+    component = 0
+
+    for root in range(size):
+        if index[root] != -1:
+            continue
+        work = [(root, _offsets[root])]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, position = work[-1]
+            if position < _offsets[node + 1]:
+                work[-1] = (node, position + 1)
+                successor = _neighbors[position]
+                if index[successor] == -1:
+                    index[successor] = lowlink[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    work.append((successor, _offsets[successor]))
+                elif on_stack[successor]:
+                    lowlink[node] = min(lowlink[node], index[successor])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    labels[member] = component
+                    if member == node:
+                        break
+                component += 1
+    return numpy.array(labels, dtype=numpy.int64)
+
+
+def reachable_pairs(  # pylint: disable=too-many-locals
+    sources: IntArray,
+    targets: IntArray,
+    size: int,
+    source_mask: Optional[BoolArray] = None,
+    target_mask: Optional[BoolArray] = None,
+) -> Tuple[IntArray, IntArray]:
+    """Compute all pairs of encoded nodes connected by a path of length one or more.
+
+    Cycles are collapsed into their strongly connected components first,
+    reachability is then computed by one traversal of the condensed graph
+    per component that has outgoing links.
+    With source_mask or target_mask only pairs starting or ending in nodes
+    selected by the masks are computed, paths can still lead through
+    every other node.
+    """
+    offsets, neighbors = adjacency(sources, targets, size)
+    labels = strongly_connected_components(offsets, neighbors)
+    component_count = int(labels.max()) + 1 if size else 0
+
+    source_components = labels[sources]
+    target_components = labels[targets]
+    internal = source_components == target_components
+    cyclic = numpy.zeros(component_count, dtype=bool)
+    cyclic[source_components[internal]] = True
+
+    condensed = numpy.unique(
+        numpy.stack([source_components[~internal], target_components[~internal]]),
+        axis=1,
+    )
+    condensed_offsets, condensed_neighbors = adjacency(
+        condensed[0], condensed[1], component_count
+    )
+    member_offsets, members = adjacency(
+        labels, numpy.arange(size, dtype=numpy.int64), component_count
+    )
+
+    _offsets = condensed_offsets.tolist()
+    _neighbors = condensed_neighbors.tolist()
+    marks = [-1] * component_count
+    origins: List[int] = []
+    reached: List[int] = []
+    start_components = source_components if source_mask is None else labels[source_mask]
+    for component in numpy.unique(start_components).tolist():
+        marks[component] = component
+        if cyclic[component]:
+            origins.append(component)
+            reached.append(component)
+        stack = [component]
+        while stack:
+            current = stack.pop()
+            for successor in _neighbors[_offsets[current] : _offsets[current + 1]]:
+                if marks[successor] != component:
+                    marks[successor] = component
+                    origins.append(component)
+                    reached.append(successor)
+                    stack.append(successor)
+
+    # Expand pairs of components into pairs of their member nodes.
+    pair_index, pair_targets = _expand_members(
+        numpy.array(reached, dtype=numpy.int64), member_offsets, members
+    )
+    if target_mask is not None:
+        wanted = target_mask[pair_targets]
+        pair_index, pair_targets = pair_index[wanted], pair_targets[wanted]
+    origin_components = numpy.array(origins, dtype=numpy.int64)[pair_index]
+    pair_index, pair_sources = _expand_members(origin_components, member_offsets, members)
+    pair_targets = pair_targets[pair_index]
+    if source_mask is not None:
+        wanted = source_mask[pair_sources]
+        pair_sources, pair_targets = pair_sources[wanted], pair_targets[wanted]
+    return pair_sources, pair_targets
+
+
+def _expand_members(
+    components: IntArray, member_offsets: IntArray, members: IntArray
+) -> Tuple[IntArray, IntArray]:
+    """Repeat every position of components once per member of its component.
+
+    Returns the original position and the member node for every repetition.
+    """
+    starts = member_offsets[components]
+    sizes = member_offsets[components + 1] - starts
+    positions = numpy.repeat(numpy.arange(len(components), dtype=numpy.int64), sizes)
+    group_starts = numpy.cumsum(sizes) - sizes
+    within = numpy.arange(len(positions), dtype=numpy.int64) - group_starts[positions]
+    return positions, members[starts[positions] + within]
+
+
+def ancestor_pairs(
+    sources: IntArray, targets: IntArray, size: int, target_mask: BoolArray
+) -> Tuple[IntArray, IntArray]:
+    """Compute all pairs of encoded nodes connected by a path of length one or more,
+    that end in one of the nodes selected by target_mask.
+
+    Links are followed backwards from every selected node,
+    so only the part of the graph that leads to them is visited.
+    """
+    offsets, neighbors = adjacency(targets, sources, size)
+    _offsets = offsets.tolist()
+    _neighbors = neighbors.tolist()
+    marks = [-1] * size
+    pair_sources: List[int] = []
+    pair_targets: List[int] = []
+    for target in numpy.flatnonzero(target_mask).tolist():
+        stack = [target]
+        while stack:
+            current = stack.pop()
+            for predecessor in _neighbors[_offsets[current] : _offsets[current + 1]]:
+                if marks[predecessor] != target:
+                    marks[predecessor] = target
+                    pair_sources.append(predecessor)
+                    pair_targets.append(target)
+                    stack.append(predecessor)
+    return (
+        numpy.array(pair_sources, dtype=numpy.int64),
+        numpy.array(pair_targets, dtype=numpy.int64),
+    )
+
+
+def weakly_connected_components(
+    sources: IntArray, targets: IntArray, size: int
+) -> IntArray:
+    """Label every node with the smallest node of its weakly connected component.
+
+    Labels are propagated along the links in both directions until they are stable.
+    """
+    labels = numpy.arange(size, dtype=numpy.int64)
+    while True:
+        previous = labels
+        smallest = numpy.minimum(labels[sources], labels[targets])
+        labels = labels.copy()
+        numpy.minimum.at(labels, sources, smallest)
+        numpy.minimum.at(labels, targets, smallest)
+        # pointer jumping, every label is a node of the same component
+        labels = labels[labels]
+        if numpy.array_equal(labels, previous):
+            return labels
+
+
+PairFunction = Callable[..., Tuple[IntArray, IntArray]]
+
+
+def parallel_pairs(  # pylint: disable=too-many-arguments,too-many-locals
+    pair_function: PairFunction,
+    sources: IntArray,
+    targets: IntArray,
+    size: int,
+    workers: int,
+    masks: Dict[str, Optional[BoolArray]],
+) -> Tuple[IntArray, IntArray]:
+    """Apply pair_function, i.e. reachable_pairs() or ancestor_pairs(),
+    to batches of weakly connected components in a pool of worker processes.
+
+    No path leaves its component, so the batches are independent.
+    Batches are built from consecutive components and their results are
+    concatenated in the same order, independent of the number of workers.
+    """
+    labels = weakly_connected_components(sources, targets, size)
+    link_components = labels[sources]
+    order = numpy.argsort(link_components, kind="stable")
+    # every component goes to the batch in which its first link falls,
+    # aiming at four batches per worker
+    sorted_components = link_components[order]
+    starts = numpy.flatnonzero(
+        numpy.concatenate([[True], sorted_components[1:] != sorted_components[:-1]])
+    )
+    batch_size = max(1, len(order) // (workers * 4))
+    run_starts = numpy.repeat(starts, numpy.diff(numpy.append(starts, len(order))))
+    batches = run_starts // batch_size
+    cuts = numpy.flatnonzero(batches[1:] != batches[:-1]) + 1
+    tasks = [
+        (pair_function, sources[batch], targets[batch], masks)
+        for batch in numpy.split(order, cuts)
+        if len(batch)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_batch_pairs, tasks))
+    if not results:
+        empty = numpy.array([], dtype=numpy.int64)
+        return empty, empty
+    return (
+        numpy.concatenate([result[0] for result in results]),
+        numpy.concatenate([result[1] for result in results]),
+    )
+
+
+def _batch_pairs(
+    task: Tuple[PairFunction, IntArray, IntArray, Dict[str, Optional[BoolArray]]],
+) -> Tuple[IntArray, IntArray]:
+    """Run a pair function on the links of one batch with local node numbers."""
+    pair_function, sources, targets, masks = task
+    batch_nodes, local = numpy.unique(
+        numpy.concatenate([sources, targets]), return_inverse=True
+    )
+    local_masks = {
+        name: None if mask is None else mask[batch_nodes] for name, mask in masks.items()
+    }
+    pair_sources, pair_targets = pair_function(
+        local[: len(sources)], local[len(sources) :], len(batch_nodes), **local_masks
+    )
+    return batch_nodes[pair_sources], batch_nodes[pair_targets]
+
+
+def decode_links(nodes: DataFrame, sources: IntArray, targets: IntArray) -> DataFrame:
+    """Turn pairs of encoded nodes back into the generations format."""
+    inputs = nodes.take(sources).set_axis(INPUT_COLUMNS, axis=1).reset_index(drop=True)
+    outputs = nodes.take(targets).set_axis(OUTPUT_COLUMNS, axis=1).reset_index(drop=True)
+    return pandas.concat([inputs, outputs], axis=1)
+
+
+def node_mask(nodes: DataFrame, keys: DataFrame) -> BoolArray:
+    """Select the nodes present in keys.
+
+    keys holds a subset of the node columns, values are compared
+    by their string representation.
+    """
+    interner = KeyInterner(list(keys.columns))
+    interner.intern(keys)
+    return interner.lookup(nodes[list(keys.columns)]) >= 0
+
+
+def transitive_closure(
+    link_table: DataFrame,
+    sources: Optional[DataFrame] = None,
+    targets: Optional[DataFrame] = None,
+    workers: int = 1,
+) -> DataFrame:
+    """Add all links resulting from chains of links to a generations DataFrame.
+
+    Gives the same links as create_indirect_links_recursive()
+    without repeatedly merging the DataFrame with itself.
+    The links are sorted by all columns, not in the order in which
+    the merges discover them (see merge_order.MergeOrder).
+    With sources or targets given, only links starting or ending in the nodes
+    they contain are returned (see node_mask()).
+    The links in between are not filtered.
+    With more than one worker, weakly connected components are processed
+    in parallel (see parallel_pairs()).
+    """
+    link_sources, link_targets, nodes = encode_nodes(link_table)
+    masks = {
+        "source_mask": None if sources is None else node_mask(nodes, sources),
+        "target_mask": None if targets is None else node_mask(nodes, targets),
+    }
+    if workers > 1:
+        pair_sources, pair_targets = parallel_pairs(
+            reachable_pairs, link_sources, link_targets, len(nodes), workers, masks
+        )
+    else:
+        pair_sources, pair_targets = reachable_pairs(
+            link_sources, link_targets, len(nodes), **masks
+        )
+    closure = decode_links(nodes, pair_sources, pair_targets)
+    return closure.sort_values(by=INPUT_COLUMNS + OUTPUT_COLUMNS).reset_index(drop=True)
+
+
+def targeted_closure(
+    link_table: DataFrame, output_versions: Iterable[str], workers: int = 1
+) -> DataFrame:
+    """Compute only the part of the transitive closure,
+    that links into variables of the given versions.
+
+    Gives the same result as filtering the output of transitive_closure()
+    by output_version, without computing links into other versions.
+    """
+    sources, targets, nodes = encode_nodes(link_table)
+    versions = nodes["version"].isin(list(output_versions)).to_numpy()
+    has_input = numpy.zeros(len(nodes), dtype=bool)
+    has_input[targets] = True
+    masks = {"target_mask": versions & has_input}
+    if workers > 1:
+        pair_sources, pair_targets = parallel_pairs(
+            ancestor_pairs, sources, targets, len(nodes), workers, masks
+        )
+    else:
+        pair_sources, pair_targets = ancestor_pairs(sources, targets, len(nodes), **masks)
+    closure = decode_links(nodes, pair_sources, pair_targets)
+    return closure.sort_values(by=INPUT_COLUMNS + OUTPUT_COLUMNS).reset_index(drop=True)
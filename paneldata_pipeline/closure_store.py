@@ -0,0 +1,236 @@
+"""Persistent SQLite storage of links and their transitive closure."""
+import sqlite3
+from pathlib import Path
+from types import TracebackType
+from typing import Iterable, List, Optional, Tuple, Type
+
+import numpy
+import pandas
+from pandas import DataFrame
+
+from paneldata_pipeline.closure import (
+    INPUT_COLUMNS,
+    NODE_COLUMNS,
+    OUTPUT_COLUMNS,
+    encode_nodes,
+    node_mask,
+    reachable_pairs,
+)
+from paneldata_pipeline.interning import IntArray
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY, study TEXT, dataset TEXT, version TEXT, variable TEXT
+);
+CREATE TABLE IF NOT EXISTS links (
+    source INTEGER, target INTEGER, PRIMARY KEY (source, target)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS closure (
+    source INTEGER, target INTEGER, PRIMARY KEY (source, target)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS closure_target ON closure (target, source);
+"""
+
+ADD_LINK = """
+INSERT OR IGNORE INTO closure (source, target)
+SELECT ancestors.id, descendants.id
+FROM (SELECT source AS id FROM closure WHERE target = :source UNION SELECT :source)
+    AS ancestors,
+    (SELECT target AS id FROM closure WHERE source = :target UNION SELECT :target)
+    AS descendants
+"""
+
+
+class ClosureStore:
+    """Keep the transitive closure of a generations DataFrame in a SQLite file.
+
+    update() compares the given links with the links of the previous run.
+    New links add their new reachability to the stored closure.
+    For removed links, only the closure of variables leading into them
+    is computed again::
+
+        with ClosureStore(Path("closure.sqlite")) as store:
+            store.update(generations)
+            links = store.links()
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "ClosureStore":
+        return self
+
+    def __exit__(
+        self,
+        exception_type: Optional[Type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the connection to the SQLite file."""
+        self.connection.close()
+
+    def update(self, link_table: DataFrame) -> None:
+        """Bring the stored closure up to date with the links in link_table."""
+        sources, targets, nodes = encode_nodes(link_table)
+        node_ids = self._node_ids(nodes)
+        new_links = DataFrame(
+            {"source": node_ids[sources], "target": node_ids[targets]}
+        ).drop_duplicates()
+        stored_links = pandas.read_sql_query(
+            "SELECT source, target FROM links", self.connection
+        )
+        compared = new_links.merge(stored_links, how="outer", indicator=True)
+        added = compared[compared["_merge"] == "left_only"]
+        removed = compared[compared["_merge"] == "right_only"]
+
+        with self.connection:
+            if stored_links.empty:
+                self._insert_links(added)
+                self._recompute(None)
+                return
+            if not removed.empty:
+                self._remove_links(removed)
+            if not added.empty:
+                self._insert_links(added)
+                self.connection.executemany(
+                    ADD_LINK,
+                    (
+                        {"source": source, "target": target}
+                        for source, target in zip(
+                            added["source"].tolist(), added["target"].tolist()
+                        )
+                    ),
+                )
+
+    def links(
+        self,
+        sources: Optional[DataFrame] = None,
+        targets: Optional[DataFrame] = None,
+        output_versions: Optional[Iterable[str]] = None,
+    ) -> DataFrame:
+        """Export the stored closure in the generations format.
+
+        sources and targets select links by their start and end (see node_mask()),
+        output_versions selects links ending in the given versions.
+        """
+        query = (
+            "SELECT "
+            + ", ".join(f"i.{column}" for column in NODE_COLUMNS)
+            + ", "
+            + ", ".join(f"o.{column}" for column in NODE_COLUMNS)
+            + " FROM closure JOIN nodes AS i ON i.id = closure.source"
+            " JOIN nodes AS o ON o.id = closure.target"
+        )
+        parameters: List[str] = []
+        if output_versions is not None:
+            parameters = [str(version) for version in output_versions]
+            query += f" WHERE o.version IN ({', '.join('?' * len(parameters))})"
+        closure = DataFrame(
+            self.connection.execute(query, parameters).fetchall(),
+            columns=INPUT_COLUMNS + OUTPUT_COLUMNS,
+        )
+        mask = numpy.ones(len(closure), dtype=bool)
+        if sources is not None:
+            mask &= node_mask(
+                closure[INPUT_COLUMNS].set_axis(NODE_COLUMNS, axis=1), sources
+            )
+        if targets is not None:
+            mask &= node_mask(
+                closure[OUTPUT_COLUMNS].set_axis(NODE_COLUMNS, axis=1), targets
+            )
+        return (
+            closure[mask]
+            .sort_values(by=INPUT_COLUMNS + OUTPUT_COLUMNS)
+            .reset_index(drop=True)
+        )
+
+    def _node_ids(self, nodes: DataFrame) -> IntArray:
+        """Look up the stored id of every node, new nodes are stored first."""
+        nodes = nodes.astype(str).where(nodes.notna(), None)
+        stored = pandas.read_sql_query(
+            "SELECT id, study, dataset, version, variable FROM nodes", self.connection
+        )
+        merged = nodes.merge(stored, how="left", on=NODE_COLUMNS)
+        missing = merged["id"].isna().to_numpy()
+        next_id = int(stored["id"].max()) + 1 if not stored.empty else 0
+        ids = merged["id"].to_numpy(dtype=numpy.float64, copy=True)
+        ids[missing] = numpy.arange(next_id, next_id + missing.sum())
+        merged["id"] = ids.astype(numpy.int64)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO nodes (id, study, dataset, version, variable)"
+                " VALUES (?, ?, ?, ?, ?)",
+                merged.loc[missing, ["id"] + NODE_COLUMNS]
+                .astype(object)
+                .itertuples(index=False, name=None),
+            )
+        return numpy.asarray(merged["id"], dtype=numpy.int64)
+
+    def _insert_links(self, links: DataFrame) -> None:
+        self.connection.executemany(
+            "INSERT INTO links (source, target) VALUES (?, ?)",
+            _int_pairs(links["source"], links["target"]),
+        )
+
+    def _remove_links(self, links: DataFrame) -> None:
+        """Remove links and compute the closure of all nodes leading into them again."""
+        self.connection.execute("CREATE TEMP TABLE removed (source INTEGER)")
+        self.connection.executemany(
+            "INSERT INTO removed (source) VALUES (?)",
+            ((source,) for source in links["source"].unique().tolist()),
+        )
+        affected = [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT source FROM closure WHERE target IN (SELECT source FROM removed)"
+                " UNION SELECT source FROM removed"
+            )
+        ]
+        self.connection.execute("DROP TABLE removed")
+        self.connection.executemany(
+            "DELETE FROM links WHERE source = ? AND target = ?",
+            _int_pairs(links["source"], links["target"]),
+        )
+        self._recompute(affected)
+
+    def _recompute(self, affected: Optional[List[int]]) -> None:
+        """Compute the closure of the affected nodes from the stored links.
+
+        With affected set to None the complete closure is computed.
+        """
+        links = pandas.read_sql_query("SELECT source, target FROM links", self.connection)
+        size = int(self.connection.execute("SELECT COUNT(*) FROM nodes").fetchone()[0])
+        source_mask = None
+        if affected is None:
+            self.connection.execute("DELETE FROM closure")
+        else:
+            source_mask = numpy.zeros(size, dtype=numpy.bool_)
+            source_mask[affected] = True
+            self.connection.executemany(
+                "DELETE FROM closure WHERE source = ?",
+                ((source,) for source in affected),
+            )
+        pair_sources, pair_targets = reachable_pairs(
+            numpy.asarray(links["source"], dtype=numpy.int64),
+            numpy.asarray(links["target"], dtype=numpy.int64),
+            size,
+            source_mask=source_mask,
+        )
+        self.connection.executemany(
+            "INSERT INTO closure (source, target) VALUES (?, ?)",
+            _int_pairs(pair_sources, pair_targets),
+        )
+
+
+def _int_pairs(
+    sources: Iterable[int], targets: Iterable[int]
+) -> Iterable[Tuple[int, int]]:
+    return zip(
+        numpy.asarray(sources, dtype=numpy.int64).tolist(),
+        numpy.asarray(targets, dtype=numpy.int64).tolist(),
+    )
@@ -0,0 +1,246 @@
+"""Compact storage of transitive relations as a reduced graph and its components."""
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+import numpy
+import pandas
+from pandas import DataFrame, read_csv
+
+from paneldata_pipeline.closure import (
+    adjacency,
+    encode_rows,
+    strongly_connected_components,
+)
+from paneldata_pipeline.interning import IntArray
+
+
+def compact_paths(path: Path) -> Tuple[Path, Path]:
+    """Files of the compact format written instead of the given CSV file,
+    e.g. transformations.reduced.csv and transformations.components.csv.
+
+    A compression suffix of path is kept, e.g. transformations.reduced.csv.gz
+    for transformations.csv.gz.
+    """
+    name, _, compression_suffix = path.name.partition(".csv")
+    return (
+        path.with_name(f"{name}.reduced.csv{compression_suffix}"),
+        path.with_name(f"{name}.components.csv{compression_suffix}"),
+    )
+
+
+def compact_tables(  # pylint: disable=too-many-locals
+    relations: DataFrame,
+    source_columns: Sequence[str],
+    target_columns: Sequence[str],
+) -> Tuple[DataFrame, DataFrame]:
+    """Turn transitively closed relations into their transitive reduction
+    and a table of the strongly connected component of every node.
+
+    The reduction keeps one relation between representatives of two components
+    only if no other component lies between them, and links the members of a
+    cycle in a ring. The component table lists every node under the target
+    columns with its component, its position in topological order
+    and whether the node has a relation to itself. Members of a cycle
+    relate to each other, but to themselves only if they are reflexive,
+    e.g. transformations.csv contains no relations of a variable to itself.
+    Both tables are written next to each other (see compact_paths())
+    and read by CompactRelations.
+    """
+    stacked = pandas.concat(
+        [
+            relations[list(source_columns)].set_axis(list(target_columns), axis=1),
+            relations[list(target_columns)],
+        ],
+        ignore_index=True,
+    )
+    codes, nodes = encode_rows(stacked)
+    sources, targets = codes[: len(relations)], codes[len(relations) :]
+    offsets, neighbors = adjacency(sources, targets, len(nodes))
+    labels = strongly_connected_components(offsets, neighbors)
+
+    reduced_sources, reduced_targets = transitive_reduction(sources, targets, labels)
+    reduced = pandas.concat(
+        [
+            nodes.take(reduced_sources)
+            .set_axis(list(source_columns), axis=1)
+            .reset_index(drop=True),
+            nodes.take(reduced_targets).reset_index(drop=True),
+        ],
+        axis=1,
+    )
+
+    component_count = int(labels.max()) + 1 if len(nodes) else 0
+    reflexive = numpy.zeros(len(nodes), dtype=bool)
+    reflexive[sources[sources == targets]] = True
+    components = nodes.assign(
+        component=labels, order=component_count - 1 - labels, reflexive=reflexive
+    )
+    return (
+        reduced.sort_values(by=list(reduced.columns)),
+        components.sort_values(by=["order", *target_columns]),
+    )
+
+
+def transitive_reduction(  # pylint: disable=too-many-locals
+    sources: IntArray, targets: IntArray, labels: IntArray
+) -> Tuple[IntArray, IntArray]:
+    """Reduce a transitively closed graph of encoded nodes to the fewest links
+    with the same transitive closure.
+
+    labels are the strongly connected components of the nodes,
+    numbered in reverse topological order as by strongly_connected_components().
+    """
+    size = len(labels)
+    component_count = int(labels.max()) + 1 if size else 0
+    member_offsets, members = adjacency(
+        labels, numpy.arange(size, dtype=numpy.int64), component_count
+    )
+    _member_offsets = member_offsets.tolist()
+    _members = members.tolist()
+    source_components = labels[sources]
+    target_components = labels[targets]
+    internal = source_components == target_components
+    cyclic = numpy.zeros(component_count, dtype=bool)
+    cyclic[source_components[internal]] = True
+
+    reduced_sources: List[int] = []
+    reduced_targets: List[int] = []
+    for component in numpy.flatnonzero(cyclic).tolist():
+        ring = _members[_member_offsets[component] : _member_offsets[component + 1]]
+        reduced_sources.extend(ring)
+        reduced_targets.extend(ring[1:] + ring[:1])
+
+    condensed = numpy.unique(
+        numpy.stack([source_components[~internal], target_components[~internal]]),
+        axis=1,
+    )
+    condensed_offsets, condensed_neighbors = adjacency(
+        condensed[0], condensed[1], component_count
+    )
+    _offsets = condensed_offsets.tolist()
+    _neighbors = condensed_neighbors.tolist()
+    for component in range(component_count):
+        successors = _neighbors[_offsets[component] : _offsets[component + 1]]
+        covered: Set[int] = set()
+        # successors with a higher number come first in topological order,
+        # a successor reached through an earlier one needs no own link
+        for successor in sorted(successors, reverse=True):
+            if successor in covered:
+                continue
+            reduced_sources.append(_members[_member_offsets[component]])
+            reduced_targets.append(_members[_member_offsets[successor]])
+            covered.update(_neighbors[_offsets[successor] : _offsets[successor + 1]])
+    return (
+        numpy.array(reduced_sources, dtype=numpy.int64),
+        numpy.array(reduced_targets, dtype=numpy.int64),
+    )
+
+
+class CompactRelations:  # pylint: disable=too-many-instance-attributes
+    """Expand relations written in the compact format on demand::
+
+        relations = CompactRelations(Path("transformations.csv"))
+        relations.descendants(("some-study", "some-dataset", "some-variable"))
+        for chunk in relations.expand():
+            ...
+
+    Compressed files are read through the path of the compressed CSV file,
+    e.g. transformations.csv.gz. Values are read as strings.
+    """
+
+    def __init__(self, path: Path) -> None:
+        reduced_path, components_path = compact_paths(path)
+        reduced = read_csv(reduced_path, dtype=str, keep_default_na=False)
+        components = read_csv(components_path, dtype=str, keep_default_na=False)
+        half = len(reduced.columns) // 2
+        self.source_columns: List[str] = list(reduced.columns[:half])
+        self.target_columns: List[str] = list(reduced.columns[half:])
+        self.nodes: List[Tuple[str, ...]] = list(
+            components[self.target_columns].itertuples(index=False, name=None)
+        )
+        self._ids: Dict[Tuple[str, ...], int] = {
+            node: position for position, node in enumerate(self.nodes)
+        }
+        self.labels = numpy.asarray(components["component"], dtype=numpy.int64)
+        self.reflexive = (components["reflexive"] == "True").to_numpy()
+        count = int(self.labels.max()) + 1 if len(self.labels) else 0
+        sources = self.labels[self._lookup(reduced[self.source_columns])]
+        targets = self.labels[self._lookup(reduced[self.target_columns])]
+        external = sources != targets
+        self.cyclic = numpy.zeros(count, dtype=bool)
+        self.cyclic[sources[~external]] = True
+        self._graphs = {
+            "members": adjacency(
+                self.labels, numpy.arange(len(self.labels), dtype=numpy.int64), count
+            ),
+            "descendants": adjacency(sources[external], targets[external], count),
+            "ancestors": adjacency(targets[external], sources[external], count),
+        }
+
+    def ancestors(self, key: Sequence[str]) -> List[Tuple[str, ...]]:
+        """All nodes with a relation into the node given by key."""
+        return self._related("ancestors", key)
+
+    def descendants(self, key: Sequence[str]) -> List[Tuple[str, ...]]:
+        """All nodes with a relation from the node given by key."""
+        return self._related("descendants", key)
+
+    def expand(self) -> Iterator[DataFrame]:
+        """Yield all relations of the full closure, one component of sources at a time."""
+        for component in range(len(self.cyclic)):
+            reached = self._reached_nodes("descendants", component)
+            if not reached:
+                continue
+            yield DataFrame(
+                [
+                    self.nodes[source] + self.nodes[target]
+                    for source in self._component_nodes(component)
+                    for target in reached
+                    if source != target or self.reflexive[source]
+                ],
+                columns=self.source_columns + self.target_columns,
+            )
+
+    def _related(self, name: str, key: Sequence[str]) -> List[Tuple[str, ...]]:
+        node = self._ids.get(tuple(str(part) for part in key))
+        if node is None:
+            return []
+        reached = self._reached_nodes(name, int(self.labels[node]))
+        return [
+            self.nodes[position]
+            for position in reached
+            if position != node or self.reflexive[node]
+        ]
+
+    def _reached_nodes(self, name: str, component: int) -> List[int]:
+        """Nodes of all components reached from component, including its own members
+        if it is a cycle."""
+        offsets, neighbors = self._graphs[name]
+        reached = [component] if self.cyclic[component] else []
+        seen = {component}
+        stack = [component]
+        while stack:
+            current = stack.pop()
+            for neighbor in neighbors[offsets[current] : offsets[current + 1]].tolist():
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    reached.append(neighbor)
+                    stack.append(neighbor)
+        return [
+            member
+            for reached_component in reached
+            for member in self._component_nodes(reached_component)
+        ]
+
+    def _component_nodes(self, component: int) -> List[int]:
+        member_offsets, members = self._graphs["members"]
+        nodes: List[int] = members[
+            member_offsets[component] : member_offsets[component + 1]
+        ].tolist()
+        return nodes
+
+    def _lookup(self, keys: DataFrame) -> IntArray:
+        return numpy.array(
+            [self._ids[key] for key in keys.itertuples(index=False, name=None)],
+            dtype=numpy.int64,
+        )
@@ -1,36 +1,35 @@
 """ Data manipulation functionality related to the concepts.csv."""
 import csv
 from pathlib import Path
-from typing import Dict, List, Sequence, Set, Tuple
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from paneldata_pipeline.catalog import MetadataCatalog
+from paneldata_pipeline.readers import find_input, open_text
+
+CONCEPT_COLUMNS = ["concept", "concept_name", "study", "study_name"]
+REQUIRED_INPUTS = {"variables.csv": CONCEPT_COLUMNS, "questions.csv": CONCEPT_COLUMNS}
 
 
 def extract_implicit_concepts(
-    input_path: Path, concepts_path: Path = Path(), output_concepts_path: Path = Path()
+    input_path: Path,
+    concepts_path: Path = Path(),
+    output_concepts_path: Path = Path(),
+    catalog: Optional[MetadataCatalog] = None,
 ) -> None:
-    """Add missing concepts, only in variables and questions data, to concepts.csv"""
+    """Add missing concepts, only in variables and questions data, to concepts.csv
+
+    variables.csv and questions.csv are read from catalog, if it is given.
+    All of them may be compressed, e.g. concepts.csv.gz.
+    """
     if concepts_path == Path():
         concepts_path = input_path.joinpath("concepts.csv")
     if output_concepts_path == Path():
         output_concepts_path = input_path.joinpath("concepts.csv")
+    concepts_path = find_input(concepts_path)
 
-    implicit_concepts: Dict[str, str] = {}
-
-    for path in [
-        input_path.joinpath("variables.csv"),
-        input_path.joinpath("questions.csv"),
-    ]:
-        with open(path, "r", encoding="utf8") as csv_file:
-            for row in csv.DictReader(csv_file):
-                _concept = row.get("concept", row.get("concept_name"))
-                if _concept is None:
-                    raise EnvironmentError(
-                        f"{concepts_path} is missing the 'concept' field."
-                    )
-                implicit_concepts[_concept] = row.get("study", row.get("study_name", ""))
-                if implicit_concepts[_concept] == "":
-                    raise EnvironmentError(
-                        f"{concepts_path} is missing the 'study' field."
-                    )
+    implicit_concepts = __read_implicit_concepts(
+        catalog or MetadataCatalog(input_path), concepts_path
+    )
 
     if not concepts_path.exists():
         with open(concepts_path, "w+", encoding="utf8") as concepts_csv:
@@ -67,11 +66,36 @@ def extract_implicit_concepts(
             writer.writerow({"name": concept, "study": study})
 
 
+def __read_implicit_concepts(
+    catalog: MetadataCatalog, concepts_path: Path
+) -> Dict[str, str]:
+    """Read the concepts and their study from variables.csv and questions.csv."""
+    implicit_concepts: Dict[str, str] = {}
+    for file_name, columns in REQUIRED_INPUTS.items():
+        for row in __read_rows(catalog, file_name, columns):
+            _concept = row.get("concept", row.get("concept_name"))
+            if _concept is None:
+                raise EnvironmentError(f"{concepts_path} is missing the 'concept' field.")
+            implicit_concepts[_concept] = row.get("study", row.get("study_name", ""))
+            if implicit_concepts[_concept] == "":
+                raise EnvironmentError(f"{concepts_path} is missing the 'study' field.")
+    return implicit_concepts
+
+
+def __read_rows(
+    catalog: MetadataCatalog, file_name: str, columns: List[str]
+) -> List[Dict[str, str]]:
+    """Read rows like csv.DictReader, with empty strings for missing values."""
+    table = catalog.table(file_name, columns)
+    table = table.astype(str).where(table.notna(), "")
+    return table.to_dict("records")  # type: ignore[return-value]
+
+
 def __read_explicit_concepts(
     concepts_path: Path,
 ) -> Tuple[List[Dict[str, str]], Set[str], Sequence[str]]:
     """Read content, concepts and fieldnames defined in source concepts.csv."""
-    with open(concepts_path, "r", encoding="utf8") as concepts_csv:
+    with open_text(concepts_path) as concepts_csv:
         concepts_reader = csv.DictReader(concepts_csv)
         concept_csv_content = []
         explicit_concepts = set()
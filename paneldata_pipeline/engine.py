@@ -0,0 +1,125 @@
+"""Selection of the method used to follow links in generations data."""
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, TypedDict
+
+from pandas import DataFrame
+
+from paneldata_pipeline.closure import targeted_closure, transitive_closure
+from paneldata_pipeline.closure_store import ClosureStore
+from paneldata_pipeline.out_of_core import spilled_closure, spilled_links
+from paneldata_pipeline.sql_closure import sql_closure
+
+
+class ClosureOptions(TypedDict, total=False):
+    """Optional settings for following links between variables."""
+
+    store: Path
+    workers: int
+    memory_budget: int
+    sql_backend: str
+
+
+def follow_links(  # pylint: disable=too-many-arguments
+    link_table: DataFrame,
+    name: str,
+    sources: Optional[DataFrame] = None,
+    targets: Optional[DataFrame] = None,
+    options: Optional[ClosureOptions] = None,
+    versions: Optional[Sequence[str]] = None,
+) -> DataFrame:
+    """Compute the transitive closure of link_table, see transitive_closure().
+
+    name identifies the set of links, e.g. in the file name of a closure store.
+    versions restricts a link_table, whose links never leave their version,
+    to the links of the given versions. A closure store keeps the links
+    of all versions and applies the restriction on export,
+    so that runs for other versions do not replace the stored links.
+    """
+    options = options or ClosureOptions()
+    if "store" in options:
+        with ClosureStore(_store_path(options["store"], name)) as store:
+            store.update(link_table)
+            return store.links(sources=sources, targets=targets, output_versions=versions)
+    link_table = _in_versions(link_table, versions)
+    if "sql_backend" in options:
+        return sql_closure(
+            link_table, options["sql_backend"], sources=sources, targets=targets
+        )
+    if "memory_budget" in options:
+        return spilled_closure(
+            link_table, options["memory_budget"], sources=sources, targets=targets
+        )
+    return transitive_closure(
+        link_table, sources=sources, targets=targets, workers=options.get("workers", 1)
+    )
+
+
+def follow_links_in_parts(  # pylint: disable=too-many-arguments
+    link_table: DataFrame,
+    name: str,
+    sources: Optional[DataFrame] = None,
+    targets: Optional[DataFrame] = None,
+    options: Optional[ClosureOptions] = None,
+    versions: Optional[Sequence[str]] = None,
+) -> Iterator[DataFrame]:
+    """Yield the transitive closure of link_table in parts, see follow_links().
+
+    The concatenated parts are sorted by all columns.
+    With a memory budget, every part is one partition of spilled_links(),
+    so the whole closure is never held in memory.
+    Otherwise the closure is yielded as one part.
+    """
+    options = options or ClosureOptions()
+    if "memory_budget" in options and not {"store", "sql_backend"} & set(options):
+        yield from spilled_links(
+            _in_versions(link_table, versions),
+            options["memory_budget"],
+            sources=sources,
+            targets=targets,
+        )
+    else:
+        yield follow_links(
+            link_table,
+            name,
+            sources=sources,
+            targets=targets,
+            options=options,
+            versions=versions,
+        )
+
+
+def follow_links_into(
+    link_table: DataFrame,
+    name: str,
+    output_versions: Sequence[str],
+    options: Optional[ClosureOptions] = None,
+) -> DataFrame:
+    """Compute the transitive closure of link_table into the given versions,
+    see targeted_closure()."""
+    options = options or ClosureOptions()
+    if "store" in options:
+        with ClosureStore(_store_path(options["store"], name)) as store:
+            store.update(link_table)
+            return store.links(output_versions=output_versions)
+    if "sql_backend" in options:
+        return sql_closure(
+            link_table, options["sql_backend"], output_versions=output_versions
+        )
+    if "memory_budget" in options:
+        return spilled_closure(
+            link_table, options["memory_budget"], output_versions=output_versions
+        )
+    return targeted_closure(
+        link_table, output_versions, workers=options.get("workers", 1)
+    )
+
+
+def _store_path(folder: Path, name: str) -> Path:
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder.joinpath(f"{name}_closure.sqlite")
+
+
+def _in_versions(link_table: DataFrame, versions: Optional[Sequence[str]]) -> DataFrame:
+    if versions is None:
+        return link_table
+    return link_table[link_table["output_version"].isin(list(versions))]
@@ -0,0 +1,122 @@
+"""Dense integer ids for composite keys like (study, dataset, variable)."""
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy
+import pandas
+from numpy.typing import NDArray
+from pandas import DataFrame, Series
+
+IntArray = NDArray[numpy.int64]
+BoolArray = NDArray[numpy.bool_]
+
+
+class KeyInterner:
+    """Give every distinct key of the given columns a dense integer id.
+
+    Joins, deduplication and membership tests can then work on the ids,
+    the original values are only needed again for the output::
+
+        interner = KeyInterner(["study", "dataset", "variable"])
+        input_ids = interner.intern(links[INPUT_KEY_COLUMNS])
+        known = interner.lookup(variables[["study", "dataset", "name"]]) >= 0
+        interner.decode(input_ids)
+
+    Tables passed to the methods hold the key columns in the order of columns,
+    their names do not matter. Values are compared by their string representation,
+    missing values only match missing values.
+    """
+
+    def __init__(self, columns: Sequence[str]) -> None:
+        self.columns = list(columns)
+        self._keys = pandas.MultiIndex.from_arrays(
+            [[] for _ in self.columns], names=self.columns
+        )
+        self._rows: Optional[DataFrame] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def intern(self, table: DataFrame) -> IntArray:
+        """Return the id of every row of table, new keys get the next free ids
+        in the order of their first row."""
+        keys = self._index(table)
+        codes, first_positions = _factorize(keys)
+        distinct = keys[first_positions]
+        ids = numpy.asarray(self._keys.get_indexer(distinct), dtype=numpy.int64)
+        new = ids < 0
+        if new.any():
+            ids[new] = numpy.arange(len(self._keys), len(self._keys) + new.sum())
+            rows = table.iloc[first_positions[new]].set_axis(self.columns, axis=1)
+            if self._rows is None:
+                self._keys = distinct[new]
+                self._rows = rows.reset_index(drop=True)
+            else:
+                self._keys = self._keys.append(distinct[new])
+                self._rows = pandas.concat([self._rows, rows], ignore_index=True)
+        return ids[codes]
+
+    def lookup(self, table: DataFrame) -> IntArray:
+        """Return the id of every row of table, -1 for unknown keys."""
+        return numpy.asarray(
+            self._keys.get_indexer(self._index(table)), dtype=numpy.int64
+        )
+
+    @property
+    def keys(self) -> DataFrame:
+        """The original values of all keys, the id of a key is its row position."""
+        return self.decode(numpy.arange(len(self), dtype=numpy.int64))
+
+    def decode(self, ids: IntArray) -> DataFrame:
+        """Rows with the original values of the keys with the given ids,
+        as they were first interned."""
+        if self._rows is None:
+            return DataFrame(columns=self.columns).take(ids)
+        return self._rows.take(ids).reset_index(drop=True)
+
+    def _index(self, table: DataFrame) -> pandas.MultiIndex:
+        if len(table.columns) != len(self.columns):
+            raise ValueError(
+                f"Expected the key columns {self.columns}, got {list(table.columns)}."
+            )
+        arrays: List[Series] = [
+            _comparable(table.iloc[:, position]) for position in range(len(self.columns))
+        ]
+        return pandas.MultiIndex.from_arrays(arrays, names=self.columns)
+
+
+def _factorize(keys: pandas.MultiIndex) -> Tuple[IntArray, IntArray]:
+    """Number the distinct keys in the order of their first row.
+
+    Returns the number of every key and the first row of every distinct key.
+    """
+    sizes = [len(level) + 1 for level in keys.levels]
+    if math.prod(sizes) < numpy.iinfo(numpy.int64).max:
+        # one integer per key from the codes of its values, -1 for missing values
+        combined = numpy.zeros(len(keys), dtype=numpy.int64)
+        for size, level_codes in zip(sizes, keys.codes):
+            combined = combined * size + level_codes + 1
+        codes = pandas.factorize(combined)[0]
+    else:
+        codes = numpy.asarray(
+            DataFrame(dict(enumerate(keys.codes)))
+            .groupby(list(range(keys.nlevels)), sort=False)
+            .ngroup()
+        )
+    codes = numpy.asarray(codes, dtype=numpy.int64)
+    first_positions = numpy.empty(int(codes.max()) + 1 if len(codes) else 0, numpy.int64)
+    # assigned backwards, so the first row of every key is written last
+    first_positions[codes[::-1]] = numpy.arange(len(codes) - 1, -1, -1)
+    return codes, first_positions
+
+
+def _comparable(values: Series) -> Series:
+    """Convert values to strings, keeping missing values and categories."""
+    if isinstance(values.dtype, pandas.CategoricalDtype):
+        categories = values.cat.categories
+        if pandas.api.types.infer_dtype(categories) == "string":
+            return values
+        return values.cat.rename_categories(categories.astype(str).tolist())
+    if pandas.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+        return values
+    return values.astype(str).where(values.notna())
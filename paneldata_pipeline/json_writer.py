@@ -0,0 +1,89 @@
+"""Writing of JSON files through a pool of threads, replacing each file atomically."""
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Optional, Set, Type
+
+JSON_THREADS = 4
+JSON_QUEUE_DEPTH = 16
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Write text to a temporary file next to path, which then replaces path,
+    so readers never see a partially written file."""
+    temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temporary, "x", encoding="utf8") as output:
+            output.write(text)
+        os.replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+
+
+def dump_json(document: Any, path: Path, **dump_options: Any) -> None:
+    """Encode document like json.dump() with dump_options and write it atomically."""
+    write_atomic(path, json.dumps(document, **dump_options))
+
+
+class JsonWriter:
+    """Write many JSON files concurrently::
+
+        with JsonWriter(threads=4, queue_depth=16) as writer:
+            for name, document in documents.items():
+                writer.write(folder.joinpath(f"{name}.json"), document, indent=2)
+
+    Every document is encoded into one string by write(),
+    a pool of threads writes them with write_atomic().
+    When queue_depth documents are waiting or being written, write() blocks,
+    which bounds the memory held by encoded documents.
+    Errors of the threads are raised by a later write() or on close().
+    """
+
+    def __init__(
+        self, threads: int = JSON_THREADS, queue_depth: int = JSON_QUEUE_DEPTH
+    ) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="json-writer"
+        )
+        self._slots = threading.BoundedSemaphore(max(queue_depth, 1))
+        self._pending: Set["Future[None]"] = set()
+
+    def __enter__(self) -> "JsonWriter":
+        return self
+
+    def __exit__(
+        self,
+        exception_type: Optional[Type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exception is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True)
+
+    def write(self, path: Path, document: Any, **dump_options: Any) -> None:
+        """Encode document like json.dump() with dump_options
+        and queue it for writing to path."""
+        text = json.dumps(document, **dump_options)
+        self._raise_errors(wait=False)
+        self._slots.acquire()  # pylint: disable=consider-using-with
+        future = self._executor.submit(write_atomic, path, text)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.add(future)
+
+    def close(self) -> None:
+        """Wait until every queued document is written."""
+        self._executor.shutdown(wait=True)
+        self._raise_errors(wait=True)
+
+    def _raise_errors(self, wait: bool) -> None:
+        done = self._pending if wait else {f for f in self._pending if f.done()}
+        self._pending = self._pending - done
+        for future in done:
+            future.result()
@@ -0,0 +1,102 @@
+"""Memory mapped index for looking up relations written by the pipeline."""
+import json
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy
+from numpy.typing import NDArray
+from pandas import DataFrame, Series
+
+from paneldata_pipeline.closure import adjacency
+from paneldata_pipeline.interning import IntArray
+from paneldata_pipeline.json_writer import dump_json
+
+SEPARATOR = "\x1f"
+
+
+def write_index(
+    relations: DataFrame,
+    source_columns: Sequence[str],
+    target_columns: Sequence[str],
+    path: Path,
+) -> None:
+    """Write relations as a folder of numpy arrays, that can be memory mapped.
+
+    nodes.npy holds the sorted, UTF-8 encoded keys of all nodes,
+    the relations are stored in CSR form in both directions.
+    """
+    source_keys = _keys(relations, source_columns)
+    target_keys = _keys(relations, target_columns)
+    nodes = numpy.unique(numpy.concatenate([source_keys, target_keys]))
+    sources = numpy.searchsorted(nodes, source_keys).astype(numpy.int64)
+    targets = numpy.searchsorted(nodes, target_keys).astype(numpy.int64)
+    path.mkdir(parents=True, exist_ok=True)
+    numpy.save(path.joinpath("nodes.npy"), nodes)
+    for name, (starts, ends) in {
+        "descendants": (sources, targets),
+        "ancestors": (targets, sources),
+    }.items():
+        offsets, neighbors = adjacency(starts, ends, len(nodes))
+        numpy.save(path.joinpath(f"{name}_offsets.npy"), offsets)
+        numpy.save(path.joinpath(f"{name}.npy"), neighbors)
+    dump_json(
+        {"source_columns": list(source_columns), "target_columns": list(target_columns)},
+        path.joinpath("index.json"),
+    )
+
+
+def _keys(relations: DataFrame, columns: Sequence[str]) -> NDArray[numpy.bytes_]:
+    parts = relations[list(columns)].astype(str)
+    keys: Series = parts.iloc[:, 0].str.cat(parts.iloc[:, 1:], sep=SEPARATOR)
+    return keys.str.encode("utf8").to_numpy(dtype=bytes)
+
+
+class LineageIndex:
+    """Look up ancestors and descendants in an index written by write_index().
+
+    The arrays are memory mapped, so opening an index reads almost nothing::
+
+        index = LineageIndex(Path("transformations.index"))
+        index.ancestors(("some-study", "some-dataset", "some-variable"))
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path.joinpath("index.json"), "r", encoding="utf8") as index_file:
+            meta = json.load(index_file)
+        self.source_columns: List[str] = meta["source_columns"]
+        self.target_columns: List[str] = meta["target_columns"]
+        self.nodes = numpy.load(path.joinpath("nodes.npy"), mmap_mode="r")
+        self._arrays = {
+            name: (
+                numpy.load(path.joinpath(f"{name}_offsets.npy"), mmap_mode="r"),
+                numpy.load(path.joinpath(f"{name}.npy"), mmap_mode="r"),
+            )
+            for name in ("ancestors", "descendants")
+        }
+
+    def ancestors(self, key: Sequence[str]) -> List[Tuple[str, ...]]:
+        """All nodes with a relation into the node given by key."""
+        return self._neighbors("ancestors", key)
+
+    def descendants(self, key: Sequence[str]) -> List[Tuple[str, ...]]:
+        """All nodes with a relation from the node given by key."""
+        return self._neighbors("descendants", key)
+
+    def _neighbors(self, name: str, key: Sequence[str]) -> List[Tuple[str, ...]]:
+        node = self._find(key)
+        if node < 0:
+            return []
+        offsets, neighbors = self._arrays[name]
+        found: IntArray = neighbors[offsets[node] : offsets[node + 1]]
+        return [
+            tuple(self.nodes[neighbor].decode("utf8").split(SEPARATOR))
+            for neighbor in found.tolist()
+        ]
+
+    def _find(self, key: Sequence[str]) -> int:
+        encoded = SEPARATOR.join(str(part) for part in key).encode("utf8")
+        position = int(numpy.searchsorted(self.nodes, encoded))
+        if position < len(self.nodes) and self.nodes[position] == encoded:
+            return position
+        return -1
@@ -1,74 +1,171 @@
 import glob
-import json
 import os
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import numpy
 import pandas
 
+from paneldata_pipeline.catalog import MetadataCatalog
+from paneldata_pipeline.json_writer import JsonWriter
+from paneldata_pipeline.output import OutputOptions, json_writer
+
+REQUIRED_INPUTS = {"instruments.csv": None, "questions.csv": None, "answers.csv": None}
+
+Record = Dict[str, Any]
+# Batch of rows converted to Python values at once by _records().
+RECORD_BATCH = 10000
+
+# Converted answers by the id() of their list while an instrument is written.
+AnswerLists = Dict[int, List[Record]]
+
+# Column names shared by every row with the same columns.
+_COLUMN_SETS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+class Row:  # pylint: disable=too-few-public-methods
+    """The values of an answer or an instrument by column name.
+
+    Rows with the same columns share one tuple of column names,
+    a row only keeps its own values instead of a dict.
+    """
+
+    __slots__ = ("columns", "values")
+
+    def __init__(self, fields: Record) -> None:
+        columns = tuple(fields)
+        self.columns = _COLUMN_SETS.setdefault(columns, columns)
+        self.values = tuple(fields.values())
+
+    def as_json(self) -> Record:
+        """The fields in the layout of the instrument JSON files."""
+        return dict(zip(self.columns, self.values))
+
+
+class Item(Row):  # pylint: disable=too-few-public-methods
+    """An item of a question, sharing the list of answers
+    with every item of the same answer list."""
+
+    __slots__ = ()
+
+    def as_json(self, answer_lists: Optional[AnswerLists] = None) -> Record:
+        """The fields in the layout of the instrument JSON files,
+        answer_lists keeps the converted answers of every answer list."""
+        fields = super().as_json()
+        answers = fields.get("answers")
+        if answer_lists is not None and isinstance(answers, list):
+            if id(answers) not in answer_lists:
+                answer_lists[id(answers)] = [answer.as_json() for answer in answers]
+            fields["answers"] = answer_lists[id(answers)]
+        return fields
+
+
+class Question:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """A question of an instrument with its items by item name."""
+
+    __slots__ = (
+        "question",
+        "name",
+        "label",
+        "label_de",
+        "items",
+        "sn",
+        "instrument",
+        "study",
+    )
+
+    def __init__(self, question_row: Record, sn: int) -> None:
+        self.question = question_row["name"]
+        self.name = question_row["name"]
+        self.label = question_row.get("label", question_row.get("text", ""))
+        self.label_de = question_row.get("label_de", question_row.get("text_de", ""))
+        self.items: Dict[Any, Item] = {}
+        self.sn = sn
+        self.instrument = question_row["instrument"]
+        self.study = question_row["study"]
+
+    def as_json(self, answer_lists: AnswerLists) -> Record:
+        """The fields in the layout of the instrument JSON files."""
+        return {
+            "question": self.question,
+            "name": self.name,
+            "label": self.label,
+            "label_de": self.label_de,
+            "items": [item.as_json(answer_lists) for item in self.items.values()],
+            "sn": self.sn,
+            "instrument": self.instrument,
+            "study": self.study,
+        }
+
+
+class Instrument:  # pylint: disable=too-few-public-methods
+    """An instrument with its questions by question name.
+
+    fields holds a placeholder for the questions, which keeps their position.
+    """
+
+    __slots__ = ("fields", "questions")
+
+    def __init__(self, fields: Record) -> None:
+        fields["questions"] = None
+        self.fields = Row(fields)
+        self.questions: Dict[Any, Question] = {}
+
+    def as_json(self) -> Record:
+        """The fields in the layout of the instrument JSON files.
+
+        The result is built for one instrument at a time while it is written.
+        """
+        answer_lists: AnswerLists = {}
+        fields = self.fields.as_json()
+        fields["questions"] = {
+            name: question.as_json(answer_lists)
+            for name, question in self.questions.items()
+        }
+        return fields
+
 
 def get_answers(
-    tables: Dict[str, pandas.DataFrame]
-) -> "OrderedDict[Tuple[str, str], List[pandas.Series]]":
-    answers: OrderedDict[Tuple[str, str], List[pandas.Series]] = OrderedDict()
-    for _, answer in tables["answers"].iterrows():
-        answer = OrderedDict(answer.dropna())
+    tables: Dict[str, pandas.DataFrame],
+) -> "OrderedDict[Tuple[str, str], List[Row]]":
+    answers: OrderedDict[Tuple[str, str], List[Row]] = OrderedDict()
+    for answer in _records(tables["answers"]):
         key = (answer["instrument"], answer["answer_list"])
-        if key not in answers:
-            answers[key] = []
-        _clean_row(answer)
-        answers[key].append(answer)
+        answers.setdefault(key, []).append(Row(_clean_row(answer)))
     return answers
 
 
 def get_instruments(
-    tables: "OrderedDict[str, pandas.Series]",
-) -> "OrderedDict[str, pandas.Series]":
-    instrument_list = [
-        OrderedDict(row.dropna()) for i, row in tables["questionnaires"].iterrows()
-    ]
-    instruments = OrderedDict([(x["name"], x) for x in instrument_list])
-
-    for instrument in instruments.values():
+    tables: Dict[str, pandas.DataFrame],
+) -> "OrderedDict[str, Instrument]":
+    instruments: OrderedDict[str, Instrument] = OrderedDict()
+    for instrument in _records(tables["questionnaires"]):
         instrument["instrument"] = instrument["name"]
-        instrument["questions"] = OrderedDict()
+        instruments[instrument["name"]] = Instrument(instrument)
     return instruments
 
 
 def fill_questions(
-    tables: "OrderedDict[str, pandas.Series]",
-    instruments: "OrderedDict[str, pandas.Series]",
-    answers: "OrderedDict[Tuple[str, str], List[pandas.Series]]",
-) -> "OrderedDict[str, pandas.Series]":
-    for _, question_row in tables["questions"].iterrows():
-        question_row.dropna(inplace=True)
-        study_name = question_row["study"]
+    tables: Dict[str, pandas.DataFrame],
+    instruments: "OrderedDict[str, Instrument]",
+    answers: "OrderedDict[Tuple[str, str], List[Row]]",
+) -> "OrderedDict[str, Instrument]":
+    for question_row in _records(tables["questions"]):
         instrument_name = question_row["instrument"]
         question_name = question_row["name"]
-        if "item" in question_row.keys():
-            item_name = question_row["item"]
-        else:
-            item_name = "root"
+        item_name = question_row.get("item", "root")
         if not instrument_name in instruments:
-            instruments[instrument_name] = OrderedDict(
-                study=study_name, instrument=instrument_name, questions=OrderedDict()
+            instruments[instrument_name] = Instrument(
+                {"study": question_row["study"], "instrument": instrument_name}
             )
-        instrument_questions = instruments[instrument_name]["questions"]
+        instrument_questions = instruments[instrument_name].questions
         if not question_name in instrument_questions:
-            question = OrderedDict()
-            question["question"] = question_name
-            question["name"] = question_name
-            question["label"] = question_row.get("label", question_row.get("text", ""))
-            question["label_de"] = question_row.get(
-                "label_de", question_row.get("text_de", "")
+            instrument_questions[question_name] = Question(
+                question_row, len(instrument_questions)
             )
-            question["items"] = OrderedDict()
-            question["sn"] = len(instrument_questions)
-            question["instrument"] = question_row["instrument"]
-            question["study"] = question_row["study"]
-            instrument_questions[question_name] = question
-        question_items = instrument_questions[question_name]["items"]
+        question_items = instrument_questions[question_name].items
         if "answer_list" in question_row:
             key = (question_row["instrument"], question_row["answer_list"])
             try:
@@ -82,22 +179,35 @@ def fill_questions(
                 ) from error
         question_row["sn"] = len(question_items)
         _clean_row(question_row)
-        question_dict = question_row.to_dict()
-        question_dict.pop("name", None)
-        question_items[item_name] = question_dict
-    for _, instrument in instruments.items():
-        for _, question in instrument["questions"].items():
-            qitems = question["items"]
-            for key, question_row in qitems.items():
-                question_row["item"] = str(key)
-                question_row["number"] = str(question_row.get("number", ""))
-                for k in [k for k in question_row.keys() if "." in k]:
-                    question_row.pop(k)
-            question["items"] = list(qitems.values())
+        question_row.pop("name", None)
+        question_row["item"] = str(item_name)
+        question_row["number"] = str(question_row.get("number", ""))
+        for k in [k for k in question_row.keys() if "." in k]:
+            question_row.pop(k)
+        question_items[item_name] = Item(question_row)
     return instruments
 
 
-def _clean_row(row: pandas.Series) -> pandas.Series:
+def _records(table: pandas.DataFrame) -> Iterator[Record]:
+    """The values of every row without its missing values,
+    like row.dropna() for every row of table.iterrows().
+
+    The values are taken from the table in batches of rows
+    instead of a Series per row.
+    """
+    columns = list(table.columns)
+    for start in range(0, len(table), RECORD_BATCH):
+        values = table.iloc[start : start + RECORD_BATCH].to_numpy()
+        present = (~pandas.isna(values)).tolist()
+        for row, row_present in zip(values.tolist(), present):
+            yield {
+                column: value
+                for column, value, keep in zip(columns, row, row_present)
+                if keep
+            }
+
+
+def _clean_row(row: Record) -> Record:
     del row["study"]
     del row["instrument"]
     if "answer_list" in row and not "question" in row:
@@ -108,41 +218,250 @@ def _clean_row(row: pandas.Series) -> pandas.Series:
 
 
 def write_json(
-    instruments: "OrderedDict[str, pandas.Series]", output_folder: Path
+    instruments: "OrderedDict[str, Instrument]",
+    output_folder: Path,
+    writer: Optional[JsonWriter] = None,
 ) -> None:
     if not output_folder.exists():
         os.mkdir(output_folder)
+    if writer is None:
+        with JsonWriter() as own_writer:
+            write_json(instruments, output_folder, own_writer)
+        return
 
     for instrument_name, instrument in instruments.items():
-        with open(
-            output_folder.joinpath(f"{instrument_name}.json"), "w", encoding="utf8"
-        ) as json_file:
-            json.dump(instrument, json_file, indent=2, ensure_ascii=False)
+        writer.write(
+            output_folder.joinpath(f"{instrument_name}.json"),
+            instrument.as_json(),
+            indent=2,
+            ensure_ascii=False,
+        )
 
 
-def merge_instruments(
+def merge_instruments(  # pylint: disable=too-many-arguments
     input_folder: Path = Path("metadata").absolute(),
     output_folder: Path = Path("ddionrails/instruments").absolute(),
+    catalog: Optional[MetadataCatalog] = None,
+    workers: int = 1,
+    chunk_size: Optional[int] = None,
+    output_options: Optional[OutputOptions] = None,
 ) -> None:
+    """Write one JSON file per instrument.
+
+    The files are written by a JsonWriter, configured by the json_threads
+    and json_queue_depth output options.
+
+    With more than one worker, batches of instruments are built and written
+    in a pool of worker processes (see instrument_batches()).
+    With chunk_size, questions.csv and answers.csv are streamed instead,
+    see stream_instruments().
+    """
+    catalog = catalog or MetadataCatalog(input_folder)
     if output_folder.name != "instruments":
         output_folder.joinpath("instruments")
     if not output_folder.exists():
         os.mkdir(output_folder)
+    instruments_folder = output_folder.joinpath("instruments")
+
+    if chunk_size is not None:
+        _remove_json(instruments_folder)
+        instruments_folder.mkdir(exist_ok=True)
+        with json_writer(output_options) as writer:
+            stream_instruments(catalog, instruments_folder, chunk_size, writer)
+        return
+
     tables = OrderedDict(
-        questionnaires=pandas.read_csv(
-            input_folder.joinpath("instruments.csv"), encoding="utf-8"
-        ),
-        questions=pandas.read_csv(
-            input_folder.joinpath("questions.csv"), encoding="utf-8"
-        ),
-        answers=pandas.read_csv(input_folder.joinpath("answers.csv"), encoding="utf-8"),
+        questionnaires=catalog.table("instruments.csv"),
+        questions=catalog.table("questions.csv"),
+        answers=catalog.table("answers.csv"),
     )
 
+    if workers > 1:
+        tasks = [
+            (batch, instruments_folder, output_options)
+            for batch in instrument_batches(tables, workers * 4)
+        ]
+        _remove_json(instruments_folder)
+        instruments_folder.mkdir(exist_ok=True)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_write_batch, tasks))
+        return
+
     answers = get_answers(tables)
 
     instruments = get_instruments(tables)
 
     fill_questions(tables, instruments, answers)
-    for _file in glob.glob(str(output_folder.joinpath("instruments/*.json"))):
+    _remove_json(instruments_folder)
+    with json_writer(output_options) as writer:
+        write_json(instruments, instruments_folder, writer)
+
+
+def _remove_json(folder: Path) -> None:
+    for _file in glob.glob(str(folder.joinpath("*.json"))):
         os.remove(_file)
-    write_json(instruments, output_folder.joinpath("instruments"))
+
+
+def stream_instruments(
+    catalog: MetadataCatalog, output_folder: Path, chunk_size: int, writer: JsonWriter
+) -> None:
+    """Build and write one instrument at a time.
+
+    questions.csv and answers.csv are read in chunks of chunk_size rows
+    and have to be sorted by the string of their instrument column,
+    e.g. with `sort` and LC_ALL=C, otherwise a ValueError is raised.
+    Only instruments.csv and the rows of one instrument are kept in memory.
+    Columns get the types they would get when the whole file is read,
+    so the files are the same as the ones of merge_instruments().
+    """
+    questionnaires = catalog.table("instruments.csv")
+    questionnaire_rows: Dict[str, List[int]] = {}
+    for position, name in enumerate(questionnaires["name"].tolist()):
+        questionnaire_rows.setdefault(str(name), []).append(position)
+
+    questions = _instrument_groups(catalog.path("questions.csv"), chunk_size)
+    answers = _instrument_groups(catalog.path("answers.csv"), chunk_size)
+    next_questions = next(questions, None)
+    next_answers = next(answers, None)
+    while next_questions is not None or next_answers is not None:
+        instrument = min(
+            group[0] for group in (next_questions, next_answers) if group is not None
+        )
+        tables = {
+            "questionnaires": questionnaires.take(questionnaire_rows.pop(instrument, [])),
+            "questions": pandas.DataFrame(),
+            "answers": pandas.DataFrame(),
+        }
+        if next_questions is not None and next_questions[0] == instrument:
+            tables["questions"] = next_questions[1]
+            next_questions = next(questions, None)
+        if next_answers is not None and next_answers[0] == instrument:
+            tables["answers"] = next_answers[1]
+            next_answers = next(answers, None)
+        write_json(_build(tables), output_folder, writer)
+    # instruments without any questions
+    for positions in questionnaire_rows.values():
+        tables = {
+            "questionnaires": questionnaires.take(positions),
+            "questions": pandas.DataFrame(),
+            "answers": pandas.DataFrame(),
+        }
+        write_json(_build(tables), output_folder, writer)
+
+
+def _instrument_groups(
+    path: Path, chunk_size: int
+) -> Iterator[Tuple[str, pandas.DataFrame]]:
+    """Read a CSV file sorted by instrument in chunks
+    and yield the rows of one instrument at a time."""
+    dtypes = _column_dtypes(path, chunk_size)
+    strings = {column: str for column, dtype in dtypes.items() if dtype is None}
+    instrument: Optional[str] = None
+    pending: List[pandas.DataFrame] = []
+    for chunk in pandas.read_csv(path, chunksize=chunk_size, dtype=strings):
+        if chunk.empty:
+            continue
+        for column, dtype in dtypes.items():
+            if dtype is not None and chunk[column].dtype != dtype:
+                chunk[column] = chunk[column].astype(dtype)
+        keys = chunk["instrument"].astype(str).to_numpy()
+        starts = numpy.flatnonzero(
+            numpy.concatenate([[True], keys[1:] != keys[:-1]])
+        ).tolist()
+        for start, end in zip(starts, starts[1:] + [len(chunk)]):
+            if keys[start] == instrument:
+                pending.append(chunk.iloc[start:end])
+                continue
+            if instrument is not None:
+                if keys[start] < instrument:
+                    raise ValueError(
+                        f"{path.name} is not sorted by instrument, "
+                        f"`{keys[start]}` follows `{instrument}`."
+                    )
+                yield instrument, pandas.concat(pending)
+            instrument = keys[start]
+            pending = [chunk.iloc[start:end]]
+    if instrument is not None:
+        yield instrument, pandas.concat(pending)
+
+
+def _column_dtypes(
+    path: Path, chunk_size: int
+) -> Dict[str, Optional["numpy.dtype[Any]"]]:
+    """The type of every column when the whole CSV file is read at once.
+
+    Chunks with numbers and missing values make a column of integers float,
+    chunks with booleans and missing values make it object, holding the booleans.
+    Columns with text in any chunk are read as strings, marked by None.
+    """
+    dtypes: Dict[str, Optional["numpy.dtype[Any]"]] = {}
+    for chunk in pandas.read_csv(path, chunksize=chunk_size):
+        for column, dtype in chunk.dtypes.items():
+            column = str(column)
+            known = dtypes.setdefault(column, dtype)
+            if dtype == object and _booleans(chunk[column]):
+                if known is not None:
+                    dtypes[column] = numpy.dtype(object)
+            elif dtype == object:
+                dtypes[column] = None
+            elif known is None or known == dtype:
+                continue
+            elif {known.kind, dtype.kind} <= {"i", "u", "f"}:
+                dtypes[column] = numpy.result_type(known, dtype)
+            else:
+                dtypes[column] = numpy.dtype(object)
+    return dtypes
+
+
+def _booleans(values: pandas.Series) -> bool:
+    """Whether an object column holds only booleans and missing values."""
+    return bool(pandas.api.types.infer_dtype(values, skipna=True) == "boolean")
+
+
+def instrument_batches(
+    tables: Dict[str, pandas.DataFrame], batches: int
+) -> List[Dict[str, pandas.DataFrame]]:
+    """Split the tables into at most the given number of batches of instruments.
+
+    All rows of an instrument are in the same batch, so batches can be built
+    independently. Instruments are assigned to batches in the order
+    they first appear in instruments.csv, questions.csv and answers.csv.
+    """
+    instrument_columns = {
+        "questionnaires": "name",
+        "questions": "instrument",
+        "answers": "instrument",
+    }
+    codes, instruments = pandas.factorize(
+        numpy.concatenate(
+            [
+                tables[table][column].to_numpy(dtype=object)
+                for table, column in instrument_columns.items()
+            ]
+        ),
+        use_na_sentinel=False,
+    )
+    batch_codes = codes * batches // max(1, len(instruments))
+    split: List[Dict[str, pandas.DataFrame]] = [{} for _ in range(batches)]
+    offset = 0
+    for table in instrument_columns:
+        table_codes = batch_codes[offset : offset + len(tables[table])]
+        offset += len(tables[table])
+        for batch in range(batches):
+            split[batch][table] = tables[table][table_codes == batch]
+    return [batch for batch in split if any(len(table) for table in batch.values())]
+
+
+def _build(tables: Dict[str, pandas.DataFrame]) -> "OrderedDict[str, Instrument]":
+    answers = get_answers(tables)
+    instruments = get_instruments(tables)
+    return fill_questions(tables, instruments, answers)
+
+
+def _write_batch(
+    task: Tuple[Dict[str, pandas.DataFrame], Path, Optional[OutputOptions]],
+) -> None:
+    """Build and write the instruments of one batch."""
+    tables, output_folder, output_options = task
+    with json_writer(output_options) as writer:
+        write_json(_build(tables), output_folder, writer)
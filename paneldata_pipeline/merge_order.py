@@ -0,0 +1,182 @@
+"""Order, in which the repeated merges of create_indirect_links_recursive() find links."""
+from typing import Iterator, List, Tuple
+
+import numpy
+import pandas
+from pandas import DataFrame
+
+from paneldata_pipeline.closure import INPUT_COLUMNS, NODE_COLUMNS, OUTPUT_COLUMNS
+from paneldata_pipeline.interning import IntArray, KeyInterner
+
+# Number of joined pairs of links replayed at a time
+MERGE_CHUNK = 1_000_000
+
+
+class MergeOrder:
+    """Rank links by the order, in which create_indirect_links_recursive()
+    finds them in link_table::
+
+        order = MergeOrder(link_table)
+        links.assign(rank=order.ranks(links)).sort_values(by=[..., "rank"])
+
+    Every round merges all links found so far with themselves
+    and appends the new links in the order of the merge result.
+    The rounds are replayed on encoded nodes. Only pairs of links
+    where at least one link is new are joined, at most MERGE_CHUNK pairs at a time.
+    The merge result is ordered by left row and then by right row,
+    except when pandas takes its shortcut for merges with as many pairs
+    as left rows, which is replayed as well (see _shortcut_pairs()).
+    """
+
+    def __init__(self, link_table: DataFrame) -> None:
+        self._interner = KeyInterner(NODE_COLUMNS)
+        sources = self._interner.intern(link_table[INPUT_COLUMNS])
+        targets = self._interner.intern(link_table[OUTPUT_COLUMNS])
+        self._size = max(len(self._interner), 1)
+        found = _replay(sources, targets, self._interner.keys, self._size)
+        self._order = numpy.argsort(found, kind="stable")
+        self._sorted = found[self._order]
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def ranks(self, links: DataFrame) -> IntArray:
+        """The position of every row of links in the order of the merges,
+        links that are not found get len(self)."""
+        sources = self._interner.lookup(links[INPUT_COLUMNS])
+        targets = self._interner.lookup(links[OUTPUT_COLUMNS])
+        keys = sources * self._size + targets
+        positions = numpy.searchsorted(self._sorted, keys)
+        matched = (sources >= 0) & (targets >= 0) & (positions < len(self))
+        matched[matched] = self._sorted[positions[matched]] == keys[matched]
+        ranks = numpy.full(len(links), len(self), dtype=numpy.int64)
+        ranks[matched] = self._order[positions[matched]]
+        return ranks
+
+
+def _replay(
+    sources: IntArray, targets: IntArray, nodes: DataFrame, size: int
+) -> IntArray:
+    """Encoded links in the order in which the merges find them."""
+    keys = sources * size + targets
+    # the first round merges the links with duplicates and then drops them
+    found: IntArray = keys[numpy.sort(numpy.unique(keys, return_index=True)[1])]
+    known = numpy.sort(found)
+    table_sources, table_targets = sources, targets
+    start = 0
+    while True:
+        new_keys: List[IntArray] = []
+        if _is_shortcut(table_sources, table_targets, nodes):
+            pairs: Iterator[Tuple[IntArray, IntArray]] = iter(
+                [_shortcut_pairs(table_sources, table_targets, size)]
+            )
+        else:
+            table_sources, table_targets = found // size, found % size
+            pairs = _new_pairs(table_sources, table_targets, start, size)
+        for lefts, rights in pairs:
+            candidates = table_sources[lefts] * size + table_targets[rights]
+            candidates = candidates[~numpy.isin(candidates, known)]
+            candidates = candidates[
+                numpy.sort(numpy.unique(candidates, return_index=True)[1])
+            ]
+            if new_keys:
+                candidates = candidates[
+                    ~numpy.isin(candidates, numpy.concatenate(new_keys))
+                ]
+            new_keys.append(candidates)
+        new: IntArray = numpy.concatenate(new_keys) if new_keys else found[:0]
+        if not new.size:
+            return found
+        start = len(found)
+        found = numpy.concatenate([found, new])
+        known = numpy.sort(found)
+        table_sources, table_targets = found // size, found % size
+
+
+def _new_pairs(
+    sources: IntArray, targets: IntArray, start: int, size: int
+) -> Iterator[Tuple[IntArray, IntArray]]:
+    """Join the links with themselves ordered by left row and then by right row,
+    leaving out pairs of two links before start, which were joined before."""
+    rows = numpy.arange(len(sources), dtype=numpy.int64)
+    # old left rows only meet new right rows, new left rows meet every row
+    for left_rows, right_rows in ((rows[:start], rows[start:]), (rows[start:], rows)):
+        offsets = numpy.zeros(size + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(sources[right_rows], minlength=size), out=offsets[1:])
+        right_by_source = right_rows[numpy.argsort(sources[right_rows], kind="stable")]
+        yield from _ordered_pairs(left_rows, targets[left_rows], offsets, right_by_source)
+
+
+def _ordered_pairs(
+    left_rows: IntArray, left_targets: IntArray, offsets: IntArray, right_rows: IntArray
+) -> Iterator[Tuple[IntArray, IntArray]]:
+    """Join left rows with the right rows starting at their target,
+    ordered by left row and then by right row, in chunks of about MERGE_CHUNK pairs."""
+    degrees = offsets[left_targets + 1] - offsets[left_targets]
+    chunk_ids = (numpy.cumsum(degrees) - degrees) // MERGE_CHUNK
+    boundaries = numpy.flatnonzero(numpy.diff(chunk_ids)) + 1
+    for chunk in numpy.split(numpy.arange(len(left_rows)), boundaries):
+        chunk_degrees = degrees[chunk]
+        total = int(chunk_degrees.sum())
+        if not total:
+            continue
+        firsts = numpy.cumsum(chunk_degrees) - chunk_degrees
+        positions = (
+            numpy.arange(total, dtype=numpy.int64)
+            - numpy.repeat(firsts, chunk_degrees)
+            + numpy.repeat(offsets[left_targets[chunk]], chunk_degrees)
+        )
+        yield numpy.repeat(left_rows[chunk], chunk_degrees), right_rows[positions]
+
+
+def _is_shortcut(sources: IntArray, targets: IntArray, nodes: DataFrame) -> bool:
+    """Whether pandas joins the links with themselves through its shortcut,
+    which it takes for merges with as many pairs as left rows,
+    unless the join keys are sorted and unique on one side."""
+    size = len(nodes)
+    degrees = numpy.bincount(sources, minlength=size)
+    if int(degrees[targets].sum()) != len(sources):
+        return False
+    left_codes, right_codes = [], []
+    for column in NODE_COLUMNS:
+        codes = pandas.factorize(
+            pandas.concat([nodes[column].take(targets), nodes[column].take(sources)])
+        )[0]
+        # missing values are numbered after all other values
+        codes[codes < 0] = codes.max() + 1
+        left_codes.append(codes[: len(targets)])
+        right_codes.append(codes[len(targets) :])
+    unique = len(numpy.unique(targets)) == len(targets) or len(
+        numpy.unique(sources)
+    ) == len(sources)
+    return not (unique and _is_sorted(left_codes) and _is_sorted(right_codes))
+
+
+def _is_sorted(codes: List[IntArray]) -> bool:
+    """Whether the rows of the columns of codes are in lexicographic order."""
+    steps = numpy.stack(codes, axis=1)
+    steps = steps[1:] - steps[:-1]
+    first_change = steps[numpy.arange(len(steps)), (steps != 0).argmax(axis=1)]
+    return bool((first_change >= 0).all())
+
+
+def _shortcut_pairs(
+    sources: IntArray, targets: IntArray, size: int
+) -> Tuple[IntArray, IntArray]:
+    """Join the links with themselves in the order of the shortcut of pandas.
+
+    The pairs are grouped by the join key in the order of its first left row,
+    then put at the positions of the left rows sorted by join key.
+    """
+    rows = numpy.arange(len(sources), dtype=numpy.int64)
+    offsets = numpy.zeros(size + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(sources, minlength=size), out=offsets[1:])
+    right_by_source = numpy.argsort(sources, kind="stable")
+    pairs = list(_ordered_pairs(rows, targets, offsets, right_by_source))
+    lefts = numpy.concatenate([rows[:0]] + [left for left, _ in pairs])
+    rights = numpy.concatenate([rows[:0]] + [right for _, right in pairs])
+    key_codes = pandas.factorize(targets)[0]
+    grouped = numpy.argsort(key_codes[lefts], kind="stable")
+    reverse = numpy.empty(len(rows), dtype=numpy.int64)
+    reverse[numpy.argsort(key_codes, kind="stable")] = rows
+    return lefts[grouped][reverse], rights[grouped][reverse]
@@ -0,0 +1,278 @@
+"""Transitive closure within a memory budget, spilling intermediate links to disk."""
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy
+import pandas
+from pandas import DataFrame
+
+from paneldata_pipeline.closure import (
+    NODE_COLUMNS,
+    adjacency,
+    decode_links,
+    encode_nodes,
+    node_mask,
+)
+from paneldata_pipeline.interning import IntArray
+
+# Estimated number of closure links per input link, used to choose the partitions.
+CLOSURE_GROWTH = 32
+# Estimated memory used per link while a chunk of links is extended.
+BYTES_PER_LINK = 64
+MAX_PARTITIONS = 4096
+# Number of keys taken from every file to find the middle of a partition to split.
+SPLIT_SAMPLE = 1024
+# Spilled links: all links found, links found in the last round, extended links.
+KINDS = ("known", "delta", "candidates")
+
+
+class _SpilledLinks:
+    """Links encoded as source * size + target in .npy files,
+    partitioned into ranges of keys."""
+
+    def __init__(self, folder: Path, size: int, partitions: int) -> None:
+        self.folder = folder
+        self.size = size
+        partitions = max(1, min(partitions, size * size))
+        # lowest key of every partition and the name of its folders
+        self.bounds: List[int] = [
+            size * size * index // partitions for index in range(partitions)
+        ]
+        self._names: List[int] = list(range(partitions))
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._counter = 0
+
+    @property
+    def partitions(self) -> int:
+        """The current number of partitions."""
+        return len(self.bounds)
+
+    def append(self, kind: str, keys: IntArray) -> None:
+        """Add keys to the partitions of their key ranges."""
+        if keys.size == 0:
+            return
+        partition_ids = numpy.searchsorted(self.bounds, keys, side="right") - 1
+        for partition in numpy.unique(partition_ids).tolist():
+            folder = self._folder(kind, partition)
+            folder.mkdir(parents=True, exist_ok=True)
+            self._counter += 1
+            partition_keys = keys[partition_ids == partition]
+            numpy.save(folder.joinpath(f"{self._counter}.npy"), partition_keys)
+            name = (kind, self._names[partition])
+            self._counts[name] = self._counts.get(name, 0) + len(partition_keys)
+
+    def count(self, kind: str, partition: int) -> int:
+        """Number of keys of a partition, including duplicates."""
+        return self._counts.get((kind, self._names[partition]), 0)
+
+    def chunks(self, kind: str, partition: int) -> Iterator[IntArray]:
+        """Read the keys of a partition file by file."""
+        for path in self._paths(kind, partition):
+            yield numpy.load(path)
+
+    def read(self, kind: str, partition: int) -> IntArray:
+        """Read all keys of a partition."""
+        chunks = list(self.chunks(kind, partition))
+        if not chunks:
+            return numpy.array([], dtype=numpy.int64)
+        return numpy.concatenate(chunks)
+
+    def clear(self, kind: str, partition: int) -> None:
+        """Delete all keys of a partition."""
+        for path in self._paths(kind, partition):
+            path.unlink()
+        self._counts.pop((kind, self._names[partition]), None)
+
+    def split(self, partition: int) -> bool:
+        """Split the key range of a partition in two at the median of a sample
+        of its keys and move the keys of every kind.
+
+        Returns False if the partition holds only one distinct key.
+        """
+        samples = [
+            numpy.sort(keys)[:: max(1, len(keys) // SPLIT_SAMPLE)]
+            for kind in KINDS
+            for keys in self.chunks(kind, partition)
+        ]
+        if not samples:
+            return False
+        sample = numpy.concatenate(samples)
+        lowest = self.bounds[partition]
+        bound = int(numpy.median(sample))
+        if bound <= lowest:
+            higher = sample[sample > lowest]
+            if higher.size == 0:
+                return False
+            bound = int(higher.min())
+        self.bounds.insert(partition + 1, bound)
+        self._names.insert(partition + 1, len(self._names))
+        for kind in KINDS:
+            name = (kind, self._names[partition])
+            paths = self._paths(kind, partition)
+            self._counts.pop(name, None)
+            for path in paths:
+                keys = numpy.load(path)
+                path.unlink()
+                self.append(kind, keys)
+        return True
+
+    def fit(self, partition: int, kinds: Sequence[str], limit: int) -> None:
+        """Split a partition until it holds at most limit keys of the given kinds
+        or only one distinct key."""
+        while sum(self.count(kind, partition) for kind in kinds) > limit:
+            if not self.split(partition):
+                return
+
+    def _folder(self, kind: str, partition: int) -> Path:
+        return self.folder.joinpath(kind, str(self._names[partition]))
+
+    def _paths(self, kind: str, partition: int) -> List[Path]:
+        return sorted(self._folder(kind, partition).glob("*.npy"))
+
+
+def partition_count(link_count: int, memory_budget: int) -> int:
+    """Choose the initial number of partitions, so that the closure links
+    of one partition are expected to fit into the memory budget."""
+    expected = link_count * CLOSURE_GROWTH * numpy.dtype(numpy.int64).itemsize
+    return int(min(MAX_PARTITIONS, max(1, -(-expected // max(memory_budget, 1)))))
+
+
+def spilled_closure(  # pylint: disable=too-many-arguments
+    link_table: DataFrame,
+    memory_budget: int,
+    sources: Optional[DataFrame] = None,
+    targets: Optional[DataFrame] = None,
+    output_versions: Optional[Iterable[str]] = None,
+    spill_folder: Optional[Path] = None,
+) -> DataFrame:
+    """Compute the same links as transitive_closure() and collect them in memory.
+
+    See spilled_links(), which yields the links without collecting them.
+    """
+    return pandas.concat(
+        list(
+            spilled_links(
+                link_table,
+                memory_budget,
+                sources=sources,
+                targets=targets,
+                output_versions=output_versions,
+                spill_folder=spill_folder,
+            )
+        ),
+        ignore_index=True,
+    )
+
+
+def spilled_links(  # pylint: disable=too-many-arguments,too-many-locals
+    link_table: DataFrame,
+    memory_budget: int,
+    sources: Optional[DataFrame] = None,
+    targets: Optional[DataFrame] = None,
+    output_versions: Optional[Iterable[str]] = None,
+    spill_folder: Optional[Path] = None,
+) -> Iterator[DataFrame]:
+    """Yield the same links as transitive_closure() with a bounded amount of memory.
+
+    Only the direct links are kept in memory. Links found in every round
+    are extended by one direct link in chunks of at most memory_budget bytes,
+    the results are spilled to a temporary folder inside spill_folder,
+    partitioned into ranges of their encoded links, and deduplicated
+    partition by partition. A partition whose links exceed memory_budget
+    is split in two. The rounds stop when no new links are found.
+    The links are yielded partition by partition, the concatenated partitions
+    are sorted by all columns like the result of transitive_closure().
+    output_versions selects links into the given versions like targeted_closure().
+    """
+    link_sources, link_targets, nodes = encode_nodes(link_table)
+    size = len(nodes)
+    # number the nodes in sorted order, so that sorted encoded links are sorted links
+    order = nodes.sort_values(by=NODE_COLUMNS).index.to_numpy()
+    rank = numpy.empty(size, dtype=numpy.int64)
+    rank[order] = numpy.arange(size, dtype=numpy.int64)
+    nodes = nodes.take(order).reset_index(drop=True)
+    link_sources, link_targets = rank[link_sources], rank[link_targets]
+
+    source_mask = numpy.ones(size, dtype=numpy.bool_)
+    if sources is not None:
+        source_mask &= node_mask(nodes, sources)
+    target_mask = numpy.ones(size, dtype=numpy.bool_)
+    if targets is not None:
+        target_mask &= node_mask(nodes, targets)
+    if output_versions is not None:
+        target_mask &= nodes["version"].isin(list(output_versions)).to_numpy()
+    offsets, neighbors = adjacency(link_sources, link_targets, size)
+    chunk_links = max(1, memory_budget // BYTES_PER_LINK)
+    budget_links = max(1, memory_budget // numpy.dtype(numpy.int64).itemsize)
+
+    with TemporaryDirectory(dir=spill_folder) as folder:
+        spilled = _SpilledLinks(
+            Path(folder), size, partition_count(len(link_table), memory_budget)
+        )
+        selected = source_mask[link_sources]
+        direct = numpy.unique(link_sources[selected] * size + link_targets[selected])
+        spilled.append("known", direct)
+        spilled.append("delta", direct)
+        found = len(direct) > 0
+        while found:
+            for partition in range(spilled.partitions):
+                for delta in spilled.chunks("delta", partition):
+                    for extended in _extend(delta, offsets, neighbors, size, chunk_links):
+                        spilled.append("candidates", numpy.unique(extended))
+                spilled.clear("delta", partition)
+            found = False
+            partition = 0
+            while partition < spilled.partitions:
+                spilled.fit(partition, ["candidates", "known"], budget_links)
+                candidates = numpy.unique(spilled.read("candidates", partition))
+                spilled.clear("candidates", partition)
+                known = spilled.read("known", partition)
+                new = candidates[~numpy.isin(candidates, known, assume_unique=True)]
+                if len(new):
+                    found = True
+                    spilled.append("known", new)
+                    spilled.append("delta", new)
+                partition += 1
+
+        partition = 0
+        while partition < spilled.partitions:
+            spilled.fit(partition, ["known"], budget_links)
+            pair_sources, pair_targets = _pair_arrays(
+                numpy.sort(spilled.read("known", partition)), size
+            )
+            spilled.clear("known", partition)
+            wanted = target_mask[pair_targets]
+            yield decode_links(nodes, pair_sources[wanted], pair_targets[wanted])
+            partition += 1
+
+
+def _extend(
+    keys: IntArray, offsets: IntArray, neighbors: IntArray, size: int, chunk_links: int
+) -> Iterator[IntArray]:
+    """Extend encoded links by every direct link starting at their target,
+    yielding chunks of at most about chunk_links extended links."""
+    pair_sources, pair_targets = _pair_arrays(keys, size)
+    degrees = offsets[pair_targets + 1] - offsets[pair_targets]
+    # split the links, so that no chunk creates more than chunk_links links
+    chunk_ids = (numpy.cumsum(degrees) - degrees) // chunk_links
+    boundaries = numpy.flatnonzero(numpy.diff(chunk_ids)) + 1
+    for chunk in numpy.split(numpy.arange(len(keys)), boundaries):
+        chunk_degrees = degrees[chunk]
+        total = int(chunk_degrees.sum())
+        if not total:
+            continue
+        firsts = numpy.cumsum(chunk_degrees) - chunk_degrees
+        positions = (
+            numpy.arange(total, dtype=numpy.int64)
+            - numpy.repeat(firsts, chunk_degrees)
+            + numpy.repeat(offsets[pair_targets[chunk]], chunk_degrees)
+        )
+        yield numpy.repeat(pair_sources[chunk], chunk_degrees) * size + neighbors[
+            positions
+        ]
+
+
+def _pair_arrays(keys: Iterable[int], size: int) -> Tuple[IntArray, IntArray]:
+    encoded = numpy.asarray(keys, dtype=numpy.int64)
+    return encoded // max(size, 1), encoded % max(size, 1)
@@ -0,0 +1,223 @@
+"""Locations and formats of files written by the pipeline stages."""
+import gzip
+import io
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from types import TracebackType
+from typing import (
+    IO,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Type,
+    TypedDict,
+    Union,
+)
+
+import pandas
+from pandas import DataFrame
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
+from paneldata_pipeline.compact import compact_paths, compact_tables
+from paneldata_pipeline.json_writer import JSON_QUEUE_DEPTH, JSON_THREADS, JsonWriter
+from paneldata_pipeline.lineage_index import write_index
+
+
+class OutputOptions(TypedDict, total=False):
+    """Optional settings for files written by the pipeline stages."""
+
+    lineage_index: bool
+    compact: bool
+    compression: str
+    json_threads: int
+    json_queue_depth: int
+
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def output_path(
+    output_folder: Path, file_name: str, subfolders: Sequence[str] = ()
+) -> Path:
+    """Path of an output file inside the given subfolders of output_folder.
+
+    Missing subfolders are created.
+    """
+    folder = output_folder.joinpath(*subfolders)
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder.joinpath(file_name)
+
+
+def write_relations(
+    relations: DataFrame,
+    path: Path,
+    source_columns: Sequence[str],
+    target_columns: Sequence[str],
+    options: Optional[OutputOptions] = None,
+) -> None:
+    """Write relations between source and target columns to a CSV file.
+
+    With the lineage_index option, a memory mapped index of the relations
+    is written next to it, e.g. transformations.index for transformations.csv.
+    With the compact option, relations between nodes of the same kind are written
+    as their transitive reduction and their components instead
+    (see compact.compact_tables()).
+    CSV files are compressed with the compression option (see write_csv()).
+    To write relations as they are found, use a RelationWriter.
+    """
+    options = options or OutputOptions()
+    tables: Sequence[DataFrame] = (relations,)
+    paths: Sequence[Path] = (path,)
+    if options.get("compact", False) and len(source_columns) == len(target_columns):
+        tables = compact_tables(relations, source_columns, target_columns)
+        paths = compact_paths(path)
+    for table, table_path in zip(tables, paths):
+        write_csv(table, table_path, compression=options.get("compression"))
+    if options.get("lineage_index", False):
+        write_index(relations, source_columns, target_columns, path.with_suffix(".index"))
+
+
+class RelationWriter:
+    """Write relations to CSV files part by part::
+
+        with RelationWriter(source_columns, target_columns, options) as writer:
+            for part in parts:
+                writer.write(path, part)
+
+    The parts of a path are appended to its file in the order they are written,
+    the first part writes the header, so an empty first part writes only the header.
+    The compact and lineage_index options need all relations of a file,
+    with them the parts are collected and written by write_relations() on close().
+    """
+
+    def __init__(
+        self,
+        source_columns: Sequence[str],
+        target_columns: Sequence[str],
+        options: Optional[OutputOptions] = None,
+    ) -> None:
+        self.source_columns = source_columns
+        self.target_columns = target_columns
+        self.options = options or OutputOptions()
+        self._collect = self.options.get("compact", False) or self.options.get(
+            "lineage_index", False
+        )
+        self._parts: Dict[Path, List[DataFrame]] = {}
+        self._files = ExitStack()
+        self._outputs: Dict[Path, TextIO] = {}
+
+    def __enter__(self) -> "RelationWriter":
+        return self
+
+    def __exit__(
+        self,
+        exception_type: Optional[Type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exception is None:
+            self.close()
+        else:
+            self._files.close()
+
+    def write(self, path: Path, relations: DataFrame) -> None:
+        """Append relations to the file at path."""
+        if self._collect:
+            self._parts.setdefault(path, []).append(relations)
+            return
+        output = self._outputs.get(path)
+        if output is None:
+            compression = self.options.get("compression")
+            output = self._files.enter_context(
+                open_output(compressed_path(path, compression), compression)
+            )
+            self._outputs[path] = output
+            relations.to_csv(output, index=False)
+        else:
+            relations.to_csv(output, index=False, header=False)
+
+    def close(self) -> None:
+        """Close all files and write the collected relations."""
+        self._files.close()
+        for path, parts in self._parts.items():
+            write_relations(
+                pandas.concat(parts, ignore_index=True),
+                path,
+                self.source_columns,
+                self.target_columns,
+                self.options,
+            )
+        self._parts = {}
+
+
+def write_csv(table: DataFrame, path: Path, compression: Optional[str] = None) -> Path:
+    """Write table to a CSV file and return its path.
+
+    With compression set to "gzip" or "zstd" the file gets a .gz or .zst suffix.
+    Compressed files do not contain timestamps, so unchanged tables
+    lead to identical files.
+    """
+    path = compressed_path(path, compression)
+    with open_output(path, compression) as output:
+        table.to_csv(output, index=False)
+    return path
+
+
+def json_writer(options: Optional[OutputOptions] = None) -> JsonWriter:
+    """Create a JsonWriter with the json_threads and json_queue_depth options."""
+    options = options or OutputOptions()
+    return JsonWriter(
+        threads=options.get("json_threads", JSON_THREADS),
+        queue_depth=options.get("json_queue_depth", JSON_QUEUE_DEPTH),
+    )
+
+
+def compressed_path(path: Path, compression: Optional[str]) -> Path:
+    """Add the suffix of the compression to path, e.g. transformations.csv.gz."""
+    if compression is None:
+        return path
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression: {compression}")
+    return path.with_name(path.name + COMPRESSION_SUFFIXES[compression])
+
+
+@contextmanager
+def open_output(path: Path, compression: Optional[str] = None) -> Iterator[TextIO]:
+    """Open a text file for writing, compressed with gzip or zstd."""
+    with open(path, "wb") as raw:
+        binary: Union[IO[bytes], gzip.GzipFile]
+        if compression is None:
+            binary = raw
+        elif compression == "gzip":
+            binary = gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+        elif compression == "zstd":
+            if zstandard is None:
+                raise ModuleNotFoundError(
+                    "zstd compression requires the zstandard package."
+                )
+            binary = zstandard.ZstdCompressor().stream_writer(raw)
+        else:
+            raise ValueError(f"Unknown compression: {compression}")
+        with io.TextIOWrapper(binary, encoding="utf8", newline="") as output:
+            yield output
+
+
+def as_list(value: Union[str, Sequence[str]]) -> List[str]:
+    """Wrap a single name, e.g. of a version, into a list."""
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def subfolder_for(name: str, names: Sequence[str]) -> List[str]:
+    """Output files get a subfolder per name, if there is more than one name."""
+    if len(names) > 1:
+        return [name]
+    return []
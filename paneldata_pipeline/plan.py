@@ -0,0 +1,180 @@
+"""Cheap estimates of the work done by the relation stages, printed by --plan."""
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, TypedDict, Union
+
+import numpy
+from pandas import DataFrame
+from tabulate import tabulate
+
+from paneldata_pipeline.catalog import MetadataCatalog
+from paneldata_pipeline.closure import (
+    INPUT_COLUMNS,
+    OUTPUT_COLUMNS,
+    adjacency,
+    encode_nodes,
+    strongly_connected_components,
+    weakly_connected_components,
+)
+from paneldata_pipeline.interning import IntArray
+from paneldata_pipeline.output import as_list
+
+# Copies of the closure held at the same time while it is sorted and filtered.
+PEAK_COPIES = 3
+
+
+class ClosurePlan(TypedDict):
+    """Statistics of a generations DataFrame and the estimated size of its closure."""
+
+    links: int
+    variables: int
+    max_fan_in: int
+    max_fan_out: int
+    mean_fan_out: float
+    components: int
+    largest_component: int
+    largest_cycle: int
+    longest_chain: int
+    estimated_rows: int
+    estimated_memory: int
+
+
+def closure_plan(  # pylint: disable=too-many-locals
+    link_table: DataFrame, output_versions: Optional[Sequence[str]] = None
+) -> ClosurePlan:
+    """Describe link_table and estimate the number of rows of its closure.
+
+    With output_versions, only rows linking into these versions are estimated,
+    like in targeted_closure().
+    The estimate is exact for trees and chains and an upper bound otherwise,
+    because variables reached on several paths are counted once per path,
+    up to the size of their connected component.
+    """
+    sources, targets, nodes = encode_nodes(link_table.drop_duplicates())
+    size = len(nodes)
+    fan_out = numpy.bincount(sources, minlength=size)
+    fan_in = numpy.bincount(targets, minlength=size)
+    weak_labels = weakly_connected_components(sources, targets, size)
+    component_sizes = numpy.bincount(weak_labels, minlength=size)
+    # nothing reaches more nodes than its weakly connected component contains
+    limits = component_sizes[weak_labels]
+    offsets, neighbors = adjacency(sources, targets, size)
+    labels = strongly_connected_components(offsets, neighbors)
+    cycle_sizes = numpy.bincount(labels)
+
+    has_output = fan_out > 0
+    if output_versions is None:
+        reach, longest_chain = _reach_bounds(sources, targets, labels, limits)
+        estimated_rows = int(reach.sum())
+    else:
+        # reversing the numbering of the components reverses their order,
+        # so components of the reversed links only link to lower numbers again
+        reversed_labels = (int(labels.max()) if size else 0) - labels
+        reach, longest_chain = _reach_bounds(targets, sources, reversed_labels, limits)
+        wanted = nodes["version"].isin(list(output_versions)).to_numpy()
+        estimated_rows = int(reach[wanted].sum())
+    row_memory = link_table.memory_usage(deep=True).sum() / max(len(link_table), 1)
+    return ClosurePlan(
+        links=len(sources),
+        variables=size,
+        max_fan_in=_largest(fan_in),
+        max_fan_out=_largest(fan_out),
+        mean_fan_out=(
+            round(float(fan_out[has_output].mean()), 2) if has_output.any() else 0.0
+        ),
+        components=int((component_sizes > 0).sum()),
+        largest_component=_largest(component_sizes),
+        largest_cycle=_largest(cycle_sizes),
+        longest_chain=longest_chain,
+        estimated_rows=estimated_rows,
+        estimated_memory=int(estimated_rows * row_memory * PEAK_COPIES),
+    )
+
+
+def _reach_bounds(  # pylint: disable=too-many-locals
+    sources: IntArray, targets: IntArray, labels: IntArray, node_limits: IntArray
+) -> Tuple[IntArray, int]:
+    """Bound the number of nodes reachable from every node
+    and find the longest chain of links between strongly connected components.
+
+    labels number the strongly connected components of the nodes,
+    so that every component only links to components with a lower number
+    (see closure.strongly_connected_components()).
+    Both are computed in one pass over the condensed graph
+    in reverse topological order.
+    """
+    component_count = int(labels.max()) + 1 if len(labels) else 0
+    members = numpy.bincount(labels, minlength=component_count)
+    cyclic = numpy.zeros(component_count, dtype=bool)
+    internal = labels[sources] == labels[targets]
+    cyclic[labels[sources[internal]]] = True
+    condensed = numpy.unique(
+        numpy.stack([labels[sources[~internal]], labels[targets[~internal]]]), axis=1
+    )
+    condensed_offsets, condensed_neighbors = adjacency(
+        condensed[0], condensed[1], component_count
+    )
+    limits = numpy.zeros(component_count, dtype=numpy.int64)
+    limits[labels] = node_limits
+
+    _offsets = condensed_offsets.tolist()
+    _neighbors = condensed_neighbors.tolist()
+    _members = members.tolist()
+    _cyclic = cyclic.tolist()
+    _limits = limits.tolist()
+    bounds: List[int] = [0] * component_count
+    depths: List[int] = [0] * component_count
+    # components only link to components with a lower number
+    for component in range(component_count):
+        bound = _members[component] if _cyclic[component] else 0
+        depth = 0
+        for successor in _neighbors[_offsets[component] : _offsets[component + 1]]:
+            own = 0 if _cyclic[successor] else _members[successor]
+            bound += own + bounds[successor]
+            depth = max(depth, depths[successor] + 1)
+        bounds[component] = min(bound, _limits[component])
+        depths[component] = depth
+    return (
+        numpy.array(bounds, dtype=numpy.int64)[labels],
+        max(depths, default=0),
+    )
+
+
+def _largest(values: IntArray) -> int:
+    return int(values.max()) if len(values) else 0
+
+
+def print_plan(
+    version: Union[str, Sequence[str]], input_folder: Path, engine: str = "pandas"
+) -> None:
+    """Print the statistics and estimates of -r and -q for generations.csv,
+    without running these stages."""
+    versions = as_list(version)
+    generations = MetadataCatalog(input_folder, engine=engine).table(
+        "generations.csv", INPUT_COLUMNS + OUTPUT_COLUMNS
+    )
+    # the same selection as in preprocess_transformations()
+    transformations = generations[
+        (generations["output_version"].isin(versions))
+        & (generations["input_version"] == generations["output_version"])
+    ]
+    plans = {
+        "transformations (-r)": closure_plan(transformations),
+        "questions_variables (-q)": closure_plan(generations, output_versions=versions),
+    }
+    values: List[Dict[str, object]] = [dict(plan) for plan in plans.values()]
+    rows = [
+        [name.replace("_", " ")] + [_format(name, plan[name]) for plan in values]
+        for name in ClosurePlan.__annotations__
+    ]
+    print(tabulate(rows, headers=["", *plans], tablefmt="grid"))
+
+
+def _format(name: str, value: object) -> str:
+    if name == "estimated_memory" and isinstance(value, int):
+        size = float(value)
+        for unit in ("B", "KiB", "MiB", "GiB"):
+            if size < 1024:
+                return f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.1f} TiB"
+    return str(value)
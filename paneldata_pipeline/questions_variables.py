@@ -1,7 +1,35 @@
 from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
 
+import numpy
 import pandas
-from pandas import DataFrame, read_csv
+from pandas import DataFrame
+
+from paneldata_pipeline.catalog import MetadataCatalog
+from paneldata_pipeline.closure import INPUT_COLUMNS, OUTPUT_COLUMNS
+from paneldata_pipeline.engine import ClosureOptions, follow_links_into
+from paneldata_pipeline.interning import KeyInterner
+from paneldata_pipeline.output import (
+    OutputOptions,
+    RelationWriter,
+    as_list,
+    output_path,
+    subfolder_for,
+)
+
+REQUIRED_INPUTS = {
+    "logical_variables.csv": [
+        "study",
+        "dataset",
+        "variable",
+        "instrument",
+        "question",
+        "item",
+    ],
+    "generations.csv": INPUT_COLUMNS + OUTPUT_COLUMNS,
+    "variables.csv": ["study", "name", "dataset"],
+    "datasets.csv": ["name"],
+}
 
 
 def create_indirect_links_once(link_table: DataFrame) -> DataFrame:
@@ -24,8 +52,21 @@ def create_indirect_links_once(link_table: DataFrame) -> DataFrame:
     # output_study, output_dataset, output_version, output_variable
     # 1, 1, 1, 1
 
-    temp = link_table.merge(
-        link_table,
+    temp = _join_links(link_table, link_table)
+
+    # add new rows to the original Dataframe, dropping duplicates
+    return (
+        pandas.concat([link_table, temp], ignore_index=True)
+        .drop_duplicates()
+        .reset_index(drop=True)
+    )
+
+
+def _join_links(left: DataFrame, right: DataFrame) -> DataFrame:
+    """Merge links of the left Dataframe with links of the right Dataframe,
+    that start where the left links end."""
+    temp = left.merge(
+        right,
         right_on=["input_study", "input_dataset", "input_version", "input_variable"],
         left_on=["output_study", "output_dataset", "output_version", "output_variable"],
     )
@@ -56,46 +97,109 @@ def create_indirect_links_once(link_table: DataFrame) -> DataFrame:
         "output_variable_y": "output_variable",
     }
     temp.rename(columns=rename_columns, inplace=True)
+    return temp
 
-    # add new rows to the original Dataframe, dropping duplicates
-    return (
-        pandas.concat([link_table, temp], ignore_index=True)
-        .drop_duplicates()
-        .reset_index(drop=True)
-    )
+
+def create_indirect_links_delta(
+    delta: DataFrame, link_table: DataFrame, known_links: KeyInterner
+) -> DataFrame:
+    """This function gets the links found in the previous round as input.
+
+    The function extends them by one link of link_table
+    and returns only the resulting links that are not in known_links yet.
+    known_links holds the ids of all links found so far,
+    the returned links are added to it.
+    """
+    temp = _join_links(delta, link_table).drop_duplicates()
+
+    # anti join: keep only rows whose link has no id yet
+    temp = temp[known_links.lookup(temp) < 0].reset_index(drop=True)
+    known_links.intern(temp)
+    return temp
 
 
-def create_indirect_links_recursive(link_table: DataFrame) -> DataFrame:
+def create_indirect_links_recursive(
+    link_table: DataFrame, semi_naive: bool = False
+) -> DataFrame:
     """ " This function gets a Dataframe as input.
 
     The function calls create_indirect_links_once()
     until no more new lines are added to the Dataframe.
-    """
+    With semi_naive set, create_indirect_links_delta() is called instead,
+    which only joins the lines added in the previous round with the input
+    and stops as soon as a round adds no lines.
 
-    df_copy = link_table.copy()
+    The pipeline stages follow links with engine.follow_links(),
+    this merge based computation is kept as reference for its results.
+    """
 
-    # As long as new lines are added to the Dataframe continue looking for indirect links
-    while True:
-        old_len = len(df_copy)
-        df_copy = create_indirect_links_once(df_copy)
-        new_len = len(df_copy)
-        if old_len == new_len:
-            break
+    if semi_naive:
+        direct_links = link_table.drop_duplicates().reset_index(drop=True)
+        known_links = KeyInterner(list(direct_links.columns))
+        known_links.intern(direct_links)
+        found = [direct_links]
+        delta = direct_links
+        # As long as the previous round found new lines, extend only those lines
+        while not delta.empty:
+            delta = create_indirect_links_delta(delta, direct_links, known_links)
+            found.append(delta)
+        df_copy = pandas.concat(found, ignore_index=True)
+    else:
+        df_copy = link_table.copy()
+
+        # As long as new lines are added to the Dataframe
+        # continue looking for indirect links
+        while True:
+            old_len = len(df_copy)
+            df_copy = create_indirect_links_once(df_copy)
+            new_len = len(df_copy)
+            if old_len == new_len:
+                break
 
     sort_columns = ["input_study", "input_dataset", "input_version", "input_variable"]
     return df_copy.sort_values(by=sort_columns).reset_index(drop=True)
 
 
 def create_questions_from_generations(version: str, input_folder: Path) -> DataFrame:
+    """Link variables of the given version to questions,
+    directly or through generations.csv."""
+    return create_questions_from_generations_by_version([version], input_folder)[version]
+
+
+def create_questions_from_generations_by_version(
+    versions: Sequence[str],
+    input_folder: Path,
+    closure_options: Optional[ClosureOptions] = None,
+    catalog: Optional[MetadataCatalog] = None,
+) -> Dict[str, DataFrame]:
+    """Link variables of every given version to questions.
+
+    generations.csv is read and followed only once for all versions.
+    closure_options select how links are followed (see engine.follow_links()).
+    Input files are read from catalog, if it is given.
+    """
+    return dict(
+        _questions_by_version(
+            versions, input_folder, closure_options=closure_options, catalog=catalog
+        )
+    )
+
+
+def _questions_by_version(
+    versions: Sequence[str],
+    input_folder: Path,
+    closure_options: Optional[ClosureOptions] = None,
+    catalog: Optional[MetadataCatalog] = None,
+) -> Iterator[Tuple[str, DataFrame]]:
+    """Yield the links of the variables of one version to questions at a time."""
+    catalog = catalog or MetadataCatalog(input_folder)
     # The file "logical_variables.csv" contains direct links
     # between variables and questions
     # variable1 <relates to> question1
 
-    logical_variables = read_csv(input_folder.joinpath("logical_variables.csv"))
-
-    logical_variables = logical_variables[
-        ["study", "dataset", "variable", "instrument", "question", "item"]
-    ]
+    logical_variables = catalog.table(
+        "logical_variables.csv", REQUIRED_INPUTS["logical_variables.csv"]
+    )
 
     # There are indirect links between variables and questions
     # if we look into "generations.csv".
@@ -105,20 +209,41 @@ def create_questions_from_generations(version: str, input_folder: Path) -> DataF
     # variable2 <relates to> question1
     # so variable1 relates to question1
 
-    # Read input and output version columns as type "string"
-    dtype_settings = {"input_version": str, "output_version": str}
-    generations = read_csv(input_folder.joinpath("generations.csv"), dtype=dtype_settings)
-    updated_generations = create_indirect_links_recursive(generations)
+    # Input and output version columns are read as type "string"
+    generations = catalog.table("generations.csv", REQUIRED_INPUTS["generations.csv"])
+    # Follow links backwards from the variables of the specified versions,
+    # rows with another output version are never created
+    updated_generations = follow_links_into(
+        generations, "generations", versions, options=closure_options
+    )
 
-    # Remove rows when output version is not the specified version
-    updated_generations = updated_generations[
-        updated_generations["output_version"] == version
-    ]
+    # Filter out nonexistent variables
+    variables = catalog.table("variables.csv", REQUIRED_INPUTS["variables.csv"])
+    variables.rename(columns={"name": "variable"}, inplace=True)
+
+    generations_by_version = dict(
+        list(updated_generations.groupby("output_version", observed=True))
+    )
+    for version in versions:
+        yield version, _link_questions(
+            generations_by_version.get(version, updated_generations.head(0)),
+            logical_variables,
+            variables,
+        )
 
-    indirect_relations = updated_generations.merge(
-        logical_variables,
-        left_on=("input_dataset", "input_variable"),
-        right_on=("dataset", "variable"),
+
+def _link_questions(
+    updated_generations: DataFrame, logical_variables: DataFrame, variables: DataFrame
+) -> DataFrame:
+    """Add the questions reached through the given indirect links to the direct links.
+
+    Variables are joined by their ids from a KeyInterner.
+    """
+    interner = KeyInterner(["dataset", "variable"])
+    logical_ids = interner.intern(logical_variables[["dataset", "variable"]])
+    link_ids = interner.lookup(updated_generations[["input_dataset", "input_variable"]])
+    indirect_relations = updated_generations.assign(variable_id=link_ids).merge(
+        logical_variables.assign(variable_id=logical_ids), on="variable_id"
     )
 
     wanted_columns = [
@@ -150,35 +275,61 @@ def create_questions_from_generations(version: str, input_folder: Path) -> DataF
 
     questions_variables.sort_values(by=sort_columns, inplace=True)
 
-    # Filter out nonexistent variables
-    variables: DataFrame = read_csv(
-        input_folder.joinpath("variables.csv"),
-        usecols=["study", "name", "dataset"],
-        iterator=False,
-    )
-    variables.rename(columns={"name": "variable"}, inplace=True)
-
-    questions_variables = questions_variables.merge(
-        variables,
-        left_on=["study", "variable", "dataset"],
-        right_on=["study", "variable", "dataset"],
-        how="inner",
+    # inner join with variables, rows are repeated for duplicated variables
+    variable_interner = KeyInterner(["study", "variable", "dataset"])
+    variable_ids = variable_interner.intern(variables[["study", "variable", "dataset"]])
+    matches = numpy.bincount(variable_ids, minlength=len(variable_interner))
+    question_ids = variable_interner.lookup(
+        questions_variables[["study", "variable", "dataset"]]
     )
+    known = question_ids >= 0
+    repeats = numpy.zeros(len(question_ids), dtype=numpy.int64)
+    repeats[known] = matches[question_ids[known]]
+    questions_variables = questions_variables.iloc[
+        numpy.repeat(numpy.arange(len(questions_variables)), repeats)
+    ]
     return questions_variables.reset_index(drop=True)
 
 
-def questions_from_generations(
-    version: str, input_folder: Path, output_folder: Path
+def questions_from_generations(  # pylint: disable=too-many-arguments
+    version: Union[str, Sequence[str]],
+    input_folder: Path,
+    output_folder: Path,
+    closure_options: Optional[ClosureOptions] = None,
+    output_options: Optional[OutputOptions] = None,
+    catalog: Optional[MetadataCatalog] = None,
 ) -> None:
-    questions_variables = create_questions_from_generations(
-        version, input_folder=input_folder
-    )
+    """Write questions_variables.csv for one or more versions.
 
+    With more than one version, every file is written to a subfolder
+    named after its version.
+    The versions are linked to questions and written one at a time.
+    output_options select how the result is written (see output.RelationWriter).
+    Input files are read from catalog, if it is given.
+    """
+    versions = as_list(version)
+    catalog = catalog or MetadataCatalog(input_folder)
     # keep only variables from datasets defined in datasets.csv
-
-    datasets = read_csv(input_folder.joinpath("datasets.csv"))
-    mask = questions_variables["dataset"].isin(datasets["name"].unique())
-    questions_variables = questions_variables[mask]
-    questions_variables.to_csv(
-        output_folder.joinpath("questions_variables.csv"), index=False
-    )
+    datasets = catalog.table("datasets.csv", REQUIRED_INPUTS["datasets.csv"])
+    dataset_names = datasets["name"].unique()
+
+    with RelationWriter(
+        ["study", "dataset", "variable"],
+        ["study", "instrument", "question", "item"],
+        output_options,
+    ) as writer:
+        for version_name, questions_variables in _questions_by_version(
+            versions,
+            input_folder=input_folder,
+            closure_options=closure_options,
+            catalog=catalog,
+        ):
+            mask = questions_variables["dataset"].isin(dataset_names)
+            writer.write(
+                output_path(
+                    output_folder,
+                    "questions_variables.csv",
+                    subfolder_for(version_name, versions),
+                ),
+                questions_variables[mask],
+            )
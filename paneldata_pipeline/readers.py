@@ -0,0 +1,246 @@
+"""Parsing of CSV files with a selectable, possibly multithreaded, engine."""
+import bz2
+import gzip
+import io
+import logging
+import lzma
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    IO,
+    Collection,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    TextIO,
+    Union,
+    cast,
+)
+
+import numpy
+import pandas
+from pandas import DataFrame
+
+try:
+    import pyarrow
+    from pyarrow import csv as arrow_csv
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+try:
+    import polars
+except ImportError:  # pragma: no cover
+    polars = None  # type: ignore[assignment]
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
+LOGGER = logging.getLogger(__name__)
+
+ENGINES = ["pandas", "pyarrow", "polars"]
+# Compressed variants of an input file, e.g. variables.csv.gz, in order of preference.
+INPUT_COMPRESSIONS = [".gz", ".bz2", ".xz", ".zst"]
+# Values read as missing and as booleans by pandas.read_csv().
+NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+TRUE_VALUES = ["True", "TRUE", "true"]
+FALSE_VALUES = ["False", "FALSE", "false"]
+
+Dtypes = Mapping[str, Union[type, str]]
+
+
+def available_engine(engine: str) -> str:
+    """Return engine, or pandas if the package of engine is not installed."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown CSV engine {engine}, choose one of {ENGINES}.")
+    if {"pyarrow": pyarrow, "polars": polars}.get(engine, pandas) is None:
+        LOGGER.warning("The %s package is not installed, using pandas instead.", engine)
+        return "pandas"
+    return engine
+
+
+def find_input(path: Path) -> Path:
+    """Return path, or its first compressed variant like variables.csv.gz
+    if only that exists."""
+    if path.exists():
+        return path
+    for suffix in INPUT_COMPRESSIONS:
+        compressed = path.with_name(path.name + suffix)
+        if compressed.exists():
+            return compressed
+    return path
+
+
+@contextmanager
+def open_input(path: Path) -> Iterator[IO[bytes]]:
+    """Open an input file for reading, decompressing it on the fly
+    if its suffix is one of INPUT_COMPRESSIONS."""
+    binary: IO[bytes]
+    if path.suffix == ".gz":
+        binary = cast(IO[bytes], gzip.open(path, "rb"))
+    elif path.suffix == ".bz2":
+        binary = bz2.open(path, "rb")
+    elif path.suffix == ".xz":
+        binary = lzma.open(path, "rb")
+    elif path.suffix == ".zst":
+        if zstandard is None:
+            raise ModuleNotFoundError(
+                "Reading .zst files requires the zstandard package."
+            )
+        binary = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+    else:
+        binary = open(path, "rb")  # pylint: disable=consider-using-with
+    with binary:
+        yield binary
+
+
+@contextmanager
+def open_text(path: Path) -> Iterator[TextIO]:
+    """Open an input file like open(path, encoding="utf8"), see open_input()."""
+    with open_input(path) as binary, io.TextIOWrapper(binary, encoding="utf8") as text:
+        yield text
+
+
+@contextmanager
+def _engine_source(path: Path) -> Iterator[Union[Path, IO[bytes]]]:
+    """Plain files are given to pyarrow and polars by path, so they can be mapped,
+    compressed files as decompressing stream."""
+    if path.suffix not in INPUT_COMPRESSIONS:
+        yield path
+        return
+    with open_input(path) as binary:
+        yield binary
+
+
+def read_csv(
+    path: Path,
+    engine: str = "pandas",
+    usecols: Optional[Collection[str]] = None,
+    dtype: Optional[Dtypes] = None,
+) -> DataFrame:
+    """Parse the CSV file at path into the same DataFrame as pandas.read_csv().
+
+    Compressed files are decompressed while they are parsed, see open_input().
+
+    usecols selects columns by name, missing columns are skipped.
+    dtype only supports str and "category" for the other engines,
+    like pandas.read_csv(), these columns are never converted to numbers.
+    """
+    dtype = dtype or {}
+    engine = available_engine(engine)
+    if engine == "pandas":
+        return pandas.read_csv(
+            path, usecols=None if usecols is None else usecols.__contains__, dtype=dtype
+        )
+    header: List[str] = list(pandas.read_csv(path, nrows=0).columns)
+    columns = header if usecols is None else [name for name in header if name in usecols]
+    strings = [name for name in columns if name in dtype]
+    if engine == "pyarrow":
+        table = _read_arrow(path, columns, strings)
+    else:
+        with _engine_source(path) as source:
+            table = polars.read_csv(
+                source,
+                columns=columns,
+                schema_overrides={name: polars.Utf8 for name in strings},
+                null_values=NA_VALUES,
+                infer_schema_length=None,
+                try_parse_dates=False,
+            ).to_pandas()
+    # the conversion leaves None for missing values, pandas uses NaN
+    for name in table.columns[table.dtypes == object]:
+        missing = table[name].isna()
+        if name not in strings and len(table) and missing.all():
+            table[name] = numpy.nan
+        elif missing.any():
+            table[name] = table[name].where(~missing, numpy.nan)
+    for name in strings:
+        if dtype[name] == "category":
+            table[name] = table[name].astype("category")
+    return table[columns]
+
+
+def _read_arrow(path: Path, columns: List[str], strings: List[str]) -> DataFrame:
+    """Parse with pyarrow, keeping dates and times as strings like pandas."""
+    while True:
+        try:
+            with _engine_source(path) as source:
+                table = arrow_csv.read_csv(
+                    source,
+                    parse_options=arrow_csv.ParseOptions(newlines_in_values=True),
+                    convert_options=arrow_csv.ConvertOptions(
+                        include_columns=columns,
+                        column_types={name: pyarrow.string() for name in strings},
+                        null_values=NA_VALUES,
+                        true_values=TRUE_VALUES,
+                        false_values=FALSE_VALUES,
+                        strings_can_be_null=True,
+                        quoted_strings_can_be_null=True,
+                    ),
+                )
+        except pyarrow.ArrowInvalid as error:
+            # pyarrow rejects rows with missing fields, pandas fills them with NaN
+            LOGGER.debug("Parsing %s with pandas: %s", path, error)
+            return pandas.read_csv(
+                path, usecols=columns, dtype=dict.fromkeys(strings, str)
+            )
+        temporal = [
+            field.name for field in table.schema if pyarrow.types.is_temporal(field.type)
+        ]
+        if not temporal:
+            return cast(DataFrame, table.to_pandas())
+        strings = strings + temporal
+
+
+def read_strings(path: Path, engine: str = "pandas") -> DataFrame:
+    """Read every value as string, empty fields as empty strings.
+    Compressed files are decompressed while they are read, see open_input().
+
+    Values missing at the end of a short row are NaN,
+    pyarrow rejects such files, so they are parsed with pandas.
+    polars gives empty strings for them.
+    """
+    engine = available_engine(engine)
+    if engine == "pyarrow":
+        header: List[str] = list(pandas.read_csv(path, nrows=0).columns)
+        try:
+            with _engine_source(path) as source:
+                strings_table = arrow_csv.read_csv(
+                    source,
+                    parse_options=arrow_csv.ParseOptions(newlines_in_values=True),
+                    convert_options=arrow_csv.ConvertOptions(
+                        column_types={name: pyarrow.string() for name in header},
+                        strings_can_be_null=False,
+                    ),
+                )
+            return cast(DataFrame, strings_table.to_pandas())
+        except pyarrow.ArrowInvalid as error:
+            LOGGER.debug("Parsing %s with pandas: %s", path, error)
+    if engine == "polars":
+        with _engine_source(path) as source:
+            return polars.read_csv(
+                source, infer_schema=False, empty_string_is_null=False
+            ).to_pandas()
+    return pandas.read_csv(path, dtype=str, keep_default_na=False)
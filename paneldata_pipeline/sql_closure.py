@@ -0,0 +1,198 @@
+"""Transitive closure as recursive query in an embedded SQLite or DuckDB database."""
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Iterable, List, Optional
+
+import numpy
+from pandas import DataFrame, Series
+
+from paneldata_pipeline.closure import (
+    INPUT_COLUMNS,
+    NODE_COLUMNS,
+    OUTPUT_COLUMNS,
+    decode_links,
+    encode_nodes,
+)
+from paneldata_pipeline.interning import IntArray
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover
+    duckdb = None  # type: ignore[assignment]
+
+SQL_BACKENDS = ["sqlite", "duckdb"]
+# Number of links moved from the database into arrays at a time
+FETCH_SIZE = 100_000
+
+SCHEMA = [
+    "CREATE TABLE nodes (id INTEGER PRIMARY KEY, "
+    + ", ".join(f"{column} TEXT" for column in NODE_COLUMNS)
+    + ")",
+    "CREATE TABLE links (source INTEGER NOT NULL, target INTEGER NOT NULL)",
+]
+INDEXES = [
+    "CREATE INDEX links_source ON links (source, target)",
+    "CREATE INDEX links_target ON links (target, source)",
+    "CREATE INDEX nodes_version ON nodes (version)",
+]
+
+# Both recursions use UNION, which drops links found before and so ends on cycles.
+FORWARD_CLOSURE = """
+WITH RECURSIVE reach (source, target) AS (
+    SELECT source, target FROM links {seed_filter}
+    UNION
+    SELECT reach.source, links.target FROM reach JOIN links ON links.source = reach.target
+)
+SELECT source, target FROM reach {result_filter}
+"""
+BACKWARD_CLOSURE = """
+WITH RECURSIVE reach (source, target) AS (
+    SELECT source, target FROM links {seed_filter}
+    UNION
+    SELECT links.source, reach.target FROM reach JOIN links ON links.target = reach.source
+)
+SELECT source, target FROM reach {result_filter}
+"""
+
+
+def sql_closure(  # pylint: disable=too-many-arguments,too-many-locals
+    link_table: DataFrame,
+    backend: str = "sqlite",
+    sources: Optional[DataFrame] = None,
+    targets: Optional[DataFrame] = None,
+    output_versions: Optional[Iterable[str]] = None,
+    database_folder: Optional[Path] = None,
+) -> DataFrame:
+    """Compute the same links as transitive_closure() in an embedded database.
+
+    The links are loaded into an indexed SQLite or DuckDB file in a temporary
+    folder inside database_folder and followed by a recursive query,
+    so the database engine instead of Python keeps the links found so far.
+    sources and targets select links like in transitive_closure(),
+    the selected nodes are found by indexed semi-joins with the given keys.
+    output_versions selects links into the given versions like targeted_closure(),
+    the query then follows the links backwards from these versions.
+    """
+    link_sources, link_targets, nodes = encode_nodes(link_table)
+    with TemporaryDirectory(dir=database_folder) as folder:
+        with closing(_connect(backend, Path(folder))) as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            _insert(connection, "nodes", _node_rows(nodes))
+            _insert(
+                connection,
+                "links",
+                DataFrame({"source": link_sources, "target": link_targets}),
+            )
+            for statement in INDEXES:
+                connection.execute(statement)
+            source_filter = (
+                "" if sources is None else _select(connection, "sources", sources)
+            )
+            target_filter = (
+                "" if targets is None else _select(connection, "targets", targets)
+            )
+            parameters: List[str] = []
+            if output_versions is None:
+                query = FORWARD_CLOSURE.format(
+                    seed_filter=_where(source_filter.format(column="source")),
+                    result_filter=_where(target_filter.format(column="target")),
+                )
+            else:
+                parameters = [str(version) for version in output_versions]
+                version_filter = (
+                    "target IN (SELECT id FROM nodes WHERE version IN "
+                    f"({', '.join('?' * len(parameters)) or 'NULL'}))"
+                )
+                query = BACKWARD_CLOSURE.format(
+                    seed_filter=_where(
+                        version_filter, target_filter.format(column="target")
+                    ),
+                    result_filter=_where(source_filter.format(column="source")),
+                )
+            pairs = _fetch_pairs(connection.execute(query, parameters))
+    closure = decode_links(nodes, pairs[:, 0], pairs[:, 1])
+    return closure.sort_values(by=INPUT_COLUMNS + OUTPUT_COLUMNS).reset_index(drop=True)
+
+
+def _connect(backend: str, folder: Path) -> Any:
+    if backend == "sqlite":
+        return sqlite3.connect(folder.joinpath("closure.sqlite"))
+    if backend == "duckdb":
+        if duckdb is None:
+            raise ModuleNotFoundError("The duckdb backend requires the duckdb package.")
+        return duckdb.connect(str(folder.joinpath("closure.duckdb")))
+    raise ValueError(f"Unknown SQL backend {backend}, choose one of {SQL_BACKENDS}.")
+
+
+def _fetch_pairs(cursor: Any) -> IntArray:
+    """Read the (source, target) rows of cursor into an array of two columns,
+    FETCH_SIZE rows at a time, so the rows are never all held as Python tuples."""
+    batches = [numpy.empty((0, 2), dtype=numpy.int64)]
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return numpy.concatenate(batches)
+        batches.append(numpy.array(rows, dtype=numpy.int64).reshape(-1, 2))
+
+
+def _insert(connection: Any, table: str, rows: DataFrame) -> None:
+    if isinstance(connection, sqlite3.Connection):
+        with connection:
+            connection.executemany(
+                f"INSERT INTO {table} VALUES ({', '.join('?' * len(rows.columns))})",
+                zip(*(rows[column].tolist() for column in rows.columns)),
+            )
+    else:
+        connection.register("inserted_rows", rows)
+        connection.execute(f"INSERT INTO {table} SELECT * FROM inserted_rows")
+        connection.unregister("inserted_rows")
+
+
+def _node_rows(nodes: DataFrame) -> DataFrame:
+    rows = DataFrame({"id": numpy.arange(len(nodes), dtype=numpy.int64)})
+    for column in NODE_COLUMNS:
+        rows[column] = _strings(nodes[column])
+    return rows
+
+
+def _strings(values: Series) -> Series:
+    """Values as strings like node_mask() compares them, missing values as None."""
+    return values.astype(str).astype(object).where(values.notna().to_numpy(), None)
+
+
+def _select(connection: Any, name: str, keys: DataFrame) -> str:
+    """Store the ids of the nodes present in keys in the table name.
+
+    Returns a condition selecting the links whose {column} is one of these nodes.
+    """
+    columns = list(keys.columns)
+    unknown = set(columns) - set(NODE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Keys can only select nodes by {NODE_COLUMNS}, got {unknown}.")
+    key_table = f"{name}_keys"
+    connection.execute(
+        f"CREATE TABLE {key_table} ({', '.join(f'{column} TEXT' for column in columns)})"
+    )
+    _insert(connection, key_table, keys.apply(_strings).reset_index(drop=True))
+    connection.execute(
+        f"CREATE INDEX {key_table}_index ON {key_table} ({', '.join(columns)})"
+    )
+    # both compare missing values as equal, SQLite before 3.39 only knows IS
+    equal = "IS" if isinstance(connection, sqlite3.Connection) else "IS NOT DISTINCT FROM"
+    matches = " AND ".join(
+        f"{key_table}.{column} {equal} nodes.{column}" for column in columns
+    )
+    connection.execute(
+        f"CREATE TABLE {name} AS SELECT id FROM nodes "
+        f"WHERE EXISTS (SELECT 1 FROM {key_table} WHERE {matches})"
+    )
+    connection.execute(f"CREATE INDEX {name}_id ON {name} (id)")
+    return f"{{column}} IN (SELECT id FROM {name})"
+
+
+def _where(*conditions: str) -> str:
+    present = [condition for condition in conditions if condition]
+    return f"WHERE {' AND '.join(present)}" if present else ""
@@ -1,11 +1,12 @@
 """Provides the functionality to create a topic tree JSON file."""
-import json
 from pathlib import Path
 from typing import Any, Dict, List, Optional, TypedDict, Union
 
-import pandas
+from paneldata_pipeline.catalog import MetadataCatalog
+from paneldata_pipeline.json_writer import JsonWriter, dump_json
 
 LANGUAGES = {"en": "", "de": "_de"}
+REQUIRED_INPUTS = {"topics.csv": None, "concepts.csv": None}
 
 
 class LeafNode(TypedDict):
@@ -105,6 +106,7 @@ class TopicParser:
         input_folder: Path,
         output_folder: Path,
         languages: Optional[List[str]] = None,
+        catalog: Optional[MetadataCatalog] = None,
     ):
         topics_input_csv = input_folder.joinpath("topics.csv")
         concepts_input_csv = input_folder.joinpath("concepts.csv")
@@ -113,14 +115,18 @@ class TopicParser:
             languages = ["en", "de"]
         self.topics_input_csv = topics_input_csv
         self.concepts_input_csv = concepts_input_csv
-        self.topics_data = pandas.read_csv(topics_input_csv)
-        self.concepts_data = pandas.read_csv(concepts_input_csv)
+        catalog = catalog or MetadataCatalog(input_folder)
+        self.topics_data = catalog.table("topics.csv")
+        self.concepts_data = catalog.table("concepts.csv")
         self.languages = languages
 
-    def to_json(self) -> None:
+    def to_json(self, writer: Optional[JsonWriter] = None) -> None:
+        """Write topics.json atomically, through writer if one is given."""
         json_dict = self._create_json()
-        with open(self.output_json, "w", encoding="utf8") as json_file:
-            json_file.write(json.dumps(json_dict))
+        if writer is None:
+            dump_json(json_dict, self.output_json)
+        else:
+            writer.write(self.output_json, json_dict)
 
     def _create_json(self) -> List[Dict[str, Any]]:
         result = []
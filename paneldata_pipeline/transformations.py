@@ -4,29 +4,68 @@
 
 from collections import OrderedDict
 from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Union
 
-from pandas import DataFrame, read_csv
+import numpy
+from pandas import DataFrame, Series, concat
 
-from paneldata_pipeline.questions_variables import create_indirect_links_recursive
+from paneldata_pipeline.catalog import MetadataCatalog
+from paneldata_pipeline.closure import INPUT_COLUMNS, OUTPUT_COLUMNS
+from paneldata_pipeline.engine import ClosureOptions, follow_links_in_parts
+from paneldata_pipeline.interning import KeyInterner
+from paneldata_pipeline.merge_order import MergeOrder
+from paneldata_pipeline.output import (
+    OutputOptions,
+    RelationWriter,
+    as_list,
+    output_path,
+    subfolder_for,
+)
 
+INPUT_KEY_COLUMNS = ["input_study", "input_dataset", "input_variable"]
+OUTPUT_KEY_COLUMNS = ["output_study", "output_dataset", "output_variable"]
+REQUIRED_INPUTS = {
+    "generations.csv": INPUT_COLUMNS + OUTPUT_COLUMNS,
+    "variables.csv": ["dataset", "name"],
+}
 
-def preprocess_transformations(
-    study: str,
-    version: str,
+
+def preprocess_transformations(  # pylint: disable=too-many-arguments,too-many-locals
+    study: Union[str, Sequence[str], None],
+    version: Union[str, Sequence[str]],
     input_folder: Path = Path(),
     output_folder: Path = Path(),
     verbose: bool = False,
+    pushdown: bool = True,
+    closure_options: Optional[ClosureOptions] = None,
+    output_options: Optional[OutputOptions] = None,
+    catalog: Optional[MetadataCatalog] = None,
 ) -> DataFrame:
+    """Write transitive relations between variables of a study to transformations.csv.
+
+    With pushdown set, the study and variables.csv filters are applied
+    to the start and end of links while following them.
+    Otherwise they are applied to the complete transitive closure afterwards.
+    Links are followed once for all given studies and versions.
+    Rows are ordered like in the output of create_indirect_links_recursive():
+    by input variable, then in the order, in which the merges find the links
+    (see merge_order.MergeOrder, which replays them in memory per version).
+    With more than one version, one transformations.csv is written
+    to a subfolder per version.
+    With more than one study or with study set to None, which selects all studies
+    in generations.csv, these are nested in one subfolder per study.
+    closure_options select how links are followed (see engine.follow_links()),
+    output_options how the result is written (see output.write_relations()).
+    With a memory budget, the links are written part by part as they are found
+    (see engine.follow_links_in_parts()).
+    Input files are read from catalog, if it is given.
+    """
     if input_folder == Path():
         input_folder = Path("metadata/").resolve()
     if output_folder == Path():
         output_folder = Path("ddionrails/").resolve()
-
-    # load variables for filtering
-    variables = read_csv(input_folder.joinpath("variables.csv"))
-    variables["compare"] = variables["dataset"].astype(str) + variables["name"].astype(
-        str
-    )
+    versions = as_list(version)
+    catalog = catalog or MetadataCatalog(input_folder)
 
     columns = OrderedDict(
         [
@@ -38,82 +77,203 @@ def preprocess_transformations(
             ("output_variable", "target_variable_name"),
         ]
     )
-    dtype_settings = {"input_version": str, "output_version": str}
-    generations = read_csv(input_folder.joinpath("generations.csv"), dtype=dtype_settings)
+    generations = catalog.table("generations.csv", REQUIRED_INPUTS["generations.csv"])
     if verbose:
         print(generations.shape)
         print(generations.head())
 
-    # remove rows without the given version as "output_version"
-    filtered_generations = generations[
-        (generations["output_version"] == version)
-        & (generations["input_version"] == version)
+    # remove rows linking different versions
+    same_version_generations = generations[
+        generations["input_version"] == generations["output_version"]
+    ]
+    # remove rows without one of the given versions as "output_version",
+    # a closure store keeps them (see engine.follow_links())
+    filtered_generations = same_version_generations[
+        same_version_generations["output_version"].isin(versions)
     ]
     if verbose:
         print(filtered_generations.shape)
         print(filtered_generations.head())
 
-    # follow transitive relations in the generations file
-    generations_with_indirect_links = create_indirect_links_recursive(
-        filtered_generations
+    if study is None:
+        studies = sorted(
+            set(filtered_generations["input_study"].dropna())
+            | set(filtered_generations["output_study"].dropna())
+        )
+        study_subfolders = True
+    else:
+        studies = as_list(study)
+        study_subfolders = len(studies) > 1
+
+    # load variables for filtering
+    variables = catalog.table("variables.csv", REQUIRED_INPUTS["variables.csv"])
+    # variables of the studies, that are defined in variables.csv
+    existing_variables = _existing_variables(same_version_generations, variables, studies)
+
+    # follow transitive relations in the generations file,
+    # the links are written part by part as they are found
+    if pushdown:
+        # Links can lead through variables of other studies or through variables
+        # missing in variables.csv, so only their start and end are filtered.
+        parts = follow_links_in_parts(
+            same_version_generations,
+            "transformations",
+            sources=existing_variables,
+            targets=existing_variables,
+            options=closure_options,
+            versions=versions,
+        )
+    else:
+        parts = follow_links_in_parts(
+            same_version_generations,
+            "transformations",
+            options=closure_options,
+            versions=versions,
+        )
+    paths = {
+        (study_name, version_name): output_path(
+            output_folder,
+            "transformations.csv",
+            ([study_name] if study_subfolders else [])
+            + subfolder_for(version_name, versions),
+        )
+        for study_name in studies
+        for version_name in versions
+    }
+    with RelationWriter(
+        list(columns.values())[:3], list(columns.values())[3:], output_options
+    ) as writer:
+        orders: Dict[str, MergeOrder] = {}
+        for generations_with_indirect_links in _whole_inputs(parts):
+            if verbose:
+                print(generations_with_indirect_links.shape)
+                print(generations_with_indirect_links.head())
+
+            # remove rows with different input and output study
+            generations_with_indirect_links = generations_with_indirect_links[
+                generations_with_indirect_links["input_study"]
+                == generations_with_indirect_links["output_study"]
+            ]
+
+            # links never leave their version, so the result can be split
+            # by input study and input version in one pass
+            links_by_partition = dict(
+                list(
+                    generations_with_indirect_links.groupby(
+                        ["input_study", "input_version"], observed=True
+                    )
+                )
+            )
+            for partition, path in paths.items():
+                version_name = partition[1]
+                if version_name not in orders:
+                    orders[version_name] = MergeOrder(
+                        same_version_generations[
+                            same_version_generations["output_version"] == version_name
+                        ]
+                    )
+                writer.write(
+                    path,
+                    _finalize_links(
+                        links_by_partition.get(
+                            partition, generations_with_indirect_links.head(0)
+                        ),
+                        orders[version_name],
+                        existing_variables,
+                        pushdown,
+                        verbose,
+                    ).rename(columns=columns),
+                )
+
+
+def _whole_inputs(parts: Iterator[DataFrame]) -> Iterator[DataFrame]:
+    """Move the links of the last input variable of every part to the next part,
+    so that the links of one input variable are ordered together."""
+    carried: Optional[DataFrame] = None
+    for part in parts:
+        if carried is not None:
+            part = concat([carried, part], ignore_index=True)
+        last_input = KeyInterner(INPUT_COLUMNS)
+        last_input.intern(part[INPUT_COLUMNS].tail(1))
+        is_last = last_input.lookup(part[INPUT_COLUMNS]) >= 0
+        yield part[~is_last]
+        carried = part[is_last]
+    if carried is not None:
+        yield carried
+
+
+def _existing_variables(
+    generations: DataFrame, variables: DataFrame, studies: Sequence[str]
+) -> DataFrame:
+    """Keys (study, dataset, variable) of the variables linked in generations,
+    whose study is one of studies and whose dataset and variable
+    are defined in variables.csv."""
+    nodes = (
+        concat(
+            [
+                generations[key_columns].set_axis(
+                    ["study", "dataset", "variable"], axis=1
+                )
+                for key_columns in (INPUT_KEY_COLUMNS, OUTPUT_KEY_COLUMNS)
+            ],
+            ignore_index=True,
+        )
+        .drop_duplicates()
+        .reset_index(drop=True)
     )
-    if verbose:
-        print(generations_with_indirect_links.shape)
-        print(generations_with_indirect_links.head())
+    defined = KeyInterner(["dataset", "variable"])
+    defined.intern(variables[["dataset", "name"]])
+    mask = defined.lookup(nodes[["dataset", "variable"]]) >= 0
+    mask &= nodes["study"].isin(studies).to_numpy()
+    return nodes[mask].reset_index(drop=True)
+
 
-    # remove "input_version" and "output_version" columns
-    generations_with_indirect_links.drop(
-        ["input_version", "output_version"], axis=1, inplace=True
+def _finalize_links(
+    generations_with_indirect_links: DataFrame,
+    order: MergeOrder,
+    existing_variables: DataFrame,
+    pushdown: bool,
+    verbose: bool,
+) -> DataFrame:
+    """Order the links like the merges, remove versions, duplicates
+    and links of a variable to itself.
+
+    Both sides of the links are interned once,
+    the links are compared by the ids of their variables.
+    """
+    # sort by input variable, links of one input variable in the order of the merges
+    generations_with_indirect_links = (
+        generations_with_indirect_links.assign(
+            merge_rank=order.ranks(generations_with_indirect_links)
+        )
+        .sort_values(by=INPUT_KEY_COLUMNS + ["merge_rank"], kind="stable")
+        .reset_index(drop=True)
+    )
+    # remove "input_version", "output_version" and helper columns
+    generations_with_indirect_links = generations_with_indirect_links.drop(
+        ["input_version", "output_version", "merge_rank"], axis=1
     )
+    interner = KeyInterner(["study", "dataset", "variable"])
+    input_ids = interner.intern(generations_with_indirect_links[INPUT_KEY_COLUMNS])
+    output_ids = interner.intern(generations_with_indirect_links[OUTPUT_KEY_COLUMNS])
 
     # drop duplicates, without versions left and right, there are lots of duplicated rows
-    generations_with_indirect_links.drop_duplicates(inplace=True)
-    if verbose:
-        print(generations_with_indirect_links.shape)
-        print(generations_with_indirect_links.head())
-
-    # remove rows with the "wrong" input or output study
-    input_mask = generations_with_indirect_links["input_study"] == study
-    output_mask = generations_with_indirect_links["output_study"] == study
-    generations_with_indirect_links = generations_with_indirect_links[
-        input_mask & output_mask
-    ]
-    if verbose:
-        print(generations_with_indirect_links.shape)
-        print(generations_with_indirect_links.head())
+    mask = ~Series(input_ids * len(interner) + output_ids).duplicated().to_numpy()
+    if not pushdown:
+        # remove rows with the "wrong" study
+        # and rows where input or output variable is not defined in variables.csv
+        existing = numpy.zeros(len(interner), dtype=numpy.bool_)
+        existing_ids = interner.lookup(
+            existing_variables[["study", "dataset", "variable"]]
+        )
+        existing[existing_ids[existing_ids >= 0]] = True
+        mask &= existing[input_ids] & existing[output_ids]
 
     # remove rows, where left and right side of dataframe are the same variable
     # (due to removing versions)
-    mask = (
-        generations_with_indirect_links["input_dataset"]
-        != generations_with_indirect_links["output_dataset"]
-    ) | (
-        generations_with_indirect_links["input_variable"]
-        != generations_with_indirect_links["output_variable"]
-    )
+    mask &= input_ids != output_ids
     transformations = generations_with_indirect_links[mask]
     if verbose:
         print(generations_with_indirect_links.shape)
         print(generations_with_indirect_links.head())
-
-    # remove rows where input dataset and variable are not defined in variables.csv
-    transformations["compare"] = transformations["input_dataset"].astype(
-        str
-    ) + transformations["input_variable"].astype(str)
-    transformations = transformations[
-        transformations["compare"].isin(variables["compare"])
-    ]
-
-    transformations["compare"] = transformations["output_dataset"].astype(
-        str
-    ) + transformations["output_variable"].astype(str)
-    transformations = transformations[
-        transformations["compare"].isin(variables["compare"])
-    ]
-    # drop helper column
-    transformations.drop(["compare"], axis=1, inplace=True)
-    if verbose:
-        print(generations_with_indirect_links.shape)
-        print(generations_with_indirect_links.head())
-    transformations.rename(columns=columns, inplace=True)
-    transformations.to_csv(output_folder.joinpath("transformations.csv"), index=False)
+    return transformations
@@ -24,6 +24,14 @@ setup(
         "frictionless==4.40.3",
         "tabulate==0.8.10",
     ],
+    extras_require={
+        "fast": [
+            "pyarrow>=14.0.0",
+            "polars>=0.20.0",
+            "duckdb>=0.9.0",
+            "zstandard>=0.21.0",
+        ],
+    },
     include_package_data=True,
     keywords=["preprocessing", "ddionrails", "paneldata", "csv", "humanities"],
     long_description=LONG_DESCRIPTION,
@@ -0,0 +1,57 @@
+"""Tests for the paneldata_pipeline.cache module."""
+import os
+import unittest
+from pathlib import Path
+from typing import Dict
+from unittest.mock import patch
+
+import pandas
+import pytest
+
+from paneldata_pipeline import cache
+from paneldata_pipeline.catalog import MetadataCatalog
+
+FILE_NAMES = ["generations.csv", "variables.csv", "questions.csv", "answers.csv"]
+
+
+@unittest.skipIf(cache.pyarrow is None, "pyarrow is not installed")
+@pytest.mark.usefixtures("temp_directories")
+class TestColumnarCache(unittest.TestCase):
+    """Test reading metadata files from the columnar cache."""
+
+    temp_directories: Dict[str, Path]
+
+    def _catalog(self) -> MetadataCatalog:
+        return MetadataCatalog(
+            self.temp_directories["input_path"],
+            cache_folder=self.temp_directories["output_path"].joinpath("cache"),
+        )
+
+    def test_same_content(self) -> None:
+        """Cached tables should equal the parsed tables."""
+        for file_name in FILE_NAMES:
+            expected = MetadataCatalog(self.temp_directories["input_path"]).table(
+                file_name
+            )
+            self._catalog().table(file_name)
+            pandas.testing.assert_frame_equal(expected, self._catalog().table(file_name))
+
+    def test_unchanged_files(self) -> None:
+        """Files with unchanged content should not be parsed again."""
+        self._catalog().table("generations.csv")
+        path = self.temp_directories["input_path"].joinpath("generations.csv")
+        os.utime(path, ns=(0, 0))
+        with patch("pandas.read_csv", wraps=pandas.read_csv) as read_csv:
+            generations = self._catalog().table("generations.csv", ["input_variable"])
+        read_csv.assert_not_called()
+        self.assertListEqual(["input_variable"], list(generations.columns))
+
+    def test_changed_files(self) -> None:
+        """Changed files should be parsed again."""
+        self._catalog().table("variables.csv")
+        path = self.temp_directories["input_path"].joinpath("variables.csv")
+        variables = pandas.read_csv(path)
+        variables.head(1).to_csv(path, index=False)
+        self.assertEqual(1, len(self._catalog().table("variables.csv")))
+        cache_folder = self.temp_directories["output_path"].joinpath("cache")
+        self.assertEqual(1, len(list(cache_folder.glob("variables-*.arrow"))))
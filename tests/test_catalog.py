@@ -0,0 +1,69 @@
+"""Tests for the paneldata_pipeline.catalog module."""
+import gzip
+import unittest
+from pathlib import Path
+from typing import Dict
+from unittest.mock import patch
+
+import pandas
+import pytest
+
+from paneldata_pipeline.catalog import MetadataCatalog
+
+
+@pytest.mark.usefixtures("temp_directories")
+class TestMetadataCatalog(unittest.TestCase):
+    """Test the shared parsing of metadata files."""
+
+    temp_directories: Dict[str, Path]
+
+    def setUp(self) -> None:
+        self.catalog = MetadataCatalog(self.temp_directories["input_path"])
+        return super().setUp()
+
+    def test_parse_once(self) -> None:
+        """The columns needed by all stages should be parsed together, once."""
+        self.catalog.require_all({"variables.csv": ["dataset", "name"]})
+        self.catalog.require_all({"variables.csv": ["study", "name", "missing"]})
+        with patch("pandas.read_csv", wraps=pandas.read_csv) as read_csv:
+            variables = self.catalog.table("variables.csv", ["dataset", "name"])
+            other_variables = self.catalog.table("variables.csv", ["study", "missing"])
+        read_csv.assert_called_once()
+        self.assertListEqual(["dataset", "name"], list(variables.columns))
+        self.assertListEqual(["study"], list(other_variables.columns))
+
+    def test_unregistered_columns(self) -> None:
+        """Columns nobody registered should lead to parsing the file again."""
+        self.catalog.require("variables.csv", ["name"])
+        self.catalog.table("variables.csv", ["name"])
+        with patch("pandas.read_csv", wraps=pandas.read_csv) as read_csv:
+            variables = self.catalog.table("variables.csv", ["name", "dataset"])
+            self.catalog.table("variables.csv", ["dataset"])
+        read_csv.assert_called_once()
+        self.assertListEqual(["name", "dataset"], list(variables.columns))
+
+    def test_copies(self) -> None:
+        """Changes by one stage should not be seen by others."""
+        generations = self.catalog.table("generations.csv")
+        generations.drop(generations.index, inplace=True)
+        self.assertFalse(self.catalog.table("generations.csv").empty)
+
+    def test_categories(self) -> None:
+        """Key columns should be categories, shared by the columns of a group."""
+        generations = self.catalog.table("generations.csv")
+        self.assertEqual("category", generations["input_version"].dtype.name)
+        self.assertEqual(
+            generations["input_version"].dtype, generations["output_version"].dtype
+        )
+        self.assertEqual("object", generations["input_variable"].dtype.name)
+
+    def test_compressed(self) -> None:
+        """Compressed files should be read in place of missing plain files."""
+        expected = self.catalog.table("variables.csv")
+        plain = self.temp_directories["input_path"].joinpath("variables.csv")
+        compressed = plain.with_name("variables.csv.gz")
+        compressed.write_bytes(gzip.compress(plain.read_bytes()))
+        plain.unlink()
+        catalog = MetadataCatalog(self.temp_directories["input_path"])
+        self.assertEqual(compressed, catalog.path("variables.csv"))
+        pandas.testing.assert_frame_equal(expected, catalog.table("variables.csv"))
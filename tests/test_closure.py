@@ -0,0 +1,99 @@
+"""Tests for the paneldata_pipeline.closure module."""
+import unittest
+
+from pandas import DataFrame
+
+from paneldata_pipeline.closure import (
+    INPUT_COLUMNS,
+    OUTPUT_COLUMNS,
+    targeted_closure,
+    transitive_closure,
+)
+from paneldata_pipeline.questions_variables import create_indirect_links_recursive
+
+COLUMNS = INPUT_COLUMNS + OUTPUT_COLUMNS
+
+
+def _links(*pairs: str) -> DataFrame:
+    """Create a generations DataFrame from variable name pairs like "a>b"."""
+    rows = []
+    for pair in pairs:
+        _input, _output = pair.split(">")
+        rows.append(["study", "dataset", "v1", _input, "study", "dataset", "v1", _output])
+    return DataFrame(rows, columns=COLUMNS)
+
+
+def _pairs(link_table: DataFrame) -> set:  # type: ignore[type-arg]
+    return set(zip(link_table["input_variable"], link_table["output_variable"]))
+
+
+class TestTransitiveClosure(unittest.TestCase):
+    """Test the graph based computation of indirect links."""
+
+    def test_chain(self) -> None:
+        """Every variable in a chain should link to all following variables."""
+        result = transitive_closure(_links("a>b", "b>c", "c>d"))
+        self.assertListEqual(COLUMNS, list(result.columns))
+        self.assertSetEqual(
+            {("a", "b"), ("a", "c"), ("a", "d"), ("b", "c"), ("b", "d"), ("c", "d")},
+            _pairs(result),
+        )
+
+    def test_cycle(self) -> None:
+        """Variables in a cycle link to each other and to themselves."""
+        result = transitive_closure(_links("a>b", "b>a", "b>c"))
+        self.assertSetEqual(
+            {("a", "a"), ("a", "b"), ("a", "c"), ("b", "a"), ("b", "b"), ("b", "c")},
+            _pairs(result),
+        )
+
+    def test_same_result_as_merge(self) -> None:
+        """The result should not differ from the merge based computation."""
+        links = _links("a>b", "b>c", "c>a", "c>d", "e>d", "d>f", "g>h")
+        links.loc[6, "output_version"] = "v2"
+        expected = create_indirect_links_recursive(links)
+        result = transitive_closure(links)
+        self.assertListEqual(
+            expected.sort_values(COLUMNS).values.tolist(),
+            result.values.tolist(),
+        )
+
+    def test_empty(self) -> None:
+        """An empty input should lead to an empty output."""
+        result = transitive_closure(DataFrame(columns=COLUMNS))
+        self.assertTrue(result.empty)
+        self.assertListEqual(COLUMNS, list(result.columns))
+
+    def test_workers(self) -> None:
+        """Parallel processing of components should not change the result."""
+        links = _links("a>b", "b>c", "c>a", "c>d", "e>d", "d>f", "g>h", "i>i", "j>k")
+        expected = transitive_closure(links)
+        self.assertTrue(expected.equals(transitive_closure(links, workers=2)))
+        targets = DataFrame({"variable": ["d", "h"]})
+        self.assertTrue(
+            transitive_closure(links, targets=targets).equals(
+                transitive_closure(links, targets=targets, workers=3)
+            )
+        )
+
+
+class TestTargetedClosure(unittest.TestCase):
+    """Test the computation of indirect links into specific versions."""
+
+    def test_only_requested_version(self) -> None:
+        """Only links into the requested version should be created."""
+        links = _links("a>b", "b>c", "c>d")
+        links.loc[2, "output_version"] = "v2"
+        result = targeted_closure(links, ["v2"])
+        self.assertSetEqual({("a", "d"), ("b", "d"), ("c", "d")}, _pairs(result))
+        self.assertSetEqual({"v2"}, set(result["output_version"]))
+
+    def test_same_result_as_filtered_closure(self) -> None:
+        """The result should equal the filtered full closure."""
+        links = _links("a>b", "b>c", "c>a", "c>d", "e>d", "d>f", "g>h")
+        links.loc[[3, 5], "output_version"] = "v2"
+        links.loc[5, "input_version"] = "v2"
+        full = transitive_closure(links)
+        expected = full[full["output_version"] == "v2"].reset_index(drop=True)
+        self.assertTrue(expected.equals(targeted_closure(links, ["v2"])))
+        self.assertTrue(expected.equals(targeted_closure(links, ["v2"], workers=2)))
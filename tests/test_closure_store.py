@@ -0,0 +1,54 @@
+"""Tests for the paneldata_pipeline.closure_store module."""
+import unittest
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+from paneldata_pipeline.closure import transitive_closure
+from paneldata_pipeline.closure_store import ClosureStore
+from tests.test_closure import _links, _pairs
+
+
+@pytest.mark.usefixtures("temp_directories")
+class TestClosureStore(unittest.TestCase):
+    """Test the incremental maintenance of a stored closure."""
+
+    temp_directories: Dict[str, Path]
+
+    def setUp(self) -> None:
+        self.folder = self.temp_directories["output_path"]
+        self.path = self.folder.joinpath("closure.sqlite")
+        return super().setUp()
+
+    def _update(self, *pairs: str) -> set:  # type: ignore[type-arg]
+        links = _links(*pairs)
+        with ClosureStore(self.path) as store:
+            store.update(links)
+            result = store.links()
+        self.assertListEqual(
+            transitive_closure(links).values.tolist(), result.values.tolist()
+        )
+        return _pairs(result)
+
+    def test_added_links(self) -> None:
+        """Links added between runs should extend the stored closure."""
+        self._update("a>b", "c>d")
+        result = self._update("a>b", "c>d", "b>c")
+        self.assertIn(("a", "d"), result)
+
+    def test_removed_links(self) -> None:
+        """Links removed between runs should be removed from the stored closure."""
+        self._update("a>b", "b>c", "c>a", "c>d")
+        result = self._update("a>b", "c>a", "c>d")
+        self.assertNotIn(("a", "d"), result)
+        self.assertIn(("c", "b"), result)
+
+    def test_version_filter(self) -> None:
+        """Only links into the requested versions should be exported."""
+        links = _links("a>b", "b>c")
+        links.loc[1, "output_version"] = "v2"
+        with ClosureStore(self.path) as store:
+            store.update(links)
+            result = store.links(output_versions=["v2"])
+        self.assertSetEqual({("a", "c"), ("b", "c")}, _pairs(result))
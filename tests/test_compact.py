@@ -0,0 +1,145 @@
+"""Tests for the paneldata_pipeline.compact module."""
+import unittest
+from pathlib import Path
+from typing import Dict, Set, Tuple
+
+import pandas
+import pytest
+from pandas import read_csv
+
+from paneldata_pipeline.closure import transitive_closure
+from paneldata_pipeline.compact import CompactRelations, compact_paths
+from paneldata_pipeline.output import OutputOptions, compressed_path, write_relations
+from paneldata_pipeline.transformations import preprocess_transformations
+from tests.test_closure import _links
+from tests.test_transformations import CYCLE_GENERATIONS, CYCLE_VARIABLES
+
+SOURCE_COLUMNS = ["input_study", "input_dataset", "input_variable"]
+TARGET_COLUMNS = ["output_study", "output_dataset", "output_variable"]
+
+
+@pytest.mark.usefixtures("temp_directories")
+class TestCompactRelations(unittest.TestCase):
+    """Test writing and expanding the compact format."""
+
+    temp_directories: Dict[str, Path]
+
+    def setUp(self) -> None:
+        self.path = self.temp_directories["output_path"].joinpath("relations.csv")
+        closure = transitive_closure(
+            _links("a>b", "b>c", "c>d", "d>c", "d>e", "a>e", "f>f")
+        )
+        self.relations = closure[SOURCE_COLUMNS + TARGET_COLUMNS]
+        write_relations(
+            self.relations,
+            self.path,
+            SOURCE_COLUMNS,
+            TARGET_COLUMNS,
+            options={"compact": True},
+        )
+        self.compact = CompactRelations(self.path)
+        return super().setUp()
+
+    def test_reduced(self) -> None:
+        """Only the links of the reduced graph should be written."""
+        reduced_path, components_path = compact_paths(self.path)
+        self.assertFalse(self.path.exists())
+        reduced = read_csv(reduced_path)
+        self.assertSetEqual(
+            {("a", "b"), ("b", "c"), ("c", "d"), ("d", "c"), ("c", "e"), ("f", "f")},
+            set(zip(reduced["input_variable"], reduced["output_variable"])),
+        )
+        self.assertEqual(6, len(read_csv(components_path)))
+
+    def test_expand(self) -> None:
+        """Expanding the compact format should give back every relation."""
+        expanded = pandas.concat(list(self.compact.expand()))
+        self.assertSetEqual(
+            set(self.relations.itertuples(index=False, name=None)),
+            set(expanded.itertuples(index=False, name=None)),
+        )
+
+    def test_lookup(self) -> None:
+        """Ancestors and descendants should be rebuilt from the components."""
+        self.assertListEqual(
+            ["a", "b", "c", "d"],
+            sorted(node[2] for node in self.compact.ancestors(("study", "dataset", "e"))),
+        )
+        self.assertListEqual(
+            ["c", "d", "e"],
+            sorted(
+                node[2] for node in self.compact.descendants(("study", "dataset", "c"))
+            ),
+        )
+        self.assertListEqual([], self.compact.descendants(("study", "dataset", "x")))
+
+
+@pytest.mark.usefixtures("temp_directories")
+class TestCompactTransformations(unittest.TestCase):
+    """Test the compact format of transformations.csv."""
+
+    temp_directories: Dict[str, Path]
+
+    def setUp(self) -> None:
+        self.input_path = self.temp_directories["input_path"]
+        self.output_path = self.temp_directories["output_path"]
+        self.input_path.joinpath("generations.csv").write_text(
+            CYCLE_GENERATIONS, encoding="utf8"
+        )
+        self.input_path.joinpath("variables.csv").write_text(
+            CYCLE_VARIABLES, encoding="utf8"
+        )
+        return super().setUp()
+
+    def _expanded(self, output_options: OutputOptions) -> Set[Tuple[str, ...]]:
+        compact_folder = self.output_path.joinpath("compact")
+        compact_folder.mkdir()
+        preprocess_transformations(
+            "some-study",
+            "v2",
+            input_folder=self.input_path,
+            output_folder=compact_folder,
+            output_options=output_options,
+        )
+        compact = CompactRelations(
+            compressed_path(
+                compact_folder.joinpath("transformations.csv"),
+                output_options.get("compression"),
+            )
+        )
+        return set(
+            pandas.concat(list(compact.expand())).itertuples(index=False, name=None)
+        )
+
+    def _transformations(self) -> Set[Tuple[str, ...]]:
+        preprocess_transformations(
+            "some-study",
+            "v2",
+            input_folder=self.input_path,
+            output_folder=self.output_path,
+        )
+        transformations = read_csv(
+            self.output_path.joinpath("transformations.csv"), dtype=str
+        )
+        return set(transformations.itertuples(index=False, name=None))
+
+    def test_cycles_without_self_links(self) -> None:
+        """Members of a cycle should not be related to themselves,
+        if transformations.csv has no such relations."""
+        expanded = self._expanded({"compact": True})
+        self.assertSetEqual(self._transformations(), expanded)
+        self.assertFalse(any(row[:3] == row[3:] for row in expanded))
+
+    def test_compression(self) -> None:
+        """Both files of the compact format should be compressed."""
+        expanded = self._expanded({"compact": True, "compression": "gzip"})
+        self.assertSetEqual(self._transformations(), expanded)
+        reduced_path, components_path = compact_paths(
+            self.output_path.joinpath("compact", "transformations.csv.gz")
+        )
+        self.assertTrue(reduced_path.name.endswith(".reduced.csv.gz"))
+        self.assertTrue(reduced_path.exists())
+        self.assertTrue(components_path.exists())
+        self.assertFalse(
+            self.output_path.joinpath("compact", "transformations.reduced.csv").exists()
+        )
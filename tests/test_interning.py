@@ -0,0 +1,63 @@
+"""Tests for the paneldata_pipeline.interning module."""
+import unittest
+
+import numpy
+import pandas
+from pandas import DataFrame
+
+from paneldata_pipeline.interning import KeyInterner
+
+
+class TestKeyInterner(unittest.TestCase):
+    """Test the mapping of composite keys to integer ids."""
+
+    def setUp(self) -> None:
+        self.interner = KeyInterner(["dataset", "variable"])
+        return super().setUp()
+
+    def test_intern(self) -> None:
+        """Keys should get dense ids in the order of their first row."""
+        links = DataFrame(
+            {
+                "input_dataset": ["d1", "d2", "d1", "d1"],
+                "input_variable": ["a", "a", "a", "b"],
+                "output_dataset": ["d2", "d3", "d2", "d1"],
+                "output_variable": ["a", "a", "a", "a"],
+            }
+        )
+        input_ids = self.interner.intern(links[["input_dataset", "input_variable"]])
+        output_ids = self.interner.intern(links[["output_dataset", "output_variable"]])
+        self.assertListEqual([0, 1, 0, 2], input_ids.tolist())
+        self.assertListEqual([1, 3, 1, 0], output_ids.tolist())
+        self.assertEqual(4, len(self.interner))
+        self.assertListEqual(
+            [("d1", "a"), ("d2", "a"), ("d1", "b"), ("d3", "a")],
+            list(self.interner.keys.itertuples(index=False, name=None)),
+        )
+
+    def test_lookup(self) -> None:
+        """Unknown keys should get -1 without being added."""
+        self.interner.intern(DataFrame({"dataset": ["d1", "d2"], "variable": ["a", "b"]}))
+        ids = self.interner.lookup(
+            DataFrame({"name": ["b", "a", "b"], "dataset": ["d2", "d1", "d1"]})[
+                ["dataset", "name"]
+            ]
+        )
+        self.assertListEqual([1, 0, -1], ids.tolist())
+        self.assertEqual(2, len(self.interner))
+
+    def test_comparison(self) -> None:
+        """Values should be compared as strings, missing values only match each other."""
+        self.interner.intern(
+            DataFrame(
+                {
+                    "dataset": pandas.Categorical(["d1", "d1", "d1"]),
+                    "variable": pandas.Series([1, numpy.nan, 2], dtype=object),
+                }
+            )
+        )
+        ids = self.interner.lookup(
+            DataFrame({"dataset": ["d1", "d1", "d1"], "variable": ["1", None, "nan"]})
+        )
+        self.assertListEqual([0, 1, -1], ids.tolist())
+        self.assertEqual("category", self.interner.decode(ids[:1])["dataset"].dtype.name)
@@ -0,0 +1,58 @@
+"""Tests for the paneldata_pipeline.json_writer module."""
+import json
+import unittest
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+from paneldata_pipeline.json_writer import JsonWriter, dump_json
+
+DOCUMENTS = {
+    f"document-{number}": {"name": f"Ä{number}", "values": list(range(number))}
+    for number in range(20)
+}
+
+
+@pytest.mark.usefixtures("temp_directories")
+class TestJsonWriter(unittest.TestCase):
+    """Test the concurrent and atomic writing of JSON files."""
+
+    temp_directories: Dict[str, Path]
+
+    def setUp(self) -> None:
+        self.folder = self.temp_directories["output_path"]
+        return super().setUp()
+
+    def test_write(self) -> None:
+        """Files should be the same as written by json.dump()."""
+        with JsonWriter(threads=3, queue_depth=2) as writer:
+            for name, document in DOCUMENTS.items():
+                writer.write(
+                    self.folder.joinpath(f"{name}.json"),
+                    document,
+                    indent=2,
+                    ensure_ascii=False,
+                )
+        for name, document in DOCUMENTS.items():
+            expected = self.folder.joinpath("expected.json")
+            with open(expected, "w", encoding="utf8") as expected_file:
+                json.dump(document, expected_file, indent=2, ensure_ascii=False)
+            self.assertEqual(
+                expected.read_bytes(), self.folder.joinpath(f"{name}.json").read_bytes()
+            )
+        self.assertListEqual([], list(self.folder.glob(".*.tmp")))
+
+    def test_replace(self) -> None:
+        """An existing file should be replaced."""
+        path = self.folder.joinpath("document.json")
+        path.write_text("partial", encoding="utf8")
+        dump_json({"complete": True}, path)
+        self.assertDictEqual({"complete": True}, json.loads(path.read_text("utf8")))
+
+    def test_error(self) -> None:
+        """Errors of the writing threads should be raised."""
+        writer = JsonWriter()
+        writer.write(self.folder.joinpath("missing", "document.json"), {})
+        with self.assertRaises(FileNotFoundError):
+            writer.close()
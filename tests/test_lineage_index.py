@@ -0,0 +1,63 @@
+"""Tests for the paneldata_pipeline.lineage_index module."""
+import unittest
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from pandas import DataFrame
+
+from paneldata_pipeline.lineage_index import LineageIndex, write_index
+
+RELATIONS = DataFrame(
+    [
+        ["study", "dataset", "a", "study", "dataset", "b"],
+        ["study", "dataset", "a", "study", "dataset", "c"],
+        ["study", "dataset", "b", "study", "dataset", "c"],
+        ["study", "other-dataset", "ä", "study", "dataset", "c"],
+    ],
+    columns=["in_study", "in_dataset", "in_variable", "study", "dataset", "variable"],
+)
+
+
+@pytest.mark.usefixtures("temp_directories")
+class TestLineageIndex(unittest.TestCase):
+    """Test writing and reading a memory mapped index of relations."""
+
+    temp_directories: Dict[str, Path]
+
+    def setUp(self) -> None:
+        self.path = self.temp_directories["output_path"].joinpath("relations.index")
+        write_index(
+            RELATIONS,
+            ["in_study", "in_dataset", "in_variable"],
+            ["study", "dataset", "variable"],
+            self.path,
+        )
+        self.index = LineageIndex(self.path)
+        return super().setUp()
+
+    def test_ancestors(self) -> None:
+        """All nodes with relations into a node should be found."""
+        self.assertListEqual(
+            [
+                ("study", "dataset", "a"),
+                ("study", "dataset", "b"),
+                ("study", "other-dataset", "ä"),
+            ],
+            sorted(self.index.ancestors(("study", "dataset", "c"))),
+        )
+
+    def test_descendants(self) -> None:
+        """All nodes with relations from a node should be found."""
+        self.assertListEqual(
+            [("study", "dataset", "b"), ("study", "dataset", "c")],
+            sorted(self.index.descendants(("study", "dataset", "a"))),
+        )
+        self.assertListEqual([], self.index.descendants(("study", "dataset", "c")))
+
+    def test_unknown_node(self) -> None:
+        """Unknown nodes have no relations."""
+        self.assertListEqual([], self.index.ancestors(("study", "dataset", "x")))
+        self.assertListEqual(
+            ["in_study", "in_dataset", "in_variable"], self.index.source_columns
+        )
@@ -6,7 +6,7 @@ import sys
 import unittest
 from pathlib import Path
 from typing import Dict
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 import pytest
 from _pytest.capture import CaptureFixture
@@ -59,6 +59,48 @@ class TestMainModule(unittest.TestCase):  # pylint: disable=missing-docstring
         for boolean_field in argument_keys[-4:]:
             self.assertTrue(_parsed_arguments[boolean_field])
 
+    def test_memory_budget(self) -> None:
+        """The memory budget can be given with a unit or by environment variable."""
+        arguments = ["__main__.py", "-i", ".", "-o", ".", "--memory-budget", "1.5K"]
+        with patch.object(sys, "argv", arguments):
+            self.assertEqual(1536, parse_arguments().memory_budget)
+        with patch.object(sys, "argv", arguments[:-2]), patch.dict(
+            "os.environ", {"PANELDATA_PIPELINE_MEMORY_BUDGET": "2G"}
+        ):
+            self.assertEqual(2 * 1024**3, parse_arguments().memory_budget)
+
+    @pytest.mark.usefixtures("capsys_unittest")  # type: ignore[misc]
+    def test_study_required(self) -> None:
+        """Variable relations need a study, unless all studies are selected."""
+        arguments = ["__main__.py", "-i", ".", "-o", ".", "-w", "v1", "-r"]
+        with patch.object(sys, "argv", arguments):
+            with self.assertRaises(SystemExit):
+                parse_arguments()
+        self.assertIn(
+            "--all-studies",
+            self.capsys.readouterr().err,  # type: ignore[no-untyped-call]
+        )
+        with patch.object(sys, "argv", arguments + ["--all-studies"]):
+            self.assertTrue(parse_arguments().all_studies)
+        with patch.object(sys, "argv", arguments + ["-s", "some-study"]):
+            self.assertListEqual(["some-study"], parse_arguments().study)
+
+    @pytest.mark.usefixtures("capsys_unittest")  # type: ignore[misc]
+    def test_version_required(self) -> None:
+        """Relations and the plan need a version."""
+        for stage in ["-r", "-q", "--plan"]:
+            with self.subTest(stage=stage):
+                arguments = ["__main__.py", "-i", ".", "-o", ".", "--all-studies", stage]
+                with patch.object(sys, "argv", arguments):
+                    with self.assertRaises(SystemExit):
+                        parse_arguments()
+                self.assertIn(
+                    "--version",
+                    self.capsys.readouterr().err,  # type: ignore[no-untyped-call]
+                )
+                with patch.object(sys, "argv", arguments + ["-w", "v1"]):
+                    self.assertListEqual(["v1"], parse_arguments().version)
+
     @pytest.mark.usefixtures("capsys_unittest")  # type: ignore[misc]
     def test_help_message(self) -> None:
         """Help message should be printed with the -h flag and missing argument input."""
@@ -127,13 +169,32 @@ class TestMainModuleInteraction(unittest.TestCase):
             "output_folder": Path(arguments[4]).resolve(),
         }
 
-        merge_instruments.assert_called_once_with(**path_arguments)
+        merge_instruments.assert_called_once_with(
+            **path_arguments,
+            catalog=ANY,
+            workers=1,
+            chunk_size=None,
+            output_options={},
+        )
         questions_from_generations.assert_called_once_with(
-            **{"version": arguments[8]}, **path_arguments
+            **{
+                "version": [arguments[8]],
+                "closure_options": {},
+                "output_options": {},
+                "catalog": ANY,
+            },
+            **path_arguments,
         )
-        topic_parser.assert_called_once_with(**path_arguments)
+        topic_parser.assert_called_once_with(**path_arguments, catalog=ANY)
         preprocess_transformations.assert_called_once_with(
-            **{"study": arguments[6], "version": arguments[8]}, **path_arguments
+            **{
+                "study": [arguments[6]],
+                "version": [arguments[8]],
+                "closure_options": {},
+                "output_options": {},
+                "catalog": ANY,
+            },
+            **path_arguments,
         )
 
     @pytest.mark.usefixtures("temp_directories")  # type: ignore[misc]
@@ -5,7 +5,15 @@ from pathlib import Path
 from shutil import rmtree
 from tempfile import mkdtemp
 
-from paneldata_pipeline.merge_instruments import merge_instruments
+import numpy
+from pandas import DataFrame
+
+from paneldata_pipeline.merge_instruments import (
+    Row,
+    _records,
+    instrument_batches,
+    merge_instruments,
+)
 
 
 class TestMergeInstruments(unittest.TestCase):
@@ -34,6 +42,117 @@ class TestMergeInstruments(unittest.TestCase):
             result = json.load(_file)
         self.assertDictEqual(self.expected_dataset, result)
 
+    def test_workers(self) -> None:
+        """Instruments built by several processes should be the same."""
+        merge_instruments(input_folder=self.in_dir, output_folder=self.out_dir, workers=2)
+        with open(
+            self.out_dir.joinpath("instruments/some-questionnaire.json"),
+            "r",
+            encoding="utf8",
+        ) as _file:
+            result = json.load(_file)
+        self.assertDictEqual(self.expected_dataset, result)
+
+    def test_chunk_size(self) -> None:
+        """Instruments streamed one at a time should be the same."""
+        merge_instruments(
+            input_folder=self.in_dir, output_folder=self.out_dir, chunk_size=1
+        )
+        with open(
+            self.out_dir.joinpath("instruments/some-questionnaire.json"),
+            "r",
+            encoding="utf8",
+        ) as _file:
+            result = json.load(_file)
+        self.assertDictEqual(self.expected_dataset, result)
+
+    def test_unsorted(self) -> None:
+        """Streaming should fail for files not sorted by instrument."""
+        DataFrame({"study": ["s"], "name": ["a"]}).to_csv(
+            self.out_dir.joinpath("instruments.csv"), index=False
+        )
+        DataFrame({"study": "s", "instrument": ["b", "a"], "name": ["q1", "q2"]}).to_csv(
+            self.out_dir.joinpath("questions.csv"), index=False
+        )
+        DataFrame(columns=["study", "instrument", "answer_list"]).to_csv(
+            self.out_dir.joinpath("answers.csv"), index=False
+        )
+        with self.assertRaises(ValueError):
+            merge_instruments(
+                input_folder=self.out_dir, output_folder=self.out_dir, chunk_size=1
+            )
+
+    def test_chunk_size_with_missing_booleans(self) -> None:
+        """Booleans with missing values in some chunks should stay booleans."""
+        DataFrame({"study": ["s", "s"], "name": ["a", "b"]}).to_csv(
+            self.out_dir.joinpath("instruments.csv"), index=False
+        )
+        DataFrame(
+            {
+                "study": "s",
+                "instrument": ["a", "a", "a", "a", "b", "b", "b"],
+                "name": [f"q{number}" for number in range(7)],
+                "flag": [True, None, False, True, None, False, True],
+            }
+        ).to_csv(self.out_dir.joinpath("questions.csv"), index=False)
+        DataFrame(columns=["study", "instrument", "answer_list"]).to_csv(
+            self.out_dir.joinpath("answers.csv"), index=False
+        )
+        expected = self.out_dir.joinpath("expected")
+        merge_instruments(input_folder=self.out_dir, output_folder=expected)
+        for chunk_size in [1, 2, 3]:
+            chunked = self.out_dir.joinpath(f"chunked-{chunk_size}")
+            merge_instruments(
+                input_folder=self.out_dir, output_folder=chunked, chunk_size=chunk_size
+            )
+            for name in ["a.json", "b.json"]:
+                self.assertEqual(
+                    expected.joinpath("instruments", name).read_bytes(),
+                    chunked.joinpath("instruments", name).read_bytes(),
+                    msg=f"{name} with chunk size {chunk_size}",
+                )
+
+    def test_instrument_batches(self) -> None:
+        """All rows of an instrument should end up in the same batch."""
+        tables = {
+            "questionnaires": DataFrame({"name": ["a", "b"]}),
+            "questions": DataFrame({"instrument": ["c", "a", "b", "a"]}),
+            "answers": DataFrame({"instrument": ["b", "c"]}),
+        }
+        batches = instrument_batches(tables, 3)
+        self.assertEqual(3, len(batches))
+        for batch in batches:
+            instruments = [
+                set(batch["questionnaires"]["name"]),
+                set(batch["questions"]["instrument"]),
+                set(batch["answers"]["instrument"]),
+            ]
+            self.assertEqual(1, len(set.union(*instruments)))
+        self.assertEqual(1, len(instrument_batches(tables, 1)))
+
+    def test_records(self) -> None:
+        """Rows should hold the same values as the rows of iterrows without NaN."""
+        table = DataFrame(
+            {
+                "name": ["a", None, "c"],
+                "item": [1, 2, 3],
+                "number": [1.5, numpy.nan, 2.0],
+                "flag": [True, False, True],
+            }
+        )
+        self.assertListEqual(
+            [dict(row.dropna()) for _, row in table.iterrows()], list(_records(table))
+        )
+        self.assertIsInstance(next(_records(table))["item"], int)
+
+    def test_row(self) -> None:
+        """Rows with the same columns should share their column names."""
+        first = Row({"value": 1, "label": "Yes"})
+        second = Row({"value": 2, "label": "No"})
+        self.assertIs(first.columns, second.columns)
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertDictEqual({"value": 2, "label": "No"}, second.as_json())
+
     def tearDown(self) -> None:
         rmtree(self.out_dir)
         return super().tearDown()
@@ -0,0 +1,79 @@
+"""Tests for the paneldata_pipeline.merge_order module."""
+import random
+import unittest
+
+from pandas import DataFrame
+
+from paneldata_pipeline.closure import INPUT_COLUMNS, OUTPUT_COLUMNS, transitive_closure
+from paneldata_pipeline.merge_order import MergeOrder
+from paneldata_pipeline.questions_variables import create_indirect_links_recursive
+
+COLUMNS = INPUT_COLUMNS + OUTPUT_COLUMNS
+
+
+def _links(*pairs: str) -> DataFrame:
+    """Create a generations DataFrame from variable name pairs like "a>b"."""
+    rows = []
+    for pair in pairs:
+        _input, _output = pair.split(">")
+        rows.append(["study", "dataset", "v1", _input, "study", "dataset", "v1", _output])
+    return DataFrame(rows, columns=COLUMNS)
+
+
+def _rows(link_table: DataFrame) -> list:  # type: ignore[type-arg]
+    return list(link_table.itertuples(index=False, name=None))
+
+
+class TestMergeOrder(unittest.TestCase):
+    """Test the replay of the order of the merge based implementation."""
+
+    def assert_merge_order(self, link_table: DataFrame) -> None:
+        """Links sorted by input and rank should be in the order of the merges."""
+        closure = transitive_closure(link_table)
+        ranked = closure.assign(rank=MergeOrder(link_table).ranks(closure))
+        self.assertListEqual(
+            _rows(create_indirect_links_recursive(link_table)),
+            _rows(
+                ranked.sort_values(by=INPUT_COLUMNS + ["rank"], kind="stable").drop(
+                    columns="rank"
+                )
+            ),
+        )
+
+    def test_cycle(self) -> None:
+        """Links found in later rounds should follow those of earlier rounds."""
+        self.assert_merge_order(_links("a>b", "b>c", "c>a", "c>d", "d>e", "b>b"))
+
+    def test_duplicated_links(self) -> None:
+        """Duplicated links should only be ranked by their first occurrence."""
+        self.assert_merge_order(_links("c>d", "a>b", "b>c", "a>b", "c>d", "d>e"))
+
+    def test_shortcut(self) -> None:
+        """The order of merges with as many pairs as left rows should be replayed."""
+        self.assert_merge_order(_links("d>e", "a>d", "b>a", "b>c", "b>b", "a>e"))
+
+    def test_missing_values(self) -> None:
+        """Missing values in the keys should match each other like in merges."""
+        link_table = _links("a>b", "b>c", "c>a")
+        link_table.loc[1, ["output_dataset"]] = None
+        link_table.loc[2, ["input_dataset"]] = None
+        self.assert_merge_order(link_table)
+
+    def test_random_links(self) -> None:
+        """The order should be replayed for random links."""
+        generator = random.Random(0)
+        for _ in range(50):
+            pairs = [
+                f"{generator.choice('abcdefg')}>{generator.choice('abcdefg')}"
+                for _ in range(generator.randint(1, 12))
+            ]
+            with self.subTest(pairs=pairs):
+                self.assert_merge_order(_links(*dict.fromkeys(pairs)))
+
+    def test_unknown_links(self) -> None:
+        """Links, which the merges do not find, should be ranked last."""
+        order = MergeOrder(_links("a>b", "b>c"))
+        self.assertEqual(3, len(order))
+        self.assertListEqual(
+            [0, 3, 3, 2], list(order.ranks(_links("a>b", "c>a", "a>x", "a>c")))
+        )
@@ -0,0 +1,62 @@
+"""Tests for the paneldata_pipeline.out_of_core module."""
+import unittest
+
+import pandas
+from pandas import DataFrame
+
+from paneldata_pipeline.closure import targeted_closure, transitive_closure
+from paneldata_pipeline.out_of_core import (
+    partition_count,
+    spilled_closure,
+    spilled_links,
+)
+from tests.test_closure import COLUMNS, _links
+
+LINKS = ("a>b", "b>c", "c>a", "c>d", "e>d", "d>f", "g>h", "h>h")
+
+
+class TestSpilledClosure(unittest.TestCase):
+    """Test the closure computed within a memory budget."""
+
+    def test_same_result_as_closure(self) -> None:
+        """Spilling to many small partitions should not change the result."""
+        links = _links(*LINKS)
+        self.assertLess(1, partition_count(len(links), 64))
+        self.assertTrue(transitive_closure(links).equals(spilled_closure(links, 64)))
+        self.assertTrue(transitive_closure(links).equals(spilled_closure(links, 1024**3)))
+
+    def test_split_partitions(self) -> None:
+        """Partitions exceeding the memory budget should be split
+        and yielded one by one."""
+        links = _links(*(f"x{index:03}>x{index + 1:03}" for index in range(100)))
+        memory_budget = 25600
+        self.assertEqual(1, partition_count(len(links), memory_budget))
+        parts = list(spilled_links(links, memory_budget))
+        self.assertLess(1, len(parts))
+        self.assertTrue(all(len(part) <= memory_budget // 8 for part in parts))
+        self.assertTrue(
+            transitive_closure(links).equals(pandas.concat(parts, ignore_index=True))
+        )
+
+    def test_filters(self) -> None:
+        """Sources, targets and versions should select links like in memory."""
+        links = _links(*LINKS)
+        links.loc[[3, 5], "output_version"] = "v2"
+        links.loc[5, "input_version"] = "v2"
+        keys = DataFrame({"variable": ["a", "d", "f", "h"]})
+        self.assertTrue(
+            transitive_closure(links, sources=keys, targets=keys).equals(
+                spilled_closure(links, 64, sources=keys, targets=keys)
+            )
+        )
+        self.assertTrue(
+            targeted_closure(links, ["v2"]).equals(
+                spilled_closure(links, 64, output_versions=["v2"])
+            )
+        )
+
+    def test_empty(self) -> None:
+        """An empty input should lead to an empty output."""
+        result = spilled_closure(DataFrame(columns=COLUMNS), 64)
+        self.assertTrue(result.empty)
+        self.assertListEqual(COLUMNS, list(result.columns))
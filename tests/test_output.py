@@ -0,0 +1,61 @@
+"""Tests for the paneldata_pipeline.output module."""
+import unittest
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from pandas import DataFrame, read_csv
+
+from paneldata_pipeline import output
+from paneldata_pipeline.output import write_csv, write_relations
+
+TABLE = DataFrame(
+    {"variable": [f"variable-{number}" for number in range(10)], "value": range(10)}
+)
+
+
+@pytest.mark.usefixtures("temp_directories")
+class TestWriteCsv(unittest.TestCase):
+    """Test compressed writing of CSV files."""
+
+    temp_directories: Dict[str, Path]
+
+    def setUp(self) -> None:
+        self.folder = self.temp_directories["output_path"]
+        return super().setUp()
+
+    def test_uncompressed(self) -> None:
+        """Without compression, the file should be the same as written by pandas."""
+        TABLE.to_csv(self.folder.joinpath("expected.csv"), index=False)
+        write_csv(TABLE, self.folder.joinpath("table.csv"))
+        self.assertEqual(
+            self.folder.joinpath("expected.csv").read_bytes(),
+            self.folder.joinpath("table.csv").read_bytes(),
+        )
+        write_csv(TABLE.head(0), self.folder.joinpath("empty.csv"))
+        self.assertListEqual(
+            list(TABLE.columns), list(read_csv(self.folder.joinpath("empty.csv")).columns)
+        )
+
+    def test_gzip(self) -> None:
+        """Compressed files should be readable and identical for the same table."""
+        path = write_csv(TABLE, self.folder.joinpath("table.csv"), "gzip")
+        self.assertEqual("table.csv.gz", path.name)
+        self.assertTrue(TABLE.equals(read_csv(path)))
+        first = path.read_bytes()
+        write_csv(TABLE, self.folder.joinpath("table.csv"), "gzip")
+        self.assertEqual(first, path.read_bytes())
+
+    @unittest.skipIf(output.zstandard is None, "zstandard is not installed")
+    def test_zstd(self) -> None:
+        """zstd compressed relations should be readable."""
+        path = self.folder.joinpath("table.csv")
+        write_relations(
+            TABLE, path, ["variable"], ["value"], options={"compression": "zstd"}
+        )
+        self.assertTrue(TABLE.equals(read_csv(path.with_suffix(".csv.zst"))))
+
+    def test_unknown_compression(self) -> None:
+        """Unknown compressions should be rejected."""
+        with self.assertRaises(ValueError):
+            write_csv(TABLE, self.folder.joinpath("table.csv"), "rar")
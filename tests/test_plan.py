@@ -0,0 +1,55 @@
+"""Tests for the paneldata_pipeline.plan module."""
+import unittest
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from _pytest.capture import CaptureFixture
+
+from paneldata_pipeline.closure import targeted_closure, transitive_closure
+from paneldata_pipeline.plan import closure_plan, print_plan
+from tests.test_closure import _links
+
+
+class TestClosurePlan(unittest.TestCase):
+    """Test the statistics and estimates of a closure."""
+
+    def test_tree(self) -> None:
+        """The estimate should be exact for links without shared descendants."""
+        links = _links("a>b", "a>c", "b>d", "b>e", "f>g")
+        plan = closure_plan(links)
+        self.assertEqual(len(transitive_closure(links)), plan["estimated_rows"])
+        self.assertEqual(2, plan["components"])
+        self.assertEqual(5, plan["largest_component"])
+        self.assertEqual(2, plan["longest_chain"])
+        self.assertEqual(2, plan["max_fan_out"])
+        self.assertEqual(1, plan["max_fan_in"])
+
+    def test_upper_bound(self) -> None:
+        """Shared descendants and cycles should not lead to an underestimate."""
+        links = _links("a>b", "a>c", "b>d", "c>d", "d>e", "e>d")
+        self.assertEqual(2, closure_plan(links)["largest_cycle"])
+        links.loc[[4], "output_version"] = "v2"
+        self.assertLessEqual(
+            len(transitive_closure(links)), closure_plan(links)["estimated_rows"]
+        )
+        self.assertLessEqual(
+            len(targeted_closure(links, ["v2"])),
+            closure_plan(links, output_versions=["v2"])["estimated_rows"],
+        )
+
+
+@pytest.mark.usefixtures("temp_directories", "capsys_unittest")
+class TestPrintPlan(unittest.TestCase):
+    """Test the output of --plan."""
+
+    temp_directories: Dict[str, Path]
+    capsys: CaptureFixture  # type: ignore[type-arg]
+
+    def test_print_plan(self) -> None:
+        """Both relation stages should be described."""
+        print_plan("v1", self.temp_directories["input_path"])
+        output = self.capsys.readouterr().out  # type: ignore[no-untyped-call]
+        self.assertIn("transformations (-r)", output)
+        self.assertIn("questions_variables (-q)", output)
+        self.assertIn("estimated rows", output)
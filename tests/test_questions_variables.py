@@ -0,0 +1,64 @@
+"""Tests for the paneldata_pipeline.questions_variables module."""
+import unittest
+from pathlib import Path
+
+from pandas import DataFrame
+
+from paneldata_pipeline.interning import KeyInterner
+from paneldata_pipeline.questions_variables import (
+    create_indirect_links_delta,
+    create_indirect_links_recursive,
+    create_questions_from_generations,
+    create_questions_from_generations_by_version,
+)
+from tests.test_closure import COLUMNS, _links, _pairs
+
+
+class TestIndirectLinks(unittest.TestCase):
+    """Test the merge based computation of indirect links."""
+
+    def test_semi_naive(self) -> None:
+        """Both evaluation modes should find the same links."""
+        links = _links("a>b", "b>c", "c>a", "c>d", "e>d", "d>f", "g>h")
+        naive = create_indirect_links_recursive(links)
+        semi_naive = create_indirect_links_recursive(links, semi_naive=True)
+        self.assertListEqual(COLUMNS, list(semi_naive.columns))
+        self.assertEqual(len(naive), len(semi_naive))
+        self.assertSetEqual(_pairs(naive), _pairs(semi_naive))
+
+    def test_delta_contains_only_new_links(self) -> None:
+        """Links that are already known should not be part of the delta."""
+        links = _links("a>b", "b>c", "c>d")
+        known = KeyInterner(COLUMNS)
+        known.intern(_links("a>b", "b>c", "c>d", "a>c"))
+        delta = create_indirect_links_delta(_links("a>c", "b>c"), links, known)
+        self.assertSetEqual({("a", "d"), ("b", "d")}, _pairs(delta))
+        self.assertGreaterEqual(known.lookup(_links("a>d", "b>d")).min(), 0)
+        delta = create_indirect_links_delta(_links("a>d"), links, known)
+        self.assertTrue(delta.empty)
+
+    def test_semi_naive_with_duplicated_input(self) -> None:
+        """Duplicated input lines should not end the iteration early."""
+        links = _links("a>b", "a>b", "b>c", "b>c", "c>d")
+        result = create_indirect_links_recursive(links, semi_naive=True)
+        self.assertIn(("a", "d"), _pairs(result))
+        self.assertFalse(result.duplicated().any())
+        self.assertIsInstance(result, DataFrame)
+
+
+class TestQuestionsFromGenerations(unittest.TestCase):
+    """Test linking variables to questions."""
+
+    def test_several_versions(self) -> None:
+        """Computing versions together should not change the result per version."""
+        input_folder = Path("./tests/test_data/").absolute()
+        by_version = create_questions_from_generations_by_version(
+            ["v1", "v2"], input_folder
+        )
+        self.assertListEqual(["v1", "v2"], list(by_version.keys()))
+        for version, questions_variables in by_version.items():
+            self.assertTrue(
+                create_questions_from_generations(version, input_folder).equals(
+                    questions_variables
+                )
+            )
@@ -0,0 +1,103 @@
+"""Tests for the paneldata_pipeline.readers module."""
+import bz2
+import gzip
+import lzma
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict
+from unittest.mock import patch
+
+import pandas
+
+from paneldata_pipeline import readers
+from paneldata_pipeline.readers import (
+    Dtypes,
+    available_engine,
+    find_input,
+    read_csv,
+    read_strings,
+)
+
+TEST_DATA = Path("./tests/test_data/").absolute()
+ENGINES = [
+    engine for engine in ["pyarrow", "polars"] if getattr(readers, engine) is not None
+]
+EDGE_CASES = (
+    "date,text,flag,number,empty,missing,real,version\n"
+    '2020-01-01,"two\nlines",True,1,,NA,1.5,01\n'
+    "2020-01-02,plain,FALSE,,,,inf,2\n"
+    "2020-01-03,,true,3,,,-2,\n"
+)
+
+
+class TestReaders(unittest.TestCase):
+    """Test that every engine parses files like pandas."""
+
+    def test_read_csv(self) -> None:
+        """Every engine should give the same DataFrame as pandas."""
+        with TemporaryDirectory() as folder:
+            edge_cases = Path(folder).joinpath("edge_cases.csv")
+            edge_cases.write_text(EDGE_CASES, encoding="utf8")
+            for path in [edge_cases, *sorted(TEST_DATA.glob("*.csv"))]:
+                dtypes: Dtypes = {
+                    "version": str,
+                    "study": "category",
+                    "input_version": str,
+                }
+                expected = read_csv(path, dtype=dtypes)
+                columns = list(expected.columns)[::2]
+                for engine in ENGINES:
+                    with self.subTest(path=path.name, engine=engine):
+                        pandas.testing.assert_frame_equal(
+                            expected, read_csv(path, engine, dtype=dtypes)
+                        )
+                        pandas.testing.assert_frame_equal(
+                            read_csv(path, usecols=columns, dtype=dtypes),
+                            read_csv(path, engine, usecols=columns, dtype=dtypes),
+                        )
+
+    def test_read_strings(self) -> None:
+        """Every engine should read the same strings as pandas."""
+        for path in sorted(TEST_DATA.glob("*.csv")):
+            expected = read_strings(path)
+            for engine in ENGINES:
+                with self.subTest(path=path.name, engine=engine):
+                    strings = read_strings(path, engine)
+                    if engine == "polars":
+                        # polars has no missing values at the end of short rows
+                        expected = expected.fillna("")
+                    pandas.testing.assert_frame_equal(expected, strings)
+
+    def test_compressed(self) -> None:
+        """Compressed files should be found and read like the plain file."""
+        compressors: Dict[str, Callable[[bytes], bytes]] = {
+            ".gz": gzip.compress,
+            ".bz2": bz2.compress,
+            ".xz": lzma.compress,
+        }
+        if readers.zstandard is not None:
+            compressors[".zst"] = readers.zstandard.compress
+        plain = TEST_DATA.joinpath("questions.csv")
+        expected = read_csv(plain)
+        expected_strings = read_strings(plain)
+        with TemporaryDirectory() as folder:
+            for suffix, compress in compressors.items():
+                path = Path(folder).joinpath(f"questions.csv{suffix}")
+                path.write_bytes(compress(plain.read_bytes()))
+                self.assertEqual(path, find_input(Path(folder).joinpath("questions.csv")))
+                for engine in ["pandas", *ENGINES]:
+                    with self.subTest(suffix=suffix, engine=engine):
+                        pandas.testing.assert_frame_equal(
+                            expected, read_csv(path, engine)
+                        )
+                pandas.testing.assert_frame_equal(expected_strings, read_strings(path))
+                path.unlink()
+
+    def test_missing_engine(self) -> None:
+        """Files should be parsed with pandas if the engine is not installed."""
+        with patch.object(readers, "polars", None):
+            with self.assertLogs(readers.LOGGER, "WARNING"):
+                self.assertEqual("pandas", available_engine("polars"))
+        with self.assertRaises(ValueError):
+            available_engine("spreadsheet")
@@ -0,0 +1,83 @@
+"""Tests for the paneldata_pipeline.sql_closure module."""
+import unittest
+from unittest.mock import patch
+
+from pandas import DataFrame
+
+from paneldata_pipeline import sql_closure as sql_module
+from paneldata_pipeline.closure import targeted_closure, transitive_closure
+from paneldata_pipeline.sql_closure import sql_closure
+from tests.test_closure import COLUMNS, _links
+from tests.test_out_of_core import LINKS
+
+BACKENDS = [
+    backend
+    for backend in ["sqlite", "duckdb"]
+    if backend == "sqlite" or sql_module.duckdb is not None
+]
+
+
+class TestSqlClosure(unittest.TestCase):
+    """Test the closure computed by a recursive query."""
+
+    def test_same_result_as_closure(self) -> None:
+        """The recursive query should find the links of the in memory closure."""
+        links = _links(*LINKS)
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertTrue(
+                    transitive_closure(links).equals(sql_closure(links, backend))
+                )
+
+    def test_filters(self) -> None:
+        """Sources, targets and versions should select links like in memory."""
+        links = _links(*LINKS)
+        links.loc[[3, 5], "output_version"] = "v2"
+        links.loc[5, "input_version"] = "v2"
+        keys = DataFrame({"variable": ["a", "d", "f", "h"]})
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertTrue(
+                    transitive_closure(links, sources=keys, targets=keys).equals(
+                        sql_closure(links, backend, sources=keys, targets=keys)
+                    )
+                )
+                self.assertTrue(
+                    targeted_closure(links, ["v2"]).equals(
+                        sql_closure(links, backend, output_versions=["v2"])
+                    )
+                )
+
+    def test_fetch_in_batches(self) -> None:
+        """Reading the links in small batches should not change the result."""
+        links = _links(*LINKS)
+        with patch.object(sql_module, "FETCH_SIZE", 2):
+            for backend in BACKENDS:
+                with self.subTest(backend=backend):
+                    self.assertTrue(
+                        transitive_closure(links).equals(sql_closure(links, backend))
+                    )
+
+    def test_missing_key_values(self) -> None:
+        """Missing values in keys should select nodes with missing values."""
+        links = _links(*LINKS)
+        links.loc[0, "input_study"] = None
+        keys = DataFrame({"study": [None], "variable": [links.loc[0, "input_variable"]]})
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                expected = transitive_closure(links, sources=keys)
+                self.assertFalse(expected.empty)
+                self.assertTrue(
+                    expected.equals(sql_closure(links, backend, sources=keys))
+                )
+
+    def test_empty(self) -> None:
+        """An empty input should lead to an empty output."""
+        result = sql_closure(DataFrame(columns=COLUMNS))
+        self.assertTrue(result.empty)
+        self.assertListEqual(COLUMNS, list(result.columns))
+
+    def test_unknown_backend(self) -> None:
+        """Only the listed backends should be accepted."""
+        with self.assertRaises(ValueError):
+            sql_closure(_links(*LINKS), "spreadsheet")
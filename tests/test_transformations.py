@@ -0,0 +1,209 @@
+"""Tests for the paneldata_pipeline.transformations module."""
+import sqlite3
+import unittest
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Optional
+
+import pytest
+from pandas import read_csv
+
+from paneldata_pipeline.closure import INPUT_COLUMNS, OUTPUT_COLUMNS
+from paneldata_pipeline.engine import ClosureOptions
+from paneldata_pipeline.transformations import preprocess_transformations
+
+GENERATIONS = ",".join(INPUT_COLUMNS + OUTPUT_COLUMNS) + ("""
+some-study,some-dataset,v2,some-variable,other-study,other-dataset,v2,other-variable
+other-study,other-dataset,v2,other-variable,some-study,some-dataset,v2,some-other-variable
+some-study,some-dataset,v2,some-other-variable,some-study,some-dataset,v2,missing-variable
+some-study,some-dataset,v2,missing-variable,some-study,some-dataset,v2,some-third-variable
+""")
+
+# Generations with a cycle, a link of a variable to itself, a duplicated link,
+# links through another study and through variables missing in variables.csv
+# and links of another version.
+CYCLE_GENERATIONS = ",".join(INPUT_COLUMNS + OUTPUT_COLUMNS) + ("""
+some-study,some-dataset,v2,a,some-study,some-dataset,v2,b
+some-study,some-dataset,v2,b,some-study,some-dataset,v2,c
+some-study,some-dataset,v2,c,some-study,some-dataset,v2,a
+some-study,some-dataset,v2,c,some-study,some-dataset,v2,d
+some-study,some-dataset,v2,d,some-study,some-dataset,v2,e
+some-study,some-dataset,v2,b,some-study,some-dataset,v2,b
+some-study,some-dataset,v2,a,some-study,some-dataset,v2,b
+some-study,some-dataset,v2,e,some-study,some-dataset,v2,f
+some-study,some-dataset,v2,d,other-study,other-dataset,v2,x
+other-study,other-dataset,v2,x,some-study,some-dataset,v2,g
+some-study,some-dataset,v1,a,some-study,some-dataset,v1,g
+some-study,some-dataset,v1,g,some-study,some-dataset,v2,a
+""")
+CYCLE_VARIABLES = "study,dataset,name\n" + "".join(
+    f"some-study,some-dataset,{name}\n" for name in "abcdfg"
+)
+# transformations.csv written for CYCLE_GENERATIONS by the merge based
+# implementation, in its order of rows
+BASELINE_TRANSFORMATIONS = [
+    ("a", "b"),
+    ("a", "c"),
+    ("a", "d"),
+    ("a", "f"),
+    ("a", "g"),
+    ("b", "c"),
+    ("b", "a"),
+    ("b", "d"),
+    ("b", "f"),
+    ("b", "g"),
+    ("c", "a"),
+    ("c", "d"),
+    ("c", "b"),
+    ("c", "f"),
+    ("c", "g"),
+    ("d", "f"),
+    ("d", "g"),
+]
+
+
+@pytest.mark.usefixtures("temp_directories")
+class TestPreprocessTransformations(unittest.TestCase):
+    """Test the creation of transformations.csv"""
+
+    temp_directories: Dict[str, Path]
+
+    def setUp(self) -> None:
+        with open(
+            self.temp_directories["input_path"].joinpath("generations.csv"),
+            "w",
+            encoding="utf8",
+        ) as generations_file:
+            generations_file.write(GENERATIONS)
+        return super().setUp()
+
+    def _run(
+        self, pushdown: bool, closure_options: Optional[ClosureOptions] = None
+    ) -> list:  # type: ignore[type-arg]
+        preprocess_transformations(
+            "some-study",
+            "v2",
+            input_folder=self.temp_directories["input_path"],
+            output_folder=self.temp_directories["output_path"],
+            pushdown=pushdown,
+            closure_options=closure_options,
+        )
+        transformations = read_csv(
+            self.temp_directories["output_path"].joinpath("transformations.csv")
+        )
+        return list(
+            zip(
+                transformations["origin_variable_name"],
+                transformations["target_variable_name"],
+            )
+        )
+
+    def test_links_through_filtered_variables(self) -> None:
+        """Links through other studies or undefined variables should be followed."""
+        expected = [
+            ("some-other-variable", "some-third-variable"),
+            ("some-variable", "some-other-variable"),
+            ("some-variable", "some-third-variable"),
+        ]
+        self.assertListEqual(expected, self._run(pushdown=True))
+        self.assertListEqual(expected, self._run(pushdown=False))
+
+    def test_baseline_output(self) -> None:
+        """The rows of the merge based implementation should be written
+        in the same order."""
+        input_path = self.temp_directories["input_path"]
+        input_path.joinpath("generations.csv").write_text(
+            CYCLE_GENERATIONS, encoding="utf8"
+        )
+        input_path.joinpath("variables.csv").write_text(CYCLE_VARIABLES, encoding="utf8")
+        expected = BASELINE_TRANSFORMATIONS
+        self.assertListEqual(expected, self._run(pushdown=True))
+        self.assertListEqual(expected, self._run(pushdown=False))
+
+    def test_memory_budget(self) -> None:
+        """Links written part by part should be the same as in memory."""
+        input_path = self.temp_directories["input_path"]
+        input_path.joinpath("generations.csv").write_text(
+            CYCLE_GENERATIONS, encoding="utf8"
+        )
+        input_path.joinpath("variables.csv").write_text(CYCLE_VARIABLES, encoding="utf8")
+        expected = self._run(pushdown=True)
+        for pushdown in (True, False):
+            self.assertListEqual(
+                expected, self._run(pushdown, closure_options={"memory_budget": 64})
+            )
+
+    def test_several_versions(self) -> None:
+        """Every version should be written to its own subfolder."""
+        input_path = self.temp_directories["input_path"]
+        output_path = self.temp_directories["output_path"]
+        generations = read_csv(input_path.joinpath("generations.csv"))
+        second_version = generations.replace({"v2": "v3"})
+        second_version.iloc[:2].to_csv(
+            input_path.joinpath("generations.csv"), mode="a", header=False, index=False
+        )
+        preprocess_transformations(
+            "some-study",
+            ["v2", "v3"],
+            input_folder=input_path,
+            output_folder=output_path,
+        )
+        self.assertEqual(
+            3, len(read_csv(output_path.joinpath("v2", "transformations.csv")))
+        )
+        self.assertEqual(
+            1, len(read_csv(output_path.joinpath("v3", "transformations.csv")))
+        )
+        self.assertFalse(output_path.joinpath("transformations.csv").exists())
+
+    def test_closure_store(self) -> None:
+        """A closure store should keep the links of every version between runs."""
+        input_path = self.temp_directories["input_path"]
+        output_path = self.temp_directories["output_path"]
+        generations = read_csv(input_path.joinpath("generations.csv"))
+        generations.replace({"v2": "v3"}).iloc[:2].to_csv(
+            input_path.joinpath("generations.csv"), mode="a", header=False, index=False
+        )
+        expected = self._run(pushdown=True)
+        store = output_path.joinpath("store")
+        for version in ["v2", "v3", "v2"]:
+            preprocess_transformations(
+                "some-study",
+                version,
+                input_folder=input_path,
+                output_folder=output_path,
+                closure_options={"store": store},
+            )
+        self.assertListEqual(expected, self._run(True, {"store": store}))
+        with closing(
+            sqlite3.connect(store.joinpath("transformations_closure.sqlite"))
+        ) as connection:
+            stored_versions = connection.execute(
+                "SELECT DISTINCT version FROM links JOIN nodes ON nodes.id = links.source"
+            ).fetchall()
+        self.assertListEqual(["v2", "v3"], sorted(row[0] for row in stored_versions))
+
+    def test_several_studies(self) -> None:
+        """Every study should be written to its own subfolder."""
+        output_path = self.temp_directories["output_path"]
+        preprocess_transformations(
+            None,
+            "v2",
+            input_folder=self.temp_directories["input_path"],
+            output_folder=output_path,
+        )
+        self.assertEqual(
+            3, len(read_csv(output_path.joinpath("some-study", "transformations.csv")))
+        )
+        self.assertEqual(
+            0, len(read_csv(output_path.joinpath("other-study", "transformations.csv")))
+        )
+        preprocess_transformations(
+            ["some-study", "other-study"],
+            "v2",
+            input_folder=self.temp_directories["input_path"],
+            output_folder=output_path,
+        )
+        self.assertEqual(
+            3, len(read_csv(output_path.joinpath("some-study", "transformations.csv")))
+        )